@@ -0,0 +1,289 @@
+import json
+import numpy as np
+
+
+class EECompiledTreeModel:
+    """
+    :Class Name: EECompiledTreeModel
+    :Description: This class stores a random forest regressor or a xgb regressor as contiguous numpy arrays of
+                  nodes(feature, threshold, left child, right child, missing child, value) and predicts on all
+                  the rows and all the trees at once. It avoids the per call overhead of the original estimators
+                  which dominates the latency when predicting on a few rows. Every row is moved one level at a
+                  time, so on larger batches it is slower than the original estimators and it is only used up to
+                  max_rows rows(see ee_use_for).
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Maximum number of (row, tree) pairs evaluated at a time so that large batches use bounded memory.
+    block_size = 2 ** 21
+    # Largest number of rows for which the node arrays were measured to predict faster than the original
+    # estimators(a random forest has a larger overhead per call than xgb), keyed by aggregation.
+    max_rows = {"mean": 10, "sum": 1}
+
+    def __init__(self, feature, threshold, left, right, missing, value, roots, max_depth, aggregation,
+                 strict, base_score=0.0, feature_names=None):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EECompiledTreeModel. The child indices are global indices into the
+                      node arrays and every leaf points to itself, so a row that reaches a leaf stays there.
+        :param feature: Feature index used for the split of every node
+        :param threshold: Threshold of the split of every node
+        :param left: Index of the node taken when the split condition is true
+        :param right: Index of the node taken when the split condition is false
+        :param missing: Index of the node taken when the feature value is missing
+        :param value: Value of every node, only the value of leaves is used
+        :param roots: Index of the root node of every tree
+        :param max_depth: The maximum depth amongst all the trees
+        :param aggregation: 'mean' for random forest and 'sum' for xgb
+        :param strict: True if the split condition is feature < threshold(xgb) and False for feature <= threshold
+        :param base_score: Value added to the prediction of every row
+        :param feature_names: Names of the features in the order used during training, if known
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing = missing
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.aggregation = str(aggregation)
+        self.strict = bool(strict)
+        self.base_score = float(base_score)
+        self.feature_names = list(feature_names) if feature_names is not None and len(feature_names) else None
+
+    @classmethod
+    def ee_from_model(cls, model):
+        """
+        :Method Name: ee_from_model
+        :Description: This method flattens a trained random forest regressor or xgb regressor.
+        :param model: The trained model
+        :return: EECompiledTreeModel of the model or None if the model is not a supported tree model
+        """
+        if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+            return cls.ee_from_random_forest(model)
+        if hasattr(model, "get_booster"):
+            return cls.ee_from_xgb(model)
+        return None
+
+    @classmethod
+    def ee_from_random_forest(cls, model):
+        """
+        :Method Name: ee_from_random_forest
+        :Description: This method flattens all the trees of a trained random forest regressor.
+        :param model: The trained RandomForestRegressor
+        :return: EECompiledTreeModel of the model
+        """
+        trees = []
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            left = tree.children_left
+            right = tree.children_right
+            # Trees of newer scikit-learn versions store the direction taken by missing values.
+            if hasattr(tree, "missing_go_to_left"):
+                missing = np.where(tree.missing_go_to_left.astype(bool), left, right)
+            else:
+                missing = left
+            trees.append((tree.feature, tree.threshold, left, right, missing, tree.value[:, 0, 0]))
+
+        return cls.ee_from_node_arrays(trees, aggregation="mean", strict=False, base_score=0.0,
+                                       feature_names=getattr(model, "feature_names_in_", None))
+
+    @classmethod
+    def ee_from_xgb(cls, model):
+        """
+        :Method Name: ee_from_xgb
+        :Description: This method flattens all the trees of a trained xgb regressor. The exact split conditions
+                      are read from the JSON model when it is available and from the JSON dump of the trees
+                      otherwise.
+        :param model: The trained XGBRegressor
+        :return: EECompiledTreeModel of the model or None if the booster cannot be flattened exactly
+        """
+        booster = model.get_booster()
+
+        # A booster trained with early stopping may predict with only a part of its trees.
+        if booster.attr("best_iteration") is not None:
+            return None
+
+        feature_names = booster.feature_names
+        trees = []
+        try:
+            learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+            if learner["objective"]["name"] not in ("reg:squarederror", "reg:linear") or \
+                    learner["gradient_booster"].get("name", "gbtree") != "gbtree":
+                return None
+            base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+
+            for tree in learner["gradient_booster"]["model"]["trees"]:
+                left = np.array(tree["left_children"], dtype=np.int64)
+                right = np.array(tree["right_children"], dtype=np.int64)
+                missing = np.where(np.array(tree["default_left"], dtype=bool), left, right)
+                condition = np.array(tree["split_conditions"], dtype=np.float32)
+                feature = np.array(tree["split_indices"], dtype=np.int64)
+                # The split condition of a leaf holds its value.
+                trees.append((feature, condition, left, right, missing, condition))
+
+        except (TypeError, ValueError, KeyError):
+            # Older versions of xgboost can only dump the trees.
+            if model.objective not in ("reg:squarederror", "reg:linear") or \
+                    getattr(model, "booster", "gbtree") not in (None, "gbtree"):
+                return None
+            base_score = model.base_score if model.base_score is not None else 0.5
+
+            for dump in booster.get_dump(dump_format="json"):
+                nodes = {}
+                stack = [json.loads(dump)]
+                while stack:
+                    node = stack.pop()
+                    nodes[node["nodeid"]] = node
+                    stack.extend(node.get("children", []))
+
+                size = max(nodes) + 1
+                feature = np.zeros(size, dtype=np.int64)
+                condition = np.zeros(size, dtype=np.float32)
+                left = np.full(size, -1, dtype=np.int64)
+                right = np.full(size, -1, dtype=np.int64)
+                missing = np.full(size, -1, dtype=np.int64)
+                value = np.zeros(size, dtype=np.float32)
+                for node_id, node in nodes.items():
+                    if "leaf" in node:
+                        value[node_id] = node["leaf"]
+                        continue
+                    split = node["split"]
+                    feature[node_id] = feature_names.index(split) if feature_names else int(split[1:])
+                    condition[node_id] = node["split_condition"]
+                    left[node_id] = node["yes"]
+                    right[node_id] = node["no"]
+                    missing[node_id] = node["missing"]
+                trees.append((feature, condition, left, right, missing, value))
+
+        return cls.ee_from_node_arrays(trees, aggregation="sum", strict=True, base_score=base_score,
+                                       feature_names=feature_names)
+
+    @classmethod
+    def ee_from_node_arrays(cls, trees, aggregation, strict, base_score, feature_names):
+        """
+        :Method Name: ee_from_node_arrays
+        :Description: This method concatenates the node arrays of all the trees into contiguous arrays.
+        :param trees: List of (feature, threshold, left, right, missing, value) arrays for every tree, the child
+                      indices are local to the tree and leaves have -1 as children
+        :param aggregation: 'mean' or 'sum' of the leaf values of all the trees
+        :param strict: Whether the split condition is feature < threshold instead of feature <= threshold
+        :param base_score: Value added to the prediction of every row
+        :param feature_names: Names of the features used during training or None
+        :return: EECompiledTreeModel
+        """
+        features, thresholds, lefts, rights, missings, values, roots, depths = [], [], [], [], [], [], [], []
+        offset = 0
+        for feature, threshold, left, right, missing, value in trees:
+            size = len(left)
+            node_ids = np.arange(size)
+            is_leaf = np.asarray(left) < 0
+
+            # Leaves point to themselves so that further steps of the evaluation do not move a row.
+            lefts.append(np.where(is_leaf, node_ids, left) + offset)
+            rights.append(np.where(is_leaf, node_ids, right) + offset)
+            missings.append(np.where(is_leaf, node_ids, missing) + offset)
+            features.append(np.where(is_leaf, 0, feature))
+            thresholds.append(np.asarray(threshold, dtype=np.float64))
+            values.append(np.asarray(value, dtype=np.float64))
+            roots.append(offset)
+
+            depth = np.zeros(size, dtype=np.int64)
+            for node_id in range(size):
+                if not is_leaf[node_id]:
+                    depth[left[node_id]] = depth[node_id] + 1
+                    depth[right[node_id]] = depth[node_id] + 1
+            depths.append(depth.max())
+            offset += size
+
+        return cls(feature=np.concatenate(features).astype(np.int32),
+                   threshold=np.concatenate(thresholds),
+                   left=np.concatenate(lefts).astype(np.int32),
+                   right=np.concatenate(rights).astype(np.int32),
+                   missing=np.concatenate(missings).astype(np.int32),
+                   value=np.concatenate(values),
+                   roots=np.array(roots, dtype=np.int32),
+                   max_depth=max(depths),
+                   aggregation=aggregation, strict=strict, base_score=base_score,
+                   feature_names=feature_names)
+
+    def ee_save(self, path):
+        """
+        :Method Name: ee_save
+        :Description: This method saves the node arrays to a .npz file.
+        :param path: The path of the file
+        :return: None
+        """
+        np.savez(path, feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+                 missing=self.missing, value=self.value, roots=self.roots,
+                 max_depth=self.max_depth, aggregation=self.aggregation, strict=self.strict,
+                 base_score=self.base_score,
+                 feature_names=np.array(self.feature_names if self.feature_names else [], dtype=str))
+
+    @classmethod
+    def ee_load(cls, path):
+        """
+        :Method Name: ee_load
+        :Description: This method loads the node arrays saved by ee_save.
+        :param path: The path of the .npz file
+        :return: EECompiledTreeModel
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(feature=arrays["feature"], threshold=arrays["threshold"], left=arrays["left"],
+                       right=arrays["right"], missing=arrays["missing"], value=arrays["value"],
+                       roots=arrays["roots"], max_depth=arrays["max_depth"], aggregation=arrays["aggregation"],
+                       strict=arrays["strict"], base_score=arrays["base_score"],
+                       feature_names=arrays["feature_names"])
+
+    def ee_use_for(self, no_of_rows):
+        """
+        :Method Name: ee_use_for
+        :Description: This method tells whether the node arrays are faster than the original estimator for a
+                      prediction on the given number of rows.
+        :param no_of_rows: The number of rows to predict on
+        :return: True if this model should be used instead of the original estimator
+        """
+        return no_of_rows <= self.max_rows.get(self.aggregation, 0)
+
+    def predict(self, x):
+        """
+        :Method Name: predict
+        :Description: This method predicts on the given inputs by moving every (row, tree) pair one level down its
+                      tree at each step for max_depth steps.
+        :param x: pandas dataframe or 2D numpy array of inputs
+        :return: numpy array of predictions
+        """
+        if hasattr(x, "columns") and self.feature_names is not None and list(x.columns) != self.feature_names:
+            x = x[self.feature_names]
+        # Both scikit-learn and xgboost compare the inputs as float32.
+        x = np.asarray(x, dtype=np.float32)
+
+        no_of_trees = len(self.roots)
+        rows_per_block = max(1, self.block_size // no_of_trees)
+        result = np.empty(len(x), dtype=np.float64)
+
+        for start in range(0, len(x), rows_per_block):
+            block = x[start:start + rows_per_block]
+            row_ids = np.arange(len(block))[:, None]
+            nodes = np.repeat(self.roots[None, :], len(block), axis=0)
+
+            for _ in range(self.max_depth):
+                feature_values = block[row_ids, self.feature[nodes]]
+                if self.strict:
+                    go_left = feature_values < self.threshold[nodes]
+                else:
+                    go_left = feature_values <= self.threshold[nodes]
+                next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+                nodes = np.where(np.isnan(feature_values), self.missing[nodes], next_nodes)
+
+            leaf_values = self.value[nodes]
+            if self.aggregation == "mean":
+                result[start:start + len(block)] = leaf_values.mean(axis=1)
+            else:
+                result[start:start + len(block)] = leaf_values.sum(axis=1) + self.base_score
+
+        return result
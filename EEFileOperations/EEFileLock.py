@@ -0,0 +1,77 @@
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on windows, where the lock only holds between the threads of a process.
+    fcntl = None
+
+
+class EEFileLock:
+    """
+    :Class Name: EEFileLock
+    :Description: This class is a lock shared by all the threads and processes of the web application which use
+                  the same lock file, e.g. the gunicorn workers. A new object is created for every acquisition, so
+                  two threads of a process exclude each other like two processes. The lock is released when the
+                  process holding it exits.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Locks of the lock files used when fcntl is not available.
+    _thread_locks = {}
+    _thread_locks_lock = threading.Lock()
+
+    def __init__(self, path):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEFileLock.
+        :param path: The path of the lock file, it is created if it does not exist
+        """
+        self.path = path
+        self.lock_file = None
+        self.thread_lock = None
+
+    def ee_acquire(self, blocking=True):
+        """
+        :Method Name: ee_acquire
+        :Description: This method acquires the lock.
+        :param blocking: If True then it waits until the lock is free, else it returns at once
+        :return: True if the lock was acquired, False if it is held by another thread or process
+        """
+        if fcntl is None:
+            with EEFileLock._thread_locks_lock:
+                self.thread_lock = EEFileLock._thread_locks.setdefault(self.path, threading.Lock())
+            return self.thread_lock.acquire(blocking)
+
+        self.lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            self.lock_file = None
+            return False
+        return True
+
+    def ee_release(self):
+        """
+        :Method Name: ee_release
+        :Description: This method releases the lock acquired by ee_acquire.
+        :return: None
+        """
+        if fcntl is None:
+            self.thread_lock.release()
+            return
+
+        # Closing the lock file releases the lock.
+        self.lock_file.close()
+        self.lock_file = None
+
+    def __enter__(self):
+        self.ee_acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.ee_release()
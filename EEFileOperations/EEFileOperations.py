@@ -1,7 +1,12 @@
 import pickle
 import os
+import json
 import shutil
+from datetime import datetime
+import numpy as np
+import pandas as pd
 from EElogging.EELogger import EELogger
+from EEFileOperations.EECompiledTreeModel import EECompiledTreeModel
 
 
 class EEFileOperation:
@@ -56,6 +61,44 @@ class EEFileOperation:
             log_file.close()
             raise e
 
+    def ee_export_compiled_model(self, model, model_dir, model_name):
+        """
+        :Method Name: ee_export_compiled_model
+        :Description: This method flattens a trained random forest or xgb regressor into contiguous node arrays
+                      and saves them to the given directory so that they can be used for faster prediction.
+
+        :param model: The trained model to export.
+        :param model_dir: The folder/directory where the node arrays need to be stored
+        :param model_name: the name of the .npz file
+        :return: True if the model was exported, False if it is not a supported tree model
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            compiled_model = EECompiledTreeModel.ee_from_model(model)
+            if compiled_model is None:
+                message = f"{model_name} not exported as {type(model).__name__} cannot be compiled"
+                self.logger.log(log_file, message)
+                log_file.close()
+                return False
+
+            if not os.path.isdir(model_dir):
+                os.makedirs(model_dir)
+            compiled_model.ee_save(os.path.join(model_dir, model_name))
+
+            message = f"{model_name} has been exported as node arrays in {model_dir}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return True
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while exporting {model_name} in {model_dir}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
     def ee_load_model(self, model_path):
         """
         :Method Name: ee_load_model
@@ -104,3 +147,229 @@ class EEFileOperation:
             self.logger.log(log_file, message)
             log_file.close()
             raise e
+
+    def ee_create_model_version(self, models_root="EEModels/"):
+        """
+        :Method Name: ee_create_model_version
+        :Description: This method creates a new directory in which a training run saves all its artifacts.
+                      The directory is not used for prediction until it is published.
+
+        :param models_root: The directory containing all the model versions
+        :return: The path of the new version directory
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            version = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            version_dir = os.path.join(models_root, "versions", version)
+            os.makedirs(version_dir)
+
+            message = f"Model version directory {version_dir} created"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return version_dir
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while creating model version directory in {models_root}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_publish_model_version(self, version_dir, manifest, models_root="EEModels/", versions_to_keep=3):
+        """
+        :Method Name: ee_publish_model_version
+        :Description: This method writes the manifest of a completed training run and then makes its directory
+                      the current one by replacing the CURRENT pointer file in a single atomic rename. Older
+                      published versions beyond versions_to_keep(including the current one) are deleted.
+
+        :param version_dir: The version directory created by ee_create_model_version
+        :param manifest: Dictionary describing the artifacts of the version
+        :param models_root: The directory containing all the model versions
+        :param versions_to_keep: The number of most recent versions which are kept
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            version = os.path.basename(os.path.normpath(version_dir))
+            with open(os.path.join(version_dir, "manifest.json"), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            # os.replace is atomic, so a reader always sees either the previous or the new version.
+            pointer_path = os.path.join(models_root, "CURRENT")
+            temp_pointer_path = pointer_path + f".{os.getpid()}.tmp"
+            with open(temp_pointer_path, 'w') as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_pointer_path, pointer_path)
+
+            message = f"Model version {version} published"
+            self.logger.log(log_file, message)
+
+            # Version directories are named by their creation time, so sorting them orders them by age. Only the
+            # published versions(with a manifest) older than the current one are deleted, a version being written
+            # by another training run or published by it in the meantime is kept.
+            versions_dir = os.path.join(models_root, "versions")
+            current_version = os.path.basename(os.path.normpath(self.ee_current_model_dir(models_root)))
+            old_versions = [old_version for old_version in sorted(os.listdir(versions_dir))
+                            if old_version < current_version and
+                            os.path.isfile(os.path.join(versions_dir, old_version, "manifest.json"))]
+            for old_version in old_versions[:max(len(old_versions) - versions_to_keep + 1, 0)]:
+                shutil.rmtree(os.path.join(versions_dir, old_version), ignore_errors=True)
+                message = f"Old model version {old_version} deleted"
+                self.logger.log(log_file, message)
+
+            log_file.close()
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while publishing model version {version_dir}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_current_model_dir(self, models_root="EEModels/"):
+        """
+        :Method Name: ee_current_model_dir
+        :Description: This method returns the directory of the currently published model version. Models saved
+                      before versioning was introduced are directly inside models_root.
+
+        :param models_root: The directory containing all the model versions
+        :return: The path of the current version directory or None if no version has been published
+        """
+        try:
+            with open(os.path.join(models_root, "CURRENT"), 'r') as f:
+                version = f.read().strip()
+            return os.path.join(models_root, "versions", version)
+        except FileNotFoundError:
+            return None
+
+    def ee_save_columnar_dataset(self, dataframe, dataset_dir, index_label="ID", decimals=None):
+        """
+        :Method Name: ee_save_columnar_dataset
+        :Description: This method saves a dataset as binary numpy files which can be memory mapped without parsing
+                      any text. The values are saved as a single float array in column major order so that every
+                      column is contiguous, the index as an integer array and the column names in columns.json.
+                      Values which are not numbers(eg. 'null') are saved as NaN, as pd.read_csv would read them.
+                      The files are written to a temporary directory next to dataset_dir which then replaces it,
+                      so the files of a dataset are never mixed with those of the previous one.
+
+        :param dataframe: The pandas dataframe to be saved
+        :param dataset_dir: The directory of the dataset
+        :param index_label: The name of the column the index is loaded as
+        :param decimals: The number of decimal digits the values are rounded to before being saved, if None then
+                         the values are saved as they are. Rounding here saves a copy of the memory mapped values
+                         at every load.
+        :return: None
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            dataset_dir = os.path.normpath(dataset_dir)
+            temp_dir = f"{dataset_dir}.{os.getpid()}.tmp"
+            old_dir = f"{dataset_dir}.{os.getpid()}.old"
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            os.makedirs(temp_dir)
+
+            numeric = dataframe.apply(pd.to_numeric, errors='coerce')
+            if decimals is not None:
+                numeric = numeric.round(decimals)
+            metadata = {"columns": [str(column) for column in numeric.columns],
+                        "integer_columns": [str(column) for column in numeric.columns
+                                            if pd.api.types.is_integer_dtype(numeric[column])],
+                        "index_label": index_label, "rows": len(numeric), "decimals": decimals}
+
+            np.save(os.path.join(temp_dir, "data.npy"), np.asfortranarray(numeric.to_numpy(dtype=np.float64)))
+            np.save(os.path.join(temp_dir, "index.npy"), dataframe.index.to_numpy(dtype=np.int64))
+            with open(os.path.join(temp_dir, "columns.json"), 'w') as f:
+                json.dump(metadata, f)
+
+            # A directory can not be renamed over one which is not empty, so the previous dataset is moved away
+            # first. The arrays of a dataset still memory mapped by a reader stay valid after it is deleted.
+            if os.path.isdir(dataset_dir):
+                os.rename(dataset_dir, old_dir)
+            os.rename(temp_dir, dataset_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+            message = f"Dataset of {len(numeric)} rows saved in {dataset_dir}"
+            self.logger.log(log_file, message)
+            log_file.close()
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while saving the dataset in {dataset_dir}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_load_columnar_dataset(self, dataset_dir, start=None, stop=None):
+        """
+        :Method Name: ee_load_columnar_dataset
+        :Description: This method loads rows of a dataset saved by ee_save_columnar_dataset. The arrays are memory
+                      mapped, so only the requested rows are read from the disk and the values are not copied
+                      except for the integer columns. The dataframe has the same columns and types as the csv of
+                      the dataset read with pd.read_csv.
+
+        :param dataset_dir: The directory of the dataset
+        :param start: The first row loaded, if None then the rows are loaded from the first one
+        :param stop: The row after the last row loaded, if None then the rows are loaded until the last one
+        :return: The pandas dataframe of the rows, the memory mapped values are read only
+        :On Failure: ValueError if the files do not belong to the same dataset, Exception
+        """
+        try:
+            with open(os.path.join(dataset_dir, "columns.json"), 'r') as f:
+                metadata = json.load(f)
+            data = np.load(os.path.join(dataset_dir, "data.npy"), mmap_mode='r')
+            index = np.load(os.path.join(dataset_dir, "index.npy"), mmap_mode='r')
+
+            # The dataset may have been replaced between the reads of its files.
+            if data.shape != (metadata["rows"], len(metadata["columns"])) or index.shape != (metadata["rows"],):
+                raise ValueError(f"The files of the dataset in {dataset_dir} do not have the same shape, the "
+                                 f"dataset was replaced while it was being read")
+
+            start, stop, _ = slice(start, stop).indices(metadata["rows"])
+            data = data[start:stop]
+            index = index[start:stop]
+
+            # The rows keep their position in the dataset as index, like the chunks of pd.read_csv.
+            dataframe = pd.DataFrame(data, columns=metadata["columns"], index=pd.RangeIndex(start, start + len(data)),
+                                     copy=False)
+            for column in metadata["integer_columns"]:
+                dataframe[column] = dataframe[column].astype(np.int64)
+            dataframe.insert(0, metadata["index_label"], np.array(index))
+            return dataframe
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while loading the dataset in {dataset_dir}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_columnar_dataset_decimals(self, dataset_dir):
+        """
+        :Method Name: ee_columnar_dataset_decimals
+        :Description: This method returns the number of decimal digits the values of a dataset saved by
+                      ee_save_columnar_dataset were rounded to.
+        :param dataset_dir: The directory of the dataset
+        :return: The number of decimal digits or None if the values were not rounded
+        :On Failure: Exception
+        """
+        with open(os.path.join(dataset_dir, "columns.json"), 'r') as f:
+            return json.load(f).get("decimals")
+
+    def ee_columnar_dataset_rows(self, dataset_dir):
+        """
+        :Method Name: ee_columnar_dataset_rows
+        :Description: This method returns the number of rows of a dataset saved by ee_save_columnar_dataset.
+        :param dataset_dir: The directory of the dataset
+        :return: The number of rows
+        :On Failure: Exception
+        """
+        with open(os.path.join(dataset_dir, "columns.json"), 'r') as f:
+            return json.load(f)["rows"]
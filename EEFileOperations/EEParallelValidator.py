@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import shutil
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from EElogging.EELogger import EELogger
+from EEFileOperations.EEStreamingReader import EEStreamingReader
+
+
+class EEParallelValidator:
+    """
+    :Class Name: EEParallelValidator
+    :Description: This class validates the uploaded files of an ingestion in a pool of processes. Every process
+                  performs all the checks of a file(name, header, types and empty columns) and returns its verdict
+                  with the typed dataframe of a good file, the file is then copied to Good Raw Data or Bad Raw Data
+                  folder and the dataframe is stored in the workbook cache, so a good file is parsed only once. It
+                  is shared by the training and the prediction ingestion.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, good_raw_path, bad_raw_path, report_path, workbook_cache, log_path):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEParallelValidator.
+        :param good_raw_path: The folder of the good files
+        :param bad_raw_path: The folder of the bad files
+        :param report_path: The path of the json report of the validation
+        :param workbook_cache: EEWorkbookCache of the ingestion, it is given the dataframes of the good files
+        :param log_path: The path of the log file of the ingestion
+        """
+        self.good_raw_path = good_raw_path
+        self.bad_raw_path = bad_raw_path
+        self.report_path = report_path
+        self.workbook_cache = workbook_cache
+        self.log_path = log_path
+        self.logger = EELogger()
+
+    def ee_validate_files(self, dir_path, regex, number_of_columns, column_names, n_workers=None):
+        """
+        :Method Name: ee_validate_files
+        :Description: This method validates all the files of a folder at the same time in a pool of processes.
+                      Every file is copied to Good Raw Data or Bad Raw Data folder only once all its checks are
+                      done, through a temporary file which is renamed, so a folder never contains a partial file.
+                      A report of the result of every file is written to the report path.
+
+        :param dir_path: The folder of the uploaded files
+        :param regex: The regex compiler used to check validity of filenames
+        :param number_of_columns: The number of columns that is expected based on DSA
+        :param column_names: Dictionary of the column names and their types from the schema
+        :param n_workers: The number of processes used, if None then the environment variable
+                          EE_VALIDATION_WORKERS or else the number of cpus is used.
+        :return: List of dictionaries with the file, whether it is good and the reason if it is not
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            if n_workers is None:
+                n_workers = int(os.getenv("EE_VALIDATION_WORKERS", os.cpu_count() or 1))
+            raw_files = sorted(os.listdir(dir_path))
+            n_workers = max(1, min(n_workers, len(raw_files)))
+
+            message = f"Parallel validation of {len(raw_files)} files started with {n_workers} workers"
+            self.logger.log(log_file, message)
+
+            jobs = [(os.path.join(dir_path, filename), regex, number_of_columns, column_names)
+                    for filename in raw_files]
+            if n_workers <= 1:
+                results = (self.ee_validate_file(*job) for job in jobs)
+                report = [self.ee_place_validated_file(*result, log_file=log_file) for result in results]
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    futures = [executor.submit(self.ee_validate_file, *job) for job in jobs]
+                    # A file is placed as soon as its checks finish instead of in the submission order.
+                    report = [self.ee_place_validated_file(*future.result(), log_file=log_file)
+                              for future in as_completed(futures)]
+
+            report.sort(key=lambda result: result["file"])
+            with open(self.report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+            message = f"Parallel validation completed, {sum(result['good'] for result in report)} of " \
+                      f"{len(report)} files are good. Report saved in {self.report_path}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return report
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error occurred during parallel validation: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    @staticmethod
+    def ee_validate_file(path, regex, number_of_columns, column_names):
+        """
+        :Method Name: ee_validate_file
+        :Description: This method performs all the validations of a single file. It runs inside a worker process
+                      of ee_validate_files and does not move the file. The columns are checked batch by batch, so a
+                      bad file is rejected as soon as a batch with a wrong value is read, and the batches of a good
+                      file are put together into the same dataframe as EEStreamingReader.ee_read gives.
+
+        :param path: The path of the file
+        :param regex: The regex compiler used to check validity of filenames
+        :param number_of_columns: The number of columns that is expected based on DSA
+        :param column_names: Dictionary of the column names and their types from the schema
+        :return: Tuple of the path, the reason why the file is bad(None if it is good) and the dataframe of the
+                 file(None if it is bad)
+        """
+        filename = os.path.basename(path)
+        if not re.match(regex, filename):
+            return path, "invalid file name", None
+
+        try:
+            reader = EEStreamingReader(path)
+            header = reader.ee_read_header()
+            is_valid, reason = reader.ee_check_header(header, column_names)
+            if len(header) != number_of_columns or not is_valid:
+                return path, f"invalid Column length({reason or f'{len(header)} columns'})", None
+
+            batches = []
+            non_empty_columns = set()
+            for batch in reader.ee_iter_batches(column_names):
+                non_empty_columns.update(column for column in batch if batch[column].count() > 0)
+                batches.append(batch)
+        except ValueError as e:
+            return path, f"invalid data: {str(e)}", None
+        except Exception as e:
+            return path, f"unreadable file: {str(e)}", None
+
+        for column in header:
+            if column not in non_empty_columns:
+                return path, f"invalid column {column}", None
+        return path, None, pd.concat(batches, ignore_index=True)
+
+    def ee_place_validated_file(self, path, reason, dataframe, log_file):
+        """
+        :Method Name: ee_place_validated_file
+        :Description: This method copies a validated file to Good Raw Data or Bad Raw Data folder in a single
+                      rename. The dataframe of a good file is stored in the workbook cache for its new path.
+
+        :param path: The path of the file
+        :param reason: The reason why the file is bad, None if it is good
+        :param dataframe: The dataframe of a good file, None if it is bad
+        :param log_file: The open log file
+        :return: Dictionary with the file, whether it is good and the reason if it is not
+        """
+        filename = os.path.basename(path)
+        folder = self.good_raw_path if reason is None else self.bad_raw_path
+        destination = os.path.join(folder, filename)
+        temp_destination = os.path.join(folder, f".{filename}.tmp")
+        shutil.copy(path, temp_destination)
+        os.replace(temp_destination, destination)
+        if reason is None:
+            self.workbook_cache.ee_store(destination, dataframe)
+        else:
+            # A dataframe cached for a previous file of the same name is not used for this one.
+            self.workbook_cache.ee_discard(destination)
+
+        if reason is None:
+            message = f"{filename} is valid!! moved to GoodRaw folder"
+        else:
+            message = f"{filename} is not valid({reason})!! moved to BadRaw folder"
+        self.logger.log(log_file, message)
+        return {"file": filename, "good": reason is None, "reason": reason}
@@ -0,0 +1,268 @@
+import os
+import importlib.util
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from EElogging.EELogger import EELogger
+
+
+class EEStreamingReader:
+    """
+    :Class Name: EEStreamingReader
+    :Description: This class reads an uploaded file in batches of rows without loading it completely. Workbooks
+                  are read row by row with openpyxl in read only mode, so that the object model of the whole
+                  workbook is never built in memory, csv files in chunks with pandas and parquet files(if pyarrow
+                  is installed) by record batches. The header is read and validated before any data row and the
+                  data is returned in typed batches of rows, so a file with a wrong header or with values of the
+                  wrong type is rejected without reading it completely.
+                  The dataframes of a workbook have the same columns and types as the ones of pd.read_excel, and
+                  the same data gives the same dataframe in every format.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Types of the schema whose columns must only contain numbers.
+    numeric_types = ("float", "double", "int", "bigint", "decimal")
+
+    def __init__(self, path, batch_size=10000):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEStreamingReader.
+        :param path: The path of the file(xlsx, csv or parquet)
+        :param batch_size: The number of rows of every batch
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.file_format = os.path.splitext(path)[1].lower().lstrip(".")
+
+        self.logger = EELogger()
+        if not os.path.isdir("EElogging/"):
+            os.mkdir("EElogging/")
+        self.log_path = "EElogging/EEStreamingReader.txt"
+
+    def ee_iter_rows(self):
+        """
+        :Method Name: ee_iter_rows
+        :Description: This method yields the values of the rows of the first sheet, the empty cells at the end of
+                      every row and the empty rows are left out. The workbook is closed when the iteration stops.
+        :return: A generator of tuples of cell values
+        """
+        workbook = load_workbook(self.path, read_only=True, data_only=True, keep_links=False)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                # Formatted but empty cells make openpyxl return rows wider than the data.
+                end = len(row)
+                while end > 0 and row[end - 1] is None:
+                    end -= 1
+                if end > 0:
+                    yield row[:end]
+        finally:
+            workbook.close()
+
+    def ee_read_header(self):
+        """
+        :Method Name: ee_read_header
+        :Description: This method reads only the first row of the file.
+        :return: List of the column names
+        :On Failure: Exception
+        """
+        try:
+            if self.file_format == "csv":
+                return [str(column) for column in pd.read_csv(self.path, nrows=0).columns]
+            if self.file_format == "parquet":
+                import pyarrow.parquet
+                return list(pyarrow.parquet.ParquetFile(self.path).schema_arrow.names)
+
+            rows = self.ee_iter_rows()
+            try:
+                return self.ee_column_names(next(rows, ()))
+            finally:
+                # Closing the generator closes the workbook without reading the other rows.
+                rows.close()
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while reading the header of {self.path}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_validate_header(self, column_names):
+        """
+        :Method Name: ee_validate_header
+        :Description: This method validates the header of the workbook against the columns of the schema before
+                      any data row is read.
+        :param column_names: Dictionary of the column names and their types from the schema
+        :return: Tuple of whether the header is valid and the reason if it is not
+        :On Failure: Exception
+        """
+        return self.ee_check_header(self.ee_read_header(), column_names)
+
+    @staticmethod
+    def ee_check_header(header, column_names):
+        """
+        :Method Name: ee_check_header
+        :Description: This method compares the column names of a header with the columns of the schema.
+        :param header: List of the column names of the file
+        :param column_names: Dictionary of the column names and their types from the schema
+        :return: Tuple of whether the header is valid and the reason if it is not
+        """
+        if len(header) != len(column_names):
+            return False, f"{len(header)} columns instead of {len(column_names)}"
+        unknown = [column for column in header if column not in column_names]
+        if unknown:
+            return False, f"columns {unknown} not in the schema"
+        return True, None
+
+    def ee_iter_batches(self, column_names=None):
+        """
+        :Method Name: ee_iter_batches
+        :Description: This method yields the data rows of the file as dataframes of batch_size rows. If the
+                      columns of the schema are given then the header is validated first and every batch is
+                      checked for values of the wrong type as soon as it is read.
+        :param column_names: Dictionary of the column names and their types from the schema, if None then the
+                             types are not checked
+        :return: A generator of pandas dataframes
+        :On Failure: ValueError if the header or a value does not match the schema, Exception
+        """
+        try:
+            if self.file_format in ("csv", "parquet"):
+                if column_names is not None:
+                    self.ee_raise_for_header(self.ee_read_header(), column_names)
+                if self.file_format == "csv":
+                    batches = pd.read_csv(self.path, chunksize=self.batch_size)
+                else:
+                    import pyarrow.parquet
+                    batches = (record_batch.to_pandas() for record_batch in
+                               pyarrow.parquet.ParquetFile(self.path).iter_batches(batch_size=self.batch_size))
+                for batch in batches:
+                    yield self.ee_typed_dataframe(batch, column_names)
+                return
+
+            rows = self.ee_iter_rows()
+            header = self.ee_column_names(next(rows, ()))
+            if column_names is not None:
+                self.ee_raise_for_header(header, column_names)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == self.batch_size:
+                    yield self.ee_batch_to_dataframe(batch, header, column_names)
+                    batch = []
+            if batch or header:
+                yield self.ee_batch_to_dataframe(batch, header, column_names)
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while reading {self.path}: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_read(self, column_names=None):
+        """
+        :Method Name: ee_read
+        :Description: This method reads the whole file batch by batch.
+        :param column_names: Dictionary of the column names and their types from the schema, if None then the
+                             types are not checked
+        :return: The pandas dataframe of the file
+        :On Failure: ValueError if the header or a value does not match the schema, Exception
+        """
+        batches = list(self.ee_iter_batches(column_names))
+        if not batches:
+            return pd.DataFrame()
+        # A column which is integral in some batches and not in others becomes float, like in pd.read_excel.
+        return pd.concat(batches, ignore_index=True)
+
+    @staticmethod
+    def ee_column_names(row):
+        """
+        :Method Name: ee_column_names
+        :Description: This method returns the column names of a header row, named like pd.read_excel does.
+        :param row: The values of the header row
+        :return: List of the column names
+        """
+        return [f"Unnamed: {i}" if value is None else value if isinstance(value, str) else str(value)
+                for i, value in enumerate(row)]
+
+    def ee_raise_for_header(self, header, column_names):
+        """
+        :Method Name: ee_raise_for_header
+        :Description: This method raises ValueError if a header does not match the columns of the schema.
+        :param header: List of the column names of the file
+        :param column_names: Dictionary of the column names and their types from the schema
+        :return: None
+        :On Failure: ValueError
+        """
+        is_valid, reason = self.ee_check_header(header, column_names)
+        if not is_valid:
+            raise ValueError(f"The header of {self.path} does not match the schema: {reason}")
+
+    @staticmethod
+    def ee_supported_formats():
+        """
+        :Method Name: ee_supported_formats
+        :Description: This method returns the file formats which can be read, parquet only if pyarrow is installed.
+        :return: Tuple of the file extensions
+        """
+        if importlib.util.find_spec("pyarrow") is not None:
+            return "xlsx", "csv", "parquet"
+        return "xlsx", "csv"
+
+    def ee_batch_to_dataframe(self, batch, header, column_names=None):
+        """
+        :Method Name: ee_batch_to_dataframe
+        :Description: This method converts a batch of rows of a workbook to a typed dataframe.
+        :param batch: List of tuples of cell values
+        :param header: The column names
+        :param column_names: Dictionary of the column names and their types from the schema or None
+        :return: The pandas dataframe of the batch
+        :On Failure: ValueError
+        """
+        width = len(header)
+        # Rows shorter than the header are missing values at their end.
+        batch = [row if len(row) == width else (row + (None,) * width)[:width] for row in batch]
+        columns = list(zip(*batch)) if batch else [()] * width
+
+        return pd.DataFrame({name: self.ee_typed_column(name, pd.Series(list(values)).to_numpy(), column_names)
+                             for name, values in zip(header, columns)}, columns=header)
+
+    def ee_typed_dataframe(self, dataframe, column_names=None):
+        """
+        :Method Name: ee_typed_dataframe
+        :Description: This method converts a batch of rows of a csv or parquet file to a typed dataframe.
+        :param dataframe: The pandas dataframe of the batch as read
+        :param column_names: Dictionary of the column names and their types from the schema or None
+        :return: The pandas dataframe of the batch
+        :On Failure: ValueError
+        """
+        return pd.DataFrame({name: self.ee_typed_column(name, dataframe[name].to_numpy(), column_names)
+                             for name in dataframe.columns}, columns=dataframe.columns)
+
+    def ee_typed_column(self, name, values, column_names=None):
+        """
+        :Method Name: ee_typed_column
+        :Description: This method gives a column of a batch its type. The columns which are numeric in the schema
+                      are converted to float arrays, raising ValueError if a value is not a number, and a column of
+                      whole numbers without missing values is converted to integers as pd.read_excel does.
+        :param name: The name of the column
+        :param values: numpy array of the values of the column
+        :param column_names: Dictionary of the column names and their types from the schema or None
+        :return: numpy array of the typed values
+        :On Failure: ValueError
+        """
+        if column_names is not None and str(column_names.get(name)).lower() in self.numeric_types:
+            try:
+                array = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise ValueError(f"The column {name} of {self.path} has values which are not numbers")
+        elif values.dtype.kind in "fiu":
+            array = values.astype(np.float64)
+        else:
+            return values
+
+        if len(array) and not np.isnan(array).any() and np.array_equal(array, np.round(array)):
+            array = array.astype(np.int64)
+        return array
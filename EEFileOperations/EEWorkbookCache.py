@@ -0,0 +1,85 @@
+import os
+import threading
+from EEFileOperations.EEStreamingReader import EEStreamingReader
+
+
+class EEWorkbookCache:
+    """
+    :Class Name: EEWorkbookCache
+    :Description: This class keeps the parsed dataframe of every uploaded workbook so that a workbook is parsed
+                  only once per ingestion. The validators, the transformation of missing values, the database
+                  upload and the export to csv all use the same dataframe. A cached dataframe is parsed again if its
+                  file has been modified since it was read. The workbooks are parsed with EEStreamingReader, which
+                  gives the same dataframe as pd.read_excel with much less memory.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEWorkbookCache.
+        """
+        # absolute path of the file -> (modification time, size, dataframe)
+        self.frames = {}
+        self.reads = 0
+        # The database upload runs on a background thread while the csv is being written.
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def ee_signature(path):
+        """
+        :Method Name: ee_signature
+        :Description: This method returns what identifies the content of a file without reading it.
+        :param path: The path of the file
+        :return: Tuple of the absolute path, the modification time and the size of the file
+        """
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def ee_read(self, path, column_names=None):
+        """
+        :Method Name: ee_read
+        :Description: This method returns the dataframe of a workbook, parsing it only if it is not cached.
+        :param path: The path of the workbook
+        :param column_names: Dictionary of the column names and their types from the schema, if given then a
+                             workbook which is parsed is rejected as soon as a value of the wrong type is read
+        :return: The pandas dataframe of the workbook
+        :On Failure: ValueError if the workbook does not match the schema, Exception
+        """
+        key, mtime, size = self.ee_signature(path)
+        with self.lock:
+            cached = self.frames.get(key)
+        if cached is not None and cached[:2] == (mtime, size):
+            return cached[2]
+
+        dataframe = EEStreamingReader(path).ee_read(column_names)
+        with self.lock:
+            self.reads += 1
+            self.frames[key] = (mtime, size, dataframe)
+        return dataframe
+
+    def ee_store(self, path, dataframe):
+        """
+        :Method Name: ee_store
+        :Description: This method replaces the cached dataframe of a workbook(eg. after missing values are
+                      replaced) without writing the workbook again.
+        :param path: The path of the workbook
+        :param dataframe: The new dataframe of the workbook
+        :return: None
+        """
+        key, mtime, size = self.ee_signature(path)
+        with self.lock:
+            self.frames[key] = (mtime, size, dataframe)
+
+    def ee_discard(self, path):
+        """
+        :Method Name: ee_discard
+        :Description: This method removes the cached dataframe of a workbook(eg. when it is moved to BadRaw).
+        :param path: The path the workbook was read from
+        :return: None
+        """
+        with self.lock:
+            self.frames.pop(os.path.abspath(path), None)
@@ -13,9 +13,15 @@ class EEBeforeUploadPred:
     Interning at iNeuron Intelligence
     Version: 1.0
     """
-    def __init__(self):
-
+    def __init__(self, workbook_cache=None):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEBeforeUploadPred.
+        :param workbook_cache: EEWorkbookCache shared by the components of an ingestion, if given then the
+                               transformed files are kept in it instead of being written back to the workbooks.
+        """
         self.logger = EELogger()
+        self.workbook_cache = workbook_cache
         self.good_pred_path = "EEDIV/PredictionData/GoodRaw/"
         if not os.path.isdir("EElogging/prediction/"):
             os.mkdir("EElogging/prediction/")
@@ -35,12 +41,23 @@ class EEBeforeUploadPred:
             # Find all the files in the acceptable files folder and fill 'null' wherever there are missing values.
             # 'null' is being used so that cassandra database can accept missing values even in numerical columns.
             for filename in os.listdir(self.good_pred_path):
-                temp_df = pd.read_excel(os.path.join(self.good_pred_path, filename))
-                temp_df.fillna('null', inplace=True)
-                temp_df.to_excel(os.path.join(self.good_pred_path, filename), header=True, index=None)
+                path = os.path.join(self.good_pred_path, filename)
+                if self.workbook_cache is not None:
+                    # The database upload and the csv use the cached dataframe, so the slow rewrite of the
+                    # workbook is not needed.
+                    temp_df = self.workbook_cache.ee_read(path).fillna('null')
+                    self.workbook_cache.ee_store(path, temp_df)
+                elif filename.endswith(".xlsx"):
+                    temp_df = pd.read_excel(path).fillna('null')
+                    temp_df.to_excel(path, header=True, index=None)
+                else:
+                    # Only workbooks are rewritten, the other formats are transformed in the shared cache.
+                    message = f"{filename} is not a workbook and is not transformed without a workbook cache"
+                    self.logger.log(log_file, message)
+                    continue
                 message = f"{filename} transformed successfully"
                 self.logger.log(log_file, message)
-                log_file.close()
+            log_file.close()
 
         except Exception as e:
             log_file = open(self.log_path, 'a+')
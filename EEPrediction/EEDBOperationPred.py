@@ -2,9 +2,9 @@
 import os
 import cassandra
 from cassandra.query import dict_factory
-import pandas as pd
 
 from EElogging.EELogger import EELogger
+from EEFileOperations.EEWorkbookCache import EEWorkbookCache
 import csv
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
@@ -19,13 +19,16 @@ class EEDBOperationPred:
     Version: 1.0
     """
 
-    def __init__(self):
+    def __init__(self, workbook_cache=None):
         """
         :Method Name: __init__
         :Description: This constructor initializes the variable that will be utilized
                       in all the class methods
+        :param workbook_cache: EEWorkbookCache shared by the components of an ingestion so that every workbook
+                               is parsed only once, if None then a cache private to this object is used.
         """
         self.logger = EELogger()
+        self.workbook_cache = workbook_cache if workbook_cache is not None else EEWorkbookCache()
         if not os.path.isdir("EElogging/prediction"):
             os.mkdir("EElogging/prediction")
         self.log_path = "EElogging/prediction/EEDBOperationPred.txt"
@@ -138,7 +141,7 @@ class EEDBOperationPred:
             session = self.ee_db_connection()
 
             for filename in os.listdir(self.good_file_dir):
-                temp_df = pd.read_excel(os.path.join(self.good_file_dir, filename))
+                temp_df = self.workbook_cache.ee_read(os.path.join(self.good_file_dir, filename))
 
                 # count variable is used so the the column part of the query is created only once as it is same for all
                 # the insertion queries
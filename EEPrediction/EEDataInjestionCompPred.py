@@ -4,6 +4,7 @@ from EEPrediction.EEDataFormatPred import EEDataFormatPred
 from EEPrediction.EEDBOperationPred import EEDBOperationPred
 from EEPrediction.EEBeforeUploadPred import EEBeforeUploadPred
 from EElogging.EELogger import EELogger
+from EEFileOperations.EEWorkbookCache import EEWorkbookCache
 import os
 
 
@@ -24,10 +25,23 @@ class EEDataInjestionCompPred:
     Version: 1.0
     """
 
-    def __init__(self, path="EEPredDatasets/"):
-        self.data_format_validator = EEDataFormatPred(path=path)
-        self.db_operator = EEDBOperationPred()
-        self.data_transformer = EEBeforeUploadPred()
+    def __init__(self, path="EEPredDatasets/", parallel_validation=None):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEDataInjestionCompPred.
+        :param path: path to the datasets folder
+        :param parallel_validation: If True then the files are validated at the same time in a pool of processes,
+                                    if None then only if the environment variable EE_PARALLEL_VALIDATION is set.
+        """
+        # Every workbook is parsed once and the dataframe is shared by the validation, the transformation, the
+        # database upload and the csv.
+        self.workbook_cache = EEWorkbookCache()
+        self.data_format_validator = EEDataFormatPred(path=path, workbook_cache=self.workbook_cache)
+        self.db_operator = EEDBOperationPred(workbook_cache=self.workbook_cache)
+        self.data_transformer = EEBeforeUploadPred(workbook_cache=self.workbook_cache)
+        if parallel_validation is None:
+            parallel_validation = os.getenv("EE_PARALLEL_VALIDATION", "").lower() in ("1", "true", "yes")
+        self.parallel_validation = parallel_validation
         self.logger = EELogger()
         if not os.path.isdir("EElogging/prediction/"):
             os.mkdir("EElogging/prediction/")
@@ -50,9 +64,12 @@ class EEDataInjestionCompPred:
 
             filename_length, dataset_col_names, dataset_col_num = self.data_format_validator.ee_values_from_schema()
             regex = self.data_format_validator.ee_regex_file_name()
-            self.data_format_validator.ee_validating_file_name(regex)
-            self.data_format_validator.ee_validate_column_length(dataset_col_num)
-            self.data_format_validator.ee_validate_whole_columns_as_empty()
+            if self.parallel_validation:
+                self.data_format_validator.ee_validate_files_parallel(regex, dataset_col_num, dataset_col_names)
+            else:
+                self.data_format_validator.ee_validating_file_name(regex)
+                self.data_format_validator.ee_validate_column_length(dataset_col_num, dataset_col_names)
+                self.data_format_validator.ee_validate_whole_columns_as_empty(dataset_col_names)
 
             message = "Raw EEPrediction Data Validation complete"
             self.logger.log(log_file, message)
@@ -1,6 +1,7 @@
 import os
 import pandas as pd
 from EElogging.EELogger import EELogger
+from EEFileOperations.EEFileOperations import EEFileOperation
 
 
 class EEDataLoaderPred:
@@ -15,6 +16,8 @@ class EEDataLoaderPred:
     """
     def __init__(self):
         self.training_file = 'prediction_file.csv'
+        # Binary dataset written by the ingestion, the csv is read only if it does not exist.
+        self.prediction_dataset = "prediction_data/"
         self.logger = EELogger()
         if not os.path.isdir("EElogging/prediction/"):
             os.mkdir("EElogging/prediction/")
@@ -23,15 +26,24 @@ class EEDataLoaderPred:
     def ee_get_data(self):
         """
         Method Name: get_data
-        Description: This method reads the data from source.
+        Description: This method reads the data from source. The binary dataset is memory mapped if it exists,
+                     else the csv file is read.
         Output: A pandas DataFrame.
         On Failure: Raise Exception
         """
         try:
             log_file = open(self.log_path, 'a+')
-            self.data = pd.read_csv(self.training_file)
-            # To round all the values to two decimal digits as it is usually in the data files.
-            self.data = self.data.round(2)
+            if os.path.isdir(self.prediction_dataset):
+                file_operator = EEFileOperation()
+                self.data = file_operator.ee_load_columnar_dataset(self.prediction_dataset)
+                decimals = file_operator.ee_columnar_dataset_decimals(self.prediction_dataset)
+            else:
+                self.data = pd.read_csv(self.training_file)
+                decimals = None
+            # To round all the values to two decimal digits as it is usually in the data files. The values of a
+            # binary dataset are rounded when it is saved, so the memory mapped values are not copied again.
+            if decimals != 2:
+                self.data = self.data.round(2)
             message = "The prediction data is loaded successfully as a pandas dataframe"
             self.logger.log(log_file, message)
             log_file.close()
@@ -44,3 +56,39 @@ class EEDataLoaderPred:
             log_file.close()
             raise e
 
+    def ee_get_data_chunks(self, chunk_size):
+        """
+        Method Name: ee_get_data_chunks
+        Description: This method reads the data from source in chunks of fixed size so that files larger
+                     than the available memory can be processed.
+        :param chunk_size: The number of rows in every chunk
+        Output: A generator of pandas DataFrames.
+        On Failure: Raise Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+            message = f"The prediction data is being loaded in chunks of {chunk_size} rows"
+            self.logger.log(log_file, message)
+            log_file.close()
+
+            if os.path.isdir(self.prediction_dataset):
+                # Only the rows of the chunk are read from the memory mapped dataset.
+                file_operator = EEFileOperation()
+                no_of_rows = file_operator.ee_columnar_dataset_rows(self.prediction_dataset)
+                decimals = file_operator.ee_columnar_dataset_decimals(self.prediction_dataset)
+                chunks = (file_operator.ee_load_columnar_dataset(self.prediction_dataset, start, start + chunk_size)
+                          for start in range(0, no_of_rows, chunk_size))
+            else:
+                chunks = pd.read_csv(self.training_file, chunksize=chunk_size)
+                decimals = None
+
+            for chunk in chunks:
+                # To round all the values to two decimal digits as it is usually in the data files.
+                yield chunk if decimals == 2 else chunk.round(2)
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to load the data for prediction in chunks: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
@@ -56,25 +56,116 @@ class EEFeatureEngineeringPred:
             log_file.close()
             raise e
 
-    def ee_handling_missing_data_mcar(self, dataframe, feature_with_missing):
+    def ee_shared_scaling_features(self, dataframe, scaler, columns_to_drop):
+        """
+        :Method Name: ee_shared_scaling_features
+        :Description: This method scales the union of the columns kept for all the outputs only once and returns
+                      the scaled columns required by each output. A standard scalar works column by column so the
+                      scaled values of a column are the same for every output using it.
+
+        :param dataframe: The dataframe of input features that needs to be scaled
+        :param scaler: The fitted standard scalar saved during training
+        :param columns_to_drop: Dictionary with output number as keys and list of columns to drop as values
+        :return: Dictionary with output number as keys and the scaled dataframe for that output as values
+        :On Failure: Exception
+        """
         try:
             log_file = open(self.log_path, 'a+')
-            dropped_features = []
-            imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
-            for feature in feature_with_missing:
-                if dataframe[feature].isna().mean > 0.75:
-                    dataframe.drop(columns=feature)
-                    dropped_features.append(feature)
-                    message = f" Dropped {feature} as more than 75% values are missing"
-                    self.logger.log(log_file, message)
 
+            kept_columns = {}
+            for output_no, col_to_drop in columns_to_drop.items():
+                kept_columns[output_no] = [col for col in dataframe.columns if col not in col_to_drop]
+            union_columns = [col for col in dataframe.columns
+                             if any(col in columns for columns in kept_columns.values())]
+
+            # The scalar is saved after the last output during training, so without stored feature names its
+            # columns are the ones kept for the last output.
+            scaler_columns = list(getattr(scaler, 'feature_names_in_', kept_columns[max(kept_columns)]))
+            not_scaled = [col for col in union_columns if col not in scaler_columns]
+            if not_scaled:
+                raise ValueError(f"The scalar was not fitted on the columns {not_scaled}")
+
+            positions = [scaler_columns.index(col) for col in union_columns]
+            data = dataframe[union_columns].to_numpy(dtype=np.float64)
+            if scaler.with_mean:
+                data = data - scaler.mean_[positions]
+            if scaler.with_std:
+                data = data / scaler.scale_[positions]
+            scaled_df = pd.DataFrame(data=data, columns=union_columns)
+
+            # An output using all the scaled columns gets the scaled dataframe itself instead of a copy.
+            scaled_features = {}
+            for output_no, columns in kept_columns.items():
+                if columns == union_columns:
+                    scaled_features[output_no] = scaled_df
                 else:
-                    dataframe[feature + 'nan'] = np.where(dataframe[feature].isnull(), 1, 0)
+                    scaled_features[output_no] = scaled_df[columns]
+
+            message = f"The columns {union_columns} have been scaled once for all the outputs using Standard Scalar"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return scaled_features
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to scale data: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_fit_missing_data_imputer(self, dataframe):
+        """
+        :Method Name: ee_fit_missing_data_imputer
+        :Description: This method fits the KNNImputer used to fill the missing values of the prediction data.
+                      The imputer is fitted once on rows sampled from the whole data so that the values imputed
+                      for a row do not depend on how the data is split into chunks or shards.
+
+        :param dataframe: The dataframe of the input features of the sampled rows
+        :return: The fitted KNNImputer
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+            imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
+            imputer.fit(dataframe)
+
+            message = f"KNNImputer fitted on {len(dataframe)} rows"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return imputer
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to fit the imputer: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_handling_missing_data_mcar(self, dataframe, feature_with_missing, imputer=None):
+        """
+        :Method Name: ee_handling_missing_data_mcar
+        :Description: This method fills the missing values of the input features using a KNNImputer. No column
+                      is dropped or added as the scalar and the models need exactly the features they were
+                      trained on.
+
+        :param dataframe: The dataframe of input features with missing values
+        :param feature_with_missing: List of the features with missing values
+        :param imputer: The KNNImputer fitted by ee_fit_missing_data_imputer, if None then one is fitted on the
+                        dataframe itself
+        :return: The imputed dataframe, the imputer and the list of dropped features(always empty)
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+            dropped_features = []
+            if imputer is None:
+                imputer = KNNImputer(n_neighbors=3, weights='uniform', missing_values=np.nan)
+                imputer.fit(dataframe)
 
-            data = imputer.fit_transform(dataframe)
+            data = imputer.transform(dataframe)
             dataframe = pd.DataFrame(data=data, columns=dataframe.columns)
 
-            message = f" missing values imputed using KNNImputer for {list(set(feature_with_missing).symmetric_difference(set(dropped_features)))}"
+            message = f" missing values imputed using KNNImputer for {feature_with_missing}"
             self.logger.log(log_file, message)
 
             log_file.close()
@@ -0,0 +1,92 @@
+import os
+import json
+import math
+import pandas as pd
+from EElogging.EELogger import EELogger
+from EEPrediction.EEValidationError import EEValidationError
+
+
+class EEJsonValidatorPred:
+    """
+    :Class Name: EEJsonValidatorPred
+    :Description: This class is used to validate the rows sent as JSON to the prediction api against the
+                  prediction EESchema. The EESchema is read only once when the object is created so that
+                  the validation of a request is done completely in memory.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, schema_path="EESchema/prediction_schema.json"):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEJsonValidatorPred. Loads the column details from EESchema.
+        :param schema_path: path to the prediction EESchema
+        """
+        self.schema_path = schema_path
+        self.logger = EELogger()
+        if not os.path.isdir("EElogging/prediction/"):
+            os.mkdir("EElogging/prediction/")
+        self.log_path = "EElogging/prediction/EEJsonValidatorPred.txt"
+
+        with open(self.schema_path, 'r') as f:
+            dic = json.load(f)
+
+        self.column_names = list(dic["ColumnNames"].keys())
+        self.column_number = dic["NumberOfColumns"]
+
+    def ee_validate_records(self, body):
+        """
+        :Method Name: ee_validate_records
+        :Description: This method validates the body of a prediction request. The body can be a single row,
+                      a list of rows or a dictionary with the rows under the key 'data'. Every row should have
+                      exactly the columns given in the EESchema and every value should be a finite number.
+
+        :param body: The parsed JSON body of the request
+        :return: pandas dataframe of the rows with the columns in the order given in the EESchema
+        :On Failure: EEValidationError
+        """
+        try:
+            if isinstance(body, dict) and "data" in body:
+                records = body["data"]
+            elif isinstance(body, dict):
+                records = [body]
+            else:
+                records = body
+
+            if not isinstance(records, list) or len(records) == 0:
+                raise EEValidationError("Expected a non empty list of rows")
+
+            expected_columns = set(self.column_names)
+            data = []
+            for row_no, record in enumerate(records):
+                if not isinstance(record, dict):
+                    raise EEValidationError(f"Row {row_no} is not a JSON object")
+
+                if len(record) != self.column_number or set(record.keys()) != expected_columns:
+                    raise EEValidationError(f"Row {row_no} should have exactly the columns {self.column_names}")
+
+                row = []
+                for column in self.column_names:
+                    value = record[column]
+                    # bool is a subclass of int in python and is not accepted as a numerical value.
+                    is_valid = not isinstance(value, bool) and isinstance(value, (int, float))
+                    try:
+                        # A JSON integer too large for a float raises OverflowError.
+                        is_valid = is_valid and math.isfinite(float(value))
+                    except OverflowError:
+                        is_valid = False
+                    if not is_valid:
+                        raise EEValidationError(f"Invalid value {value!r:.50} for column {column} in row {row_no}")
+                    row.append(float(value))
+                data.append(row)
+
+            return pd.DataFrame(data=data, columns=self.column_names)
+
+        except EEValidationError as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Invalid prediction request: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
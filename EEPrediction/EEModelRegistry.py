@@ -0,0 +1,263 @@
+import os
+import re
+import hashlib
+import time
+import threading
+from EElogging.EELogger import EELogger
+from EEFileOperations.EEFileOperations import EEFileOperation
+from EEFileOperations.EECompiledTreeModel import EECompiledTreeModel
+
+
+class EEModelRegistry:
+    """
+    :Class Name: EEModelRegistry
+    :Description: This class keeps all the artifacts required for prediction resident in memory.
+                  The scaler, the clustering models, the model of every cluster and the columns to drop
+                  for each output are loaded once per process so that a prediction only performs
+                  dictionary lookups instead of unpickling files and scanning directories. The artifacts are
+                  read from the model version published last by training and are reloaded in the background
+                  when a newer version is published, so prediction never waits for the new models.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    _registry = None
+    _registry_lock = threading.Lock()
+
+    def __init__(self, models_root="EEModels/", use_compiled=True, pointer_check_interval=1.0):
+        """
+        :Method Name: __init__
+        :Description: This constructor initializes the paths of the saved artifacts and an empty registry.
+        :param models_root: The directory in which all the model versions are stored.
+        :param use_compiled: Whether the tree models exported as node arrays are used instead of the pickled ones
+                             for the small predictions on which they are faster.
+        :param pointer_check_interval: Minimum number of seconds between two checks for a newly published version.
+        """
+        self.models_root = models_root
+        self.use_compiled = use_compiled
+        self.pointer_check_interval = pointer_check_interval
+        self.no_of_outputs = 2
+
+        # Model files are saved as {model_name}_Y{output_no}_cluster_{cluster_no}.pickle during training.
+        self.ml_model_regex = re.compile(r'^(\w+?)_Y(\d+)_cluster_(\d+)\.pickle$')
+        self.compiled_model_regex = re.compile(r'^(\w+?)_Y(\d+)_cluster_(\d+)\.npz$')
+
+        self.logger = EELogger()
+        self.file_operator = EEFileOperation()
+        if not os.path.isdir("EElogging/prediction/"):
+            os.mkdir("EElogging/prediction/")
+        self.log_path = "EElogging/prediction/EEModelRegistry.txt"
+
+        self.load_lock = threading.Lock()
+        self.models = None
+        # Guards last_pointer_check so that only one request per interval checks for a new version.
+        self.pointer_lock = threading.Lock()
+        self.last_pointer_check = 0.0
+        self.reload_thread = None
+
+    @classmethod
+    def ee_get_registry(cls):
+        """
+        :Method Name: ee_get_registry
+        :Description: This method returns the process wide registry, creating it on the first call.
+        :return: The EEModelRegistry shared by the whole process.
+        """
+        if cls._registry is None:
+            with cls._registry_lock:
+                if cls._registry is None:
+                    cls._registry = cls()
+        return cls._registry
+
+    def ee_load_models(self):
+        """
+        :Method Name: ee_load_models
+        :Description: This method loads every artifact required for prediction into memory. All the artifacts
+                      are first loaded into a new dictionary which then replaces the previous one in a single
+                      assignment so that a prediction running in parallel never sees a partially loaded registry.
+        :return: Dictionary with the keys 'version', 'model_dir', 'scaler', 'cluster_models', 'ml_models',
+                 'compiled_models' and 'columns_to_drop'.
+                 'ml_models' and 'compiled_models' are keyed by (output_no, cluster_no) while the others are
+                 keyed by output_no.
+        :On Failure: Exception
+        """
+        try:
+            with self.load_lock:
+                log_file = open(self.log_path, 'a+')
+
+                model_dir, column_to_drop_path = self.ee_resolve_model_dir()
+                ml_model_dir = os.path.join(model_dir, "EEMlmodels/")
+                compiled_dir = os.path.join(model_dir, "EECompiled/")
+                cluster_dir = os.path.join(model_dir, "EEClustering/")
+
+                # The version is obtained before loading so that files written during the load change it again.
+                version = self.ee_model_version(model_dir, column_to_drop_path)
+                scaler = self.file_operator.ee_load_model(os.path.join(model_dir, "scalar.pickle"))
+
+                cluster_models = {}
+                columns_to_drop = {}
+                for output_no in range(1, self.no_of_outputs + 1):
+                    cluster_models[output_no] = self.file_operator.ee_load_model(
+                        os.path.join(cluster_dir, f"clustering_model_Y{output_no}.pickle"))
+
+                    with open(column_to_drop_path.format(output_no), 'r') as f:
+                        val = f.read()
+                    columns_to_drop[output_no] = [col for col in val.split(",") if col]
+
+                # The model directory is scanned only once here instead of once per cluster per prediction.
+                ml_models = {}
+                for filename in os.listdir(ml_model_dir):
+                    match = self.ml_model_regex.match(filename)
+                    if match:
+                        key = (int(match.group(2)), int(match.group(3)))
+                        ml_models[key] = self.file_operator.ee_load_model(os.path.join(ml_model_dir, filename))
+
+                # The node arrays exported for tree models are kept next to the pickled models of the same
+                # cluster as they are only faster on a few rows.
+                compiled_models = {}
+                if self.use_compiled and os.path.isdir(compiled_dir):
+                    for filename in os.listdir(compiled_dir):
+                        match = self.compiled_model_regex.match(filename)
+                        if match:
+                            key = (int(match.group(2)), int(match.group(3)))
+                            compiled_models[key] = EECompiledTreeModel.ee_load(os.path.join(compiled_dir,
+                                                                                            filename))
+
+                self.models = {
+                    "version": version,
+                    "model_dir": model_dir,
+                    "scaler": scaler,
+                    "cluster_models": cluster_models,
+                    "ml_models": ml_models,
+                    "compiled_models": compiled_models,
+                    "columns_to_drop": columns_to_drop
+                }
+
+                message = f"Model registry loaded with {len(ml_models)} cluster models" \
+                          f"({len(compiled_models)} compiled) from {model_dir}, version {version}"
+                self.logger.log(log_file, message)
+                log_file.close()
+
+                return self.models
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while loading the model registry: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_resolve_model_dir(self):
+        """
+        :Method Name: ee_resolve_model_dir
+        :Description: This method finds the directory of the artifacts to be used for prediction. It is the
+                      current version published by training or, for models saved before versioning was
+                      introduced, the models root itself with the columns to drop in the working directory.
+        :return: Tuple of the model directory and the format string of the path of the columns to drop
+        """
+        model_dir = self.file_operator.ee_current_model_dir(self.models_root)
+        if model_dir is None:
+            return self.models_root, "column_to_drop_Y{}.txt"
+        return model_dir, os.path.join(model_dir, "column_to_drop_Y{}.txt")
+
+    def ee_model_version(self, model_dir, column_to_drop_path):
+        """
+        :Method Name: ee_model_version
+        :Description: This method computes the version of the saved artifacts from the names, sizes and
+                      modification times of all the files, so it changes whenever new models are written.
+        :param model_dir: The directory of the artifacts
+        :param column_to_drop_path: The format string of the path of the columns to drop
+        :return: The version as a hexadecimal string
+        """
+        paths = {column_to_drop_path.format(output_no) for output_no in range(1, self.no_of_outputs + 1)}
+        for root, dirs, files in os.walk(model_dir):
+            # The other versions kept next to a legacy layout are not part of it.
+            if root == model_dir and "versions" in dirs:
+                dirs.remove("versions")
+            paths.update(os.path.join(root, filename) for filename in files)
+
+        digest = hashlib.sha1()
+        for path in sorted(paths):
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()
+
+    def ee_get_models(self):
+        """
+        :Method Name: ee_get_models
+        :Description: This method returns the resident artifacts, loading them if it has not been done yet.
+                      At most once every pointer_check_interval seconds it also checks whether training has
+                      published a new version, in which case the new version is loaded in a background thread
+                      while the previous artifacts keep serving. Models saved before versioning was introduced
+                      are overwritten in place by training, so for them the version is computed again from the
+                      files.
+        :return: Dictionary of loaded artifacts as described in ee_load_models
+        :On Failure: Exception
+        """
+        models = self.models
+        if models is None:
+            return self.ee_load_models()
+
+        with self.pointer_lock:
+            now = time.monotonic()
+            if now - self.last_pointer_check < self.pointer_check_interval:
+                return models
+            self.last_pointer_check = now
+
+        model_dir, column_to_drop_path = self.ee_resolve_model_dir()
+        if model_dir != models["model_dir"]:
+            self.ee_reload_in_background()
+        elif model_dir == self.models_root and \
+                self.ee_model_version(model_dir, column_to_drop_path) != models["version"]:
+            # The new version also clears the predictions cached with the previous models.
+            self.ee_reload_in_background()
+        return models
+
+    def ee_reload_in_background(self):
+        """
+        :Method Name: ee_reload_in_background
+        :Description: This method starts loading the current version in a background thread unless a reload is
+                      already running. A failed reload is logged by ee_load_models and the previous artifacts
+                      stay in use.
+        :return: None
+        """
+        with self.load_lock:
+            if self.reload_thread is not None and self.reload_thread.is_alive():
+                return
+
+            def reload():
+                try:
+                    self.ee_load_models()
+                except Exception:
+                    pass
+
+            self.reload_thread = threading.Thread(target=reload, name="EEModelRegistryReload", daemon=True)
+            self.reload_thread.start()
+
+    def ee_get_ml_model(self, models, output_no, cluster_no, no_of_rows=None):
+        """
+        :Method Name: ee_get_ml_model
+        :Description: This method returns the model trained for the given output and cluster. The model exported
+                      as node arrays is returned instead of the pickled one when it is faster on no_of_rows rows.
+        :param models: Dictionary of loaded artifacts obtained from ee_get_models
+        :param output_no: The output(1 for Y1, 2 for Y2) for which the model is required
+        :param cluster_no: The cluster for which the model is required
+        :param no_of_rows: The number of rows the model will predict on, if None then the pickled model is returned
+        :return: The trained model
+        :On Failure: KeyError
+        """
+        try:
+            key = (int(output_no), int(cluster_no))
+            compiled_model = models["compiled_models"].get(key)
+            if compiled_model is not None and no_of_rows is not None and compiled_model.ee_use_for(no_of_rows):
+                return compiled_model
+            return models["ml_models"][key]
+
+        except KeyError:
+            log_file = open(self.log_path, 'a+')
+            message = f"No Model Found for output Y{output_no} cluster {cluster_no}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise KeyError(message)
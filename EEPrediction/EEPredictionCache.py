@@ -0,0 +1,121 @@
+import os
+import threading
+from collections import OrderedDict
+from EElogging.EELogger import EELogger
+
+
+class EEPredictionCache:
+    """
+    :Class Name: EEPredictionCache
+    :Description: This class is a bounded least recently used cache of predictions. An entry is keyed by the
+                  raw values of an input row together with the version of the models which predicted it, so a
+                  row sent again skips the scaling, clustering and prediction entirely. All the entries are
+                  dropped when the version of the models changes.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    _cache = None
+    _cache_lock = threading.Lock()
+
+    def __init__(self, capacity=10000):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEPredictionCache.
+        :param capacity: The maximum number of rows kept in the cache, 0 disables the cache
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.model_version = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.logger = EELogger()
+        if not os.path.isdir("EElogging/prediction/"):
+            os.mkdir("EElogging/prediction/")
+        self.log_path = "EElogging/prediction/EEPredictionCache.txt"
+
+    @classmethod
+    def ee_get_cache(cls):
+        """
+        :Method Name: ee_get_cache
+        :Description: This method returns the process wide cache, creating it on the first call with the capacity
+                      given by the environment variable EE_PREDICTION_CACHE_SIZE.
+        :return: The EEPredictionCache shared by the whole process.
+        """
+        if cls._cache is None:
+            with cls._cache_lock:
+                if cls._cache is None:
+                    cls._cache = cls(capacity=int(os.getenv("EE_PREDICTION_CACHE_SIZE", 10000)))
+        return cls._cache
+
+    def ee_get_many(self, keys, model_version):
+        """
+        :Method Name: ee_get_many
+        :Description: This method looks up the predictions of the given rows. If the models have changed since
+                      the entries were stored, the cache is cleared first.
+        :param keys: List of keys of the rows(bytes of the raw row values)
+        :param model_version: The version of the models currently used for prediction
+        :return: List with the cached prediction of every row or None where the row is not cached
+        """
+        with self.lock:
+            if model_version != self.model_version:
+                if self.entries:
+                    log_file = open(self.log_path, 'a+')
+                    message = f"Prediction cache of {len(self.entries)} rows cleared as the models changed"
+                    self.logger.log(log_file, message)
+                    log_file.close()
+                self.entries.clear()
+                self.model_version = model_version
+
+            values = []
+            for key in keys:
+                value = self.entries.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                values.append(value)
+            return values
+
+    def ee_put_many(self, keys, values, model_version):
+        """
+        :Method Name: ee_put_many
+        :Description: This method stores the predictions of the given rows evicting the least recently used
+                      rows once the capacity is reached.
+        :param keys: List of keys of the rows
+        :param values: List of predictions of the rows
+        :param model_version: The version of the models which made the predictions
+        :return: None
+        """
+        with self.lock:
+            # Predictions made with models which have been replaced in the meantime are not stored.
+            if self.capacity <= 0 or model_version != self.model_version:
+                return
+            for key, value in zip(keys, values):
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def ee_clear(self):
+        """
+        :Method Name: ee_clear
+        :Description: This method removes all the entries from the cache.
+        :return: None
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def ee_stats(self):
+        """
+        :Method Name: ee_stats
+        :Description: This method returns the counters of the cache.
+        :return: Dictionary with the capacity, size, hits and misses of the cache
+        """
+        with self.lock:
+            return {"capacity": self.capacity, "size": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -1,25 +1,33 @@
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 from EElogging.EELogger import EELogger
-from EEFileOperations.EEFileOperations import EEFileOperation
 from EEPrediction.EEDataLoaderPred import EEDataLoaderPred
 from EEPrediction.EEEDAPred import EEPredEda
 from EEPrediction.EEFeatureEngineeringPred import EEFeatureEngineeringPred
 from EEPrediction.EEFeatureSelectionPred import EEFeatureSelectionPred
+from EEPrediction.EEModelRegistry import EEModelRegistry
+from EEPrediction.EEPredictionCache import EEPredictionCache
 
 
 class EEPredictionPipeline:
 
+    # The imputer fitted on the prediction data, set in every worker process of ee_predict_parallel.
+    worker_imputer = None
+    # Maximum number of rows the imputer of the missing values is fitted on, it keeps all of them in memory.
+    imputer_sample_size = 100000
+
     def __init__(self):
         if not os.path.isdir("EElogging/prediction/"):
             os.mkdir("EElogging/prediction/")
         self.log_path = "EElogging/prediction//EEPredictionPipeline.txt"
         self.logger = EELogger()
-        self.model_dir = "EEModels/EEMlmodels/"
-        self.cluster_dir = "EEModels/EEClustering/"
+        self.model_registry = EEModelRegistry.ee_get_registry()
+        self.prediction_cache = EEPredictionCache.ee_get_cache()
 
     def ee_predict(self):
         try:
@@ -34,6 +42,228 @@ class EEPredictionPipeline:
             message = f"EEPrediction data obtained"
             self.logger.log(log_file, message)
 
+            prediction_data = self.ee_predict_dataframe(prediction_data)
+
+            prediction_data = prediction_data.round(2)
+            prediction_data = prediction_data.drop(columns=["ID"])
+            prediction_data.to_csv("prediction_result.csv", header=True, index=False)
+
+            message = "End of EEPrediction Pipeline"
+            self.logger.log(log_file, message)
+            log_file.close()
+
+            return json.loads(prediction_data.to_json(orient="records"))
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to scale data: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_predict_stream(self, chunk_size=100000):
+        """
+        :Method Name: ee_predict_stream
+        :Description: This method performs the prediction on the prediction file chunk by chunk. The scaling,
+                      cluster assignment and prediction is done for each chunk and the result is appended to
+                      prediction_result.csv, so the memory used by the prediction does not depend on the size
+                      of the file. If values are missing, the imputer is fitted once on a sample of at most
+                      imputer_sample_size rows of the whole file, read in a first pass over the chunks, so that
+                      the neighbours of a row are searched in the whole file. Up to imputer_sample_size rows the
+                      result is the same as ee_predict.
+
+        :param chunk_size: The number of rows predicted at a time
+        :return: The number of rows predicted
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+            message = f"Start of streaming EEPrediction Pipeline with chunks of {chunk_size} rows"
+            self.logger.log(log_file, message)
+
+            data_loader = EEDataLoaderPred()
+            no_of_rows = 0
+            imputer = self.ee_fit_prediction_imputer(data_loader.ee_get_data_chunks(chunk_size))
+
+            for chunk in data_loader.ee_get_data_chunks(chunk_size):
+                chunk = self.ee_predict_dataframe(chunk, imputer=imputer)
+                chunk = chunk.round(2)
+                chunk = chunk.drop(columns=["ID"])
+
+                # The header is written only with the first chunk and the rest are appended.
+                if no_of_rows == 0:
+                    chunk.to_csv("prediction_result.csv", header=True, index=False, mode='w')
+                else:
+                    chunk.to_csv("prediction_result.csv", header=False, index=False, mode='a')
+                no_of_rows += len(chunk)
+
+            message = f"End of streaming EEPrediction Pipeline, {no_of_rows} rows predicted"
+            self.logger.log(log_file, message)
+            log_file.close()
+
+            return no_of_rows
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to predict in chunks: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_predict_parallel(self, n_workers=None, shard_size=10000):
+        """
+        :Method Name: ee_predict_parallel
+        :Description: This method splits the prediction data into shards which are predicted in parallel by a
+                      pool of processes. Every process loads the models only once when it starts and the
+                      predictions are put back together in the original order of the rows. The imputer of the
+                      missing values is fitted once on a sample of at most imputer_sample_size rows and sent to
+                      every process when it starts.
+
+        :param n_workers: The number of processes used, if None then the environment variable
+                          EE_PREDICTION_WORKERS or else the number of cpus is used.
+        :param shard_size: The number of rows sent to a process at a time
+        :return: List of dictionaries with the inputs and the predicted Y1 and Y2 of every row
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            if n_workers is None:
+                n_workers = int(os.getenv("EE_PREDICTION_WORKERS", os.cpu_count() or 1))
+
+            message = f"Start of parallel EEPrediction Pipeline with {n_workers} workers"
+            self.logger.log(log_file, message)
+
+            data_loader = EEDataLoaderPred()
+            prediction_data = data_loader.ee_get_data()
+
+            no_of_shards = -(-len(prediction_data) // shard_size)
+            if n_workers <= 1 or no_of_shards <= 1:
+                prediction_data = self.ee_predict_dataframe(prediction_data)
+            else:
+                shards = [prediction_data.iloc[i * shard_size:(i + 1) * shard_size] for i in range(no_of_shards)]
+                # Only the sampled rows kept by the imputer are copied to every process, not the whole data.
+                imputer = self.ee_fit_prediction_imputer(shards)
+
+                # map returns the results in the order the shards were submitted in.
+                with ProcessPoolExecutor(max_workers=n_workers,
+                                         initializer=EEPredictionPipeline.ee_init_prediction_worker,
+                                         initargs=(imputer,)) as executor:
+                    results = list(executor.map(EEPredictionPipeline.ee_predict_shard, shards))
+
+                prediction_data = prediction_data.assign(Y1=np.concatenate([result[0] for result in results]),
+                                                         Y2=np.concatenate([result[1] for result in results]))
+
+            prediction_data = prediction_data.round(2)
+            prediction_data = prediction_data.drop(columns=["ID"])
+            prediction_data.to_csv("prediction_result.csv", header=True, index=False)
+
+            message = f"End of parallel EEPrediction Pipeline, {len(prediction_data)} rows predicted"
+            self.logger.log(log_file, message)
+            log_file.close()
+
+            return json.loads(prediction_data.to_json(orient="records"))
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to predict in parallel: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    @staticmethod
+    def ee_init_prediction_worker(imputer=None):
+        """
+        :Method Name: ee_init_prediction_worker
+        :Description: This method is run once by every worker process of ee_predict_parallel. It loads the models
+                      and limits every model to a single thread as the parallelism comes from the processes.
+        :param imputer: The imputer fitted on the prediction data or None if no value is missing
+        :return: None
+        """
+        EEPredictionPipeline.worker_imputer = imputer
+        models = EEModelRegistry.ee_get_registry().ee_get_models()
+        for model in models["ml_models"].values():
+            if hasattr(model, "get_params") and "n_jobs" in model.get_params():
+                model.set_params(n_jobs=1)
+
+    @staticmethod
+    def ee_predict_shard(shard):
+        """
+        :Method Name: ee_predict_shard
+        :Description: This method predicts a single shard inside a worker process of ee_predict_parallel.
+        :param shard: pandas dataframe with an 'ID' column and the input features
+        :return: Tuple of numpy arrays with the predicted Y1 and Y2
+        """
+        shard = EEPredictionPipeline().ee_predict_dataframe(shard, imputer=EEPredictionPipeline.worker_imputer)
+        return shard['Y1'].to_numpy(), shard['Y2'].to_numpy()
+
+    def ee_fit_prediction_imputer(self, data_chunks):
+        """
+        :Method Name: ee_fit_prediction_imputer
+        :Description: This method fits the imputer of the missing values on the prediction data so that the chunks
+                      or shards predicted separately are imputed alike. The chunks are scanned one at a time for
+                      missing values while a uniform sample of at most imputer_sample_size rows is kept: every row
+                      gets a random key and the rows with the smallest keys are kept. The keys are drawn row after
+                      row from a fixed seed, so the sample does not depend on the size of the chunks and it is all
+                      the rows when the data is not larger than the sample.
+
+        :param data_chunks: Iterable of pandas dataframes with an 'ID' column and the input features
+        :return: The fitted imputer or None if no value is missing
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            feature_selector = EEFeatureSelectionPred()
+            random_state = np.random.RandomState(0)
+            is_null_present = False
+            sample, sample_keys = None, np.empty(0)
+
+            for chunk in data_chunks:
+                inputs = feature_selector.ee_remove_columns(chunk, 'ID')
+                is_null_present = is_null_present or bool(inputs.isna().to_numpy().any())
+
+                keys = np.concatenate([sample_keys, random_state.random_sample(len(inputs))])
+                rows = inputs if sample is None else pd.concat([sample, inputs], ignore_index=True)
+                if len(rows) > self.imputer_sample_size:
+                    kept = np.sort(np.argpartition(keys, self.imputer_sample_size)[:self.imputer_sample_size])
+                    rows, keys = rows.iloc[kept].reset_index(drop=True), keys[kept]
+                sample, sample_keys = rows, keys
+
+            if not is_null_present:
+                message = "No missing values found in the prediction data, no imputer fitted"
+                self.logger.log(log_file, message)
+                log_file.close()
+                return None
+
+            message = f"Missing values found in the prediction data, imputer fitted on a sample of {len(sample)} rows"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return EEFeatureEngineeringPred().ee_fit_missing_data_imputer(sample)
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"Error while trying to fit the imputer: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_predict_dataframe(self, prediction_data, models=None, imputer=None):
+        """
+        :Method Name: ee_predict_dataframe
+        :Description: This method performs the preprocessing, clustering and prediction of both the outputs
+                      on data which is already in memory.
+
+        :param prediction_data: pandas dataframe with an 'ID' column and the input features
+        :param models: The artifacts obtained from the model registry, if None the current ones are used
+        :param imputer: The imputer obtained from ee_fit_prediction_imputer, if None then the missing values are
+                        imputed from the rows of prediction_data only
+        :return: prediction_data with the predicted Y1 and Y2 columns added
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
             # DATA PROCESSING
             message = f"Data Preprocessing started"
             self.logger.log(log_file, message)
@@ -41,7 +271,8 @@ class EEPredictionPipeline:
             eda = EEPredEda()
             feature_engineer = EEFeatureEngineeringPred()
             feature_selector = EEFeatureSelectionPred()
-            file_operator = EEFileOperation()
+            if models is None:
+                models = self.model_registry.ee_get_models()
 
             inputs = feature_selector.ee_remove_columns(prediction_data, 'ID')
 
@@ -49,48 +280,73 @@ class EEPredictionPipeline:
 
             if is_null_present:
                 inputs, imputer, dropped_features = feature_engineer.ee_handling_missing_data_mcar(inputs,
-                                                                                                   columns_with_null)
+                                                                                                   columns_with_null,
+                                                                                                   imputer)
 
-            features = [inputs, inputs]
+            # The union of the columns kept for Y1 and Y2 is scaled only once and shared by both the outputs.
+            features = feature_engineer.ee_shared_scaling_features(inputs, models["scaler"],
+                                                                   models["columns_to_drop"])
+            outputs = {}
 
             for j in range(2):
 
-                with open(f"column_to_drop_Y{j + 1}.txt", 'r') as f:
-                    val = f.read()
+                kmeans = models["cluster_models"][j + 1]
+                clusters = kmeans.predict(features[j + 1])
 
-                col_to_drop = val.split(",")
+                # The row indices of every cluster are gathered once using a stable sort on the cluster labels.
+                # The predictions of each cluster are then scattered into a preallocated array, so the rows keep
+                # their original order without building lists of (ID, prediction) or merging on 'ID'.
+                outputs[f'Y{j + 1}'] = np.empty(len(clusters), dtype=np.float64)
+                order = np.argsort(clusters, kind='stable')
+                cluster_numbers, starts = np.unique(clusters[order], return_index=True)
 
-                features[j] = feature_selector.ee_remove_columns(features[j], col_to_drop)
-                scalar = file_operator.ee_load_model("EEModels/scalar.pickle")
-                features[j] = pd.DataFrame(data=scalar.transform(features[j]), columns=features[j].columns)
+                for i, rows in zip(cluster_numbers, np.split(order, starts[1:])):
+                    model = self.model_registry.ee_get_ml_model(models, j + 1, i, no_of_rows=len(rows))
+                    outputs[f'Y{j + 1}'][rows] = model.predict(features[j + 1].iloc[rows])
 
-                kmeans = file_operator.ee_load_model(f"EEModels/EEClustering/clustering_model_Y{j + 1}.pickle")
-
-                features[j]["clusters"] = kmeans.predict(features[j])
-                features[j]['ID'] = prediction_data['ID']
-                result = []
-                for i in features[j]["clusters"].unique():
-                    cluster_data = features[j][features[j]["clusters"] == i]
-                    id = cluster_data['ID']
-                    cluster_data = cluster_data.drop(columns=["clusters", 'ID'])
-                    model = file_operator.ee_load_ml_model(j + 1, i)
-                    pred_result = list(model.predict(cluster_data))
-                    result.extend(list(zip(id, pred_result)))
-
-                res_dataframe = pd.DataFrame(data=result, columns=["ID", f'Y{j + 1}'])
-                prediction_data = prediction_data.merge(right=res_dataframe, on='ID', how='outer')
-            prediction_data = prediction_data.round(2)
-            prediction_data = prediction_data.drop(columns=["ID"])
-            prediction_data.to_csv("prediction_result.csv", header=True, index=False)
+            prediction_data = prediction_data.assign(**outputs)
 
-            message = "End of EEPrediction Pipeline"
+            message = f"Prediction done for {len(prediction_data)} rows"
             self.logger.log(log_file, message)
+            log_file.close()
 
-            return json.loads(prediction_data.to_json(orient="records"))
+            return prediction_data
 
         except Exception as e:
             log_file = open(self.log_path, 'a+')
-            message = f"Error while trying to scale data: {str(e)}"
+            message = f"Error while trying to predict on the data: {str(e)}"
             self.logger.log(log_file, message)
             log_file.close()
             raise e
+
+    def ee_predict_json(self, inputs):
+        """
+        :Method Name: ee_predict_json
+        :Description: This method is used by the JSON api to predict directly on validated inputs using the
+                      resident models. No file is read or written so that the latency stays low. Rows predicted
+                      before with the same models are taken from the prediction cache and only the remaining
+                      rows are predicted.
+
+        :param inputs: pandas dataframe of validated input features(X1-X8)
+        :return: List of dictionaries with the predicted Y1 and Y2 of every row in the same order as the inputs
+        :On Failure: Exception
+        """
+        models = self.model_registry.ee_get_models()
+
+        keys = [row.tobytes() for row in inputs.to_numpy(dtype=np.float64)]
+        predictions = self.prediction_cache.ee_get_many(keys, models["version"])
+        missing_rows = [i for i, prediction in enumerate(predictions) if prediction is None]
+
+        if missing_rows:
+            prediction_data = inputs.iloc[missing_rows].reset_index(drop=True)
+            prediction_data.insert(0, 'ID', range(len(prediction_data)))
+
+            prediction_data = self.ee_predict_dataframe(prediction_data, models=models)
+            new_predictions = list(zip(prediction_data['Y1'].tolist(), prediction_data['Y2'].tolist()))
+
+            self.prediction_cache.ee_put_many([keys[i] for i in missing_rows], new_predictions, models["version"])
+            for i, prediction in zip(missing_rows, new_predictions):
+                predictions[i] = prediction
+
+        predictions = np.round(np.array(predictions, dtype=np.float64), 2)
+        return [{"Y1": y1, "Y2": y2} for y1, y2 in predictions.tolist()]
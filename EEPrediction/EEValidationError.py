@@ -0,0 +1,11 @@
+class EEValidationError(ValueError):
+    """
+    :Class Name: EEValidationError
+    :Description: This exception is raised when the rows sent to the prediction api do not match the prediction
+                  EESchema. It is the only error answered as a bad request, every other error is a fault of the
+                  server(eg. models which can not be loaded).
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
@@ -0,0 +1,87 @@
+import time
+import numpy as np
+# The successive halving searches are still experimental in scikit-learn and have to be enabled explicitly.
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection._search_successive_halving import BaseSuccessiveHalving
+
+
+class EEBudgetedHalvingSearchCV(BaseSuccessiveHalving):
+    """
+    :Class Name: EEBudgetedHalvingSearchCV
+    :Description: This class is a successive halving search over a fixed list of candidates which stops starting
+                  new rounds once a wall clock deadline has passed. The first round is always evaluated, so the
+                  search ends with the best candidate of the last round evaluated until then, refitted like
+                  HalvingGridSearchCV.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Newer versions of scikit-learn validate the parameters of a search against these constraints.
+    _parameter_constraints = {**getattr(BaseSuccessiveHalving, "_parameter_constraints", {}),
+                              "candidates": "no_validation", "deadline": "no_validation"}
+
+    def __init__(self, estimator, candidates, deadline, *, factor=3, resource="n_samples", max_resources="auto",
+                 min_resources="exhaust", aggressive_elimination=False, cv=5, scoring=None, refit=True,
+                 error_score=np.nan, return_train_score=True, random_state=None, n_jobs=None, verbose=0):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEBudgetedHalvingSearchCV.
+        :param estimator: The sklearn model to be searched
+        :param candidates: List of dictionaries with the parameters of every candidate
+        :param deadline: The time(as given by time.time()) after which no new round of halving is started
+        :param factor: The fraction(1/factor) of candidates kept after every round
+        :param resource: 'n_samples' or the parameter grown every round(eg. n_estimators)
+        :param max_resources: The largest amount of the resource given to a candidate
+        :param min_resources: The amount of the resource given to every candidate in the first round
+        :param aggressive_elimination: The aggressive_elimination of HalvingGridSearchCV
+        :param cv: The cross validation splitter
+        :param scoring: The scoring of HalvingGridSearchCV
+        :param refit: The refit of HalvingGridSearchCV
+        :param error_score: The score of a candidate which could not be fitted
+        :param return_train_score: Whether the scores on the training folds are computed
+        :param random_state: The random state used to subsample the rows
+        :param n_jobs: The number of cpus used
+        :param verbose: The verbosity of HalvingGridSearchCV
+        """
+        super().__init__(estimator, scoring=scoring, n_jobs=n_jobs, refit=refit, cv=cv, verbose=verbose,
+                         random_state=random_state, error_score=error_score, return_train_score=return_train_score,
+                         max_resources=max_resources, resource=resource, factor=factor, min_resources=min_resources,
+                         aggressive_elimination=aggressive_elimination)
+        self.candidates = candidates
+        self.deadline = deadline
+
+    def _generate_candidate_params(self):
+        """
+        :Method Name: _generate_candidate_params
+        :Description: This method returns the candidates of the first round.
+        :return: List of dictionaries with the parameters of every candidate
+        """
+        return self.candidates
+
+    def _run_search(self, evaluate_candidates, *, callback_ctx=None):
+        """
+        :Method Name: _run_search
+        :Description: This method is called by fit and runs the rounds of halving, skipping the rounds started
+                      after the deadline. A skipped round keeps no candidate, so the best candidate is chosen from
+                      the last round evaluated. It sets n_iterations_evaluated_ and cut_short_.
+        :param evaluate_candidates: Function of BaseSearchCV evaluating a list of candidates
+        :param callback_ctx: The callback context given by newer versions of scikit-learn
+        :return: None
+        """
+        self.n_iterations_evaluated_ = 0
+        results = None
+
+        def evaluate_before_deadline(candidate_params, cv, **evaluate_kwargs):
+            nonlocal results
+            if results is None or (len(candidate_params) > 0 and time.time() < self.deadline):
+                results = evaluate_candidates(candidate_params, cv, **evaluate_kwargs)
+                self.n_iterations_evaluated_ += 1
+            return results
+
+        if callback_ctx is None:
+            super()._run_search(evaluate_before_deadline)
+        else:
+            super()._run_search(evaluate_before_deadline, callback_ctx=callback_ctx)
+        self.cut_short_ = self.n_iterations_evaluated_ < self.n_iterations_
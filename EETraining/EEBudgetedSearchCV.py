@@ -0,0 +1,63 @@
+import time
+import numpy as np
+from sklearn.model_selection._search import BaseSearchCV
+
+
+class EEBudgetedSearchCV(BaseSearchCV):
+    """
+    :Class Name: EEBudgetedSearchCV
+    :Description: This class is a hyperparameter search over a fixed list of candidates which stops starting new
+                  candidates once a wall clock deadline has passed. The candidates are evaluated in batches and
+                  the first batch is always evaluated, so the search ends with the best of the candidates
+                  evaluated until then, refitted like GridSearchCV.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    # Newer versions of scikit-learn validate the parameters of a search against these constraints.
+    _parameter_constraints = {**getattr(BaseSearchCV, "_parameter_constraints", {}),
+                              "candidates": "no_validation", "deadline": "no_validation",
+                              "batch_size": "no_validation"}
+
+    def __init__(self, estimator, candidates, deadline, batch_size=8, *, scoring=None, n_jobs=None, refit=True,
+                 cv=None, verbose=0, pre_dispatch="2*n_jobs", error_score=np.nan, return_train_score=False):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEBudgetedSearchCV.
+        :param estimator: The sklearn model to be searched
+        :param candidates: List of dictionaries with the parameters of every candidate
+        :param deadline: The time(as given by time.time()) after which no new batch of candidates is started
+        :param batch_size: The number of candidates evaluated at a time
+        :param scoring: The scoring of GridSearchCV
+        :param n_jobs: The number of cpus used
+        :param refit: The refit of GridSearchCV
+        :param cv: The cross validation splitter
+        :param verbose: The verbosity of GridSearchCV
+        :param pre_dispatch: The pre_dispatch of GridSearchCV
+        :param error_score: The score of a candidate which could not be fitted
+        :param return_train_score: Whether the scores on the training folds are computed
+        """
+        super().__init__(estimator=estimator, scoring=scoring, n_jobs=n_jobs, refit=refit, cv=cv, verbose=verbose,
+                         pre_dispatch=pre_dispatch, error_score=error_score, return_train_score=return_train_score)
+        self.candidates = candidates
+        self.deadline = deadline
+        self.batch_size = batch_size
+
+    def _run_search(self, evaluate_candidates):
+        """
+        :Method Name: _run_search
+        :Description: This method is called by fit and evaluates the candidates batch by batch until all of them
+                      are evaluated or the deadline has passed. It sets n_candidates_evaluated_ and cut_short_.
+        :param evaluate_candidates: Function of BaseSearchCV evaluating a list of candidates
+        :return: None
+        """
+        self.n_candidates_evaluated_ = 0
+        for start in range(0, len(self.candidates), self.batch_size):
+            if start > 0 and time.time() >= self.deadline:
+                break
+            batch = self.candidates[start:start + self.batch_size]
+            evaluate_candidates(batch)
+            self.n_candidates_evaluated_ += len(batch)
+        self.cut_short_ = self.n_candidates_evaluated_ < len(self.candidates)
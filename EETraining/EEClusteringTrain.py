@@ -1,5 +1,7 @@
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from kneed import KneeLocator
+from joblib import Parallel, delayed, effective_n_jobs
+from threadpoolctl import threadpool_limits
 import os
 from EElogging.EELogger import EELogger
 from EEFileOperations.EEFileOperations import EEFileOperation
@@ -16,11 +18,18 @@ class EEClusteringTrain:
     Version: 1.0
     """
 
-    def __init__(self):
+    def __init__(self, fast=False, n_jobs=-1, sample_rows=None, mini_batch_rows=None):
         """
         :Method Name: __init__
         :Description: This method is Constructor for class EEFeatureSelectionTrain.
                       Initializes variables for logging
+        :param fast: If True then the models of all the cluster values are fitted at the same time and the model
+                     of the optimum cluster value is reused by ee_create_cluster instead of being fitted again.
+        :param n_jobs: The number of cpus used by the fast mode, shared by the models fitted at the same time
+        :param sample_rows: In the fast mode, if the data has more rows than this then the models are fitted on a
+                            random sample of this many rows, if None then all the rows are used.
+        :param mini_batch_rows: In the fast mode, if the data(or its sample) has more rows than this then
+                                MiniBatchKMeans is used instead of KMeans, if None then KMeans is always used.
         """
         self.logger = EELogger()
         if not os.path.isdir("EElogging/training/"):
@@ -30,6 +39,15 @@ class EEClusteringTrain:
 
         self.file_op = EEFileOperation()
 
+        self.fast = fast
+        self.n_jobs = n_jobs
+        self.sample_rows = sample_rows
+        self.mini_batch_rows = mini_batch_rows
+        # Models fitted by the fast mode of ee_obtain_optimum_cluster, by cluster value, and the columns and number
+        # of rows of the data they were fitted on.
+        self.fitted_models = {}
+        self.fitted_data = None
+
     def ee_obtain_optimum_cluster(self, dataframe):
         """
         :Method Name: ee_obtain_optimum_cluster
@@ -46,11 +64,14 @@ class EEClusteringTrain:
             # within cluster sum of squares: For evaluating the knee point so that no. of clusters can be determined
             wcss = []
 
-            for i in range(1, 11):
-                # initializer is k-means++ so that there is some minimum distance between randomly initialized centroid.
-                kmeans = KMeans(n_clusters=i, init='k-means++', random_state=42)
-                kmeans.fit(dataframe)
-                wcss.append(kmeans.inertia_)
+            if self.fast:
+                wcss = self.ee_fit_cluster_models(dataframe, range(1, 11))
+            else:
+                for i in range(1, 11):
+                    # initializer is k-means++ so that there is some minimum distance between randomly initialized centroid.
+                    kmeans = KMeans(n_clusters=i, init='k-means++', random_state=42)
+                    kmeans.fit(dataframe)
+                    wcss.append(kmeans.inertia_)
 
             # KneeLocator mathematically determines the knee point so that the task of selecting the optimum no of
             # cluster can automated.
@@ -81,13 +102,24 @@ class EEClusteringTrain:
         """
         try:
             log_file = open(self.log_path, 'a+')
-            k_mean_model = KMeans(n_clusters=number_of_clusters, init='k-means++', random_state=42)
 
-            # Adds a new column to the dataframe which identifies the cluster to which that data point belongs to.
-            dataframe['cluster'] = k_mean_model.fit_predict(dataframe)
+            if number_of_clusters in self.fitted_models and \
+                    self.fitted_data == (list(dataframe.columns), len(dataframe)):
+                # The model fitted while obtaining the optimum cluster value is reused.
+                k_mean_model = self.fitted_models[number_of_clusters]
+                dataframe['cluster'] = k_mean_model.predict(dataframe)
+
+                message = f"Reusing the clustering model with {number_of_clusters} clusters"
+                self.logger.log(log_file, message)
+            else:
+                k_mean_model = KMeans(n_clusters=number_of_clusters, init='k-means++', random_state=42)
+
+                # Adds a new column to the dataframe which identifies the cluster to which that data point belongs to.
+                dataframe['cluster'] = k_mean_model.fit_predict(dataframe)
 
             message = "EEClustering has been done, with cluster column added to dataset"
             self.logger.log(log_file, message)
+            log_file.close()
 
             return k_mean_model, dataframe
 
@@ -98,6 +130,73 @@ class EEClusteringTrain:
             log_file.close()
             raise e
 
+    def ee_fit_cluster_models(self, dataframe, cluster_values):
+        """
+        :Method Name: ee_fit_cluster_models
+        :Description: This method fits a clustering model for every cluster value at the same time, on a sample
+                      of the data if it is larger than sample_rows and with MiniBatchKMeans if it is larger than
+                      mini_batch_rows. The models are kept for ee_create_cluster.
 
+        :param dataframe: The dataframe representing the data from the client after
+                          all the preprocessing has been done
+        :param cluster_values: The cluster values whose models are fitted
+        :return: List of the within cluster sum of squares of every cluster value on the whole data
+        :On Failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
 
+            data = dataframe
+            if self.sample_rows is not None and len(dataframe) > self.sample_rows:
+                data = dataframe.sample(n=self.sample_rows, random_state=42)
+
+            if self.mini_batch_rows is not None and len(data) > self.mini_batch_rows:
+                models = [MiniBatchKMeans(n_clusters=i, init='k-means++', random_state=42, n_init=3)
+                          for i in cluster_values]
+            else:
+                models = [KMeans(n_clusters=i, init='k-means++', random_state=42) for i in cluster_values]
+
+            # The fits release the GIL in their numerical loops, so threads avoid copying the data to processes.
+            # Every fit would otherwise start one OpenMP thread per cpu, so the cpus are divided between the fits.
+            n_parallel = min(len(models), effective_n_jobs(self.n_jobs))
+            n_threads = max(1, effective_n_jobs(self.n_jobs) // n_parallel)
+            models = Parallel(n_jobs=n_parallel, prefer="threads")(
+                delayed(self.ee_fit_with_threads)(model, data, n_threads) for model in models)
+
+            # The wcss of models fitted on a sample is computed on the whole data so that the knee point is found
+            # on the same curve as without sampling.
+            if data is dataframe:
+                wcss = [model.inertia_ for model in models]
+            else:
+                wcss = [-model.score(dataframe) for model in models]
+
+            self.fitted_models = dict(zip(cluster_values, models))
+            self.fitted_data = (list(dataframe.columns), len(dataframe))
+
+            message = f"{len(models)} clustering models of type {type(models[0]).__name__} fitted on {len(data)} of " \
+                      f"{len(dataframe)} rows"
+            self.logger.log(log_file, message)
+            log_file.close()
+            return wcss
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"There was an ERROR while fitting the clustering models: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
 
+    @staticmethod
+    def ee_fit_with_threads(model, data, n_threads):
+        """
+        :Method Name: ee_fit_with_threads
+        :Description: This method fits a clustering model using at most n_threads OpenMP threads. It runs in a
+                      thread of ee_fit_cluster_models and the limit only applies to the calling thread.
+
+        :param model: The clustering model to be fitted
+        :param data: The data the model is fitted on
+        :param n_threads: The maximum number of OpenMP threads used by the fit
+        :return: The fitted model
+        """
+        with threadpool_limits(limits=n_threads, user_api="openmp"):
+            return model.fit(data)
@@ -5,6 +5,10 @@ import shutil
 import pandas as pd
 from datetime import datetime
 from EElogging.EELogger import EELogger
+from EEFileOperations.EEWorkbookCache import EEWorkbookCache
+from EEFileOperations.EEStreamingReader import EEStreamingReader
+from EEFileOperations.EEParallelValidator import EEParallelValidator
+from EEFileOperations.EEFileOperations import EEFileOperation
 
 
 class EEDataFormatTrain:
@@ -16,16 +20,21 @@ class EEDataFormatTrain:
     Interning at iNeuron Intelligence
     Version: 1.0
     """
-    def __init__(self, path):
+    def __init__(self, path, workbook_cache=None):
         """
         :Method Name: __init__
         :Description: The constructor of class EEDataFormatTrain
-        :param path: path to the datasets folder(xlsx)
+        :param path: path to the datasets folder(xlsx, csv or parquet)
+        :param workbook_cache: EEWorkbookCache shared by the components of an ingestion so that every workbook
+                               is parsed only once, if None then a cache private to this object is used.
         """
         self.dir_path = path
+        self.workbook_cache = workbook_cache if workbook_cache is not None else EEWorkbookCache()
         self.good_raw_path = "EEDIV/ValidatedData/GoodRaw/"
         self.bad_raw_path = "EEDIV/ValidatedData/BadRaw/"
+        self.report_path = "EEDIV/ValidatedData/validation_report.json"
         self.schema_path = "EESchema/training_schema.json"
+        self.dataset_dir = "validated_data/"
 
         if not os.path.isdir("EElogging/training/"):
             os.mkdir("EElogging/training/")
@@ -89,7 +98,9 @@ class EEDataFormatTrain:
         :return: Required Regex pattern
         :On Failure: None
         """
-        regex = re.compile(r'ENB[1,2]\d{3}_data.xlsx')
+        # csv and parquet files are accepted as well as workbooks, parquet only if it can be read.
+        file_formats = "|".join(EEStreamingReader.ee_supported_formats())
+        regex = re.compile(r'ENB[1,2]\d{3}_data\.(' + file_formats + r')$')
         return regex
 
     def ee_create_good_bad_raw_data_directory(self):
@@ -207,7 +218,7 @@ class EEDataFormatTrain:
     def ee_validating_file_name(self, regex):
         """
         :Method Name:
-        :Description: This function validates the name of the training xlsx files as per given name in the EESchema!
+        :Description: This function validates the name of the training files as per given name in the EESchema!
                       Regex pattern is used to do the validation.If name format do not match the file is moved
                       to Bad Raw Data folder else in Good raw data.
         :param regex: The regex compiler used to check validity of filenames
@@ -242,7 +253,7 @@ class EEDataFormatTrain:
             log_file.close()
             raise e
 
-    def ee_validate_column_length(self, number_of_columns):
+    def ee_validate_column_length(self, number_of_columns, column_names=None):
         """
         :Method Name: ee_validate_column_length
         :Description: This function validates the number of columns in the csv files.
@@ -250,7 +261,12 @@ class EEDataFormatTrain:
                        If not same file is not suitable for processing and thus is moved to Bad Raw Data folder.
                        If the column number matches, file is kept in Good Raw Data for processing.
 
+                       Only the header of the files is read, so a file with a wrong header is rejected without
+                       parsing its data.
+
         :param number_of_columns: The number of columns that is expected based on DSA
+        :param column_names: Dictionary of the column names and their types from the schema, if given then the
+                             names in the header must also be the ones of the schema
         :return: None
         :On Failure: OSERROR, EXCEPTION
         """
@@ -259,12 +275,18 @@ class EEDataFormatTrain:
             message = "Column Length Validation Started!!"
             self.logger.log(log_file, message)
             for filename in os.listdir(self.good_raw_path):
-                pd_df = pd.read_excel(os.path.join(self.good_raw_path, filename))
+                reader = EEStreamingReader(os.path.join(self.good_raw_path, filename))
 
-                # Accessing the number of columns in the relevant files by checking shape of the dataframe.
-                if not pd_df.shape[1] == number_of_columns:
+                # Accessing the number of columns in the relevant files by reading only their header.
+                if column_names is not None:
+                    is_valid, reason = reader.ee_validate_header(column_names)
+                else:
+                    header = reader.ee_read_header()
+                    is_valid, reason = len(header) == number_of_columns, f"{len(header)} columns"
+                if not is_valid:
                     shutil.move(os.path.join(self.good_raw_path, filename), self.bad_raw_path)
-                    message = f"invalid Column length for the file {filename}. File moved to Bad Folder"
+                    self.workbook_cache.ee_discard(os.path.join(self.good_raw_path, filename))
+                    message = f"invalid Column length for the file {filename}({reason}). File moved to Bad Folder"
                     self.logger.log(log_file, message)
                 else:
                     message = f"{filename} validated. File remains in Good Folder"
@@ -284,17 +306,34 @@ class EEDataFormatTrain:
             log_file.close()
             raise e
 
-    def ee_validate_whole_columns_as_empty(self):
+    def ee_validate_whole_columns_as_empty(self, column_names=None):
+        """
+        :Method Name: ee_validate_whole_columns_as_empty
+        :Description: This function moves the files with a column without any value to Bad Raw Data folder.
+                      If the column names of the schema are given then the files are read in typed batches and a file
+                      with a value of the wrong type is moved to Bad Raw Data folder as soon as the value is read.
+
+        :param column_names: Dictionary of the column names and their types from the schema
+        :return: None
+        :On Failure: OSERROR, EXCEPTION
+        """
 
         try:
             log_file = open(self.log_path, 'a+')
             message = "Missing Values Validation Started!!"
             self.logger.log(log_file, message)
             for filename in os.listdir(self.good_raw_path):
-                pd_df = pd.read_excel(os.path.join(self.good_raw_path, filename))
+                try:
+                    pd_df = self.workbook_cache.ee_read(os.path.join(self.good_raw_path, filename), column_names)
+                except ValueError as e:
+                    shutil.move(os.path.join(self.good_raw_path, filename), self.bad_raw_path)
+                    message = f"invalid data in {filename}: {str(e)}. Moving to Bad Folder"
+                    self.logger.log(log_file, message)
+                    continue
                 for column in pd_df:
                     if (len(pd_df[column]) - pd_df[column].count()) == len(pd_df[column]):
                         shutil.move(os.path.join(self.good_raw_path, filename), self.bad_raw_path)
+                        self.workbook_cache.ee_discard(os.path.join(self.good_raw_path, filename))
                         message = f"invalid column {column}. Moving to Bad Folder"
                         self.logger.log(log_file, message)
                         break
@@ -311,28 +350,63 @@ class EEDataFormatTrain:
             log_file.close()
             raise e
 
-    def ee_convert_direct_excel_to_csv(self):
+    def ee_validate_files_parallel(self, regex, number_of_columns, column_names, n_workers=None):
+        """
+        :Method Name: ee_validate_files_parallel
+        :Description: This function performs all the validations of ee_validating_file_name, ee_validate_column_length
+                      and ee_validate_whole_columns_as_empty on many files at the same time in a pool of processes
+                      using EEParallelValidator, and writes a report of the result of every file to
+                      validation_report.json.
+
+        :param regex: The regex compiler used to check validity of filenames
+        :param number_of_columns: The number of columns that is expected based on DSA
+        :param column_names: Dictionary of the column names and their types from the schema
+        :param n_workers: The number of processes used, if None then the environment variable
+                          EE_VALIDATION_WORKERS or else the number of cpus is used.
+        :return: List of dictionaries with the file, whether it is good and the reason if it is not
+        :On Failure: Exception
+        """
+        # delete the directories for good and bad data in case last run was unsuccessful and folders were not deleted.
+        self.ee_delete_existing_bad_data_folder()
+        self.ee_delete_existing_good_data_folder()
+        # create new directories
+        self.ee_create_good_bad_raw_data_directory()
+
+        validator = EEParallelValidator(self.good_raw_path, self.bad_raw_path, self.report_path,
+                                        self.workbook_cache, self.log_path)
+        return validator.ee_validate_files(self.dir_path, regex, number_of_columns, column_names, n_workers)
+
+    def ee_convert_direct_excel_to_csv(self, export_csv=None):
         """
         :Method Name: ee_convert_direct_excel_to_csv
         :Description: This function converts all the excel files which have been validated as being in the correct
-                      format into a single csv file which is then used in preprocessing for training ML EEModels.
+                      format into a single dataset which is then used in preprocessing for training ML EEModels.
                       This function is used to improve the speed or latency of the web application as the app does not
                       have to wait for database operations before starting the training.
+                      The dataset is saved in the binary columnar format of EEFileOperation which is loaded without
+                      parsing any text, the csv file is only an optional export.
+        :param export_csv: If True then validated_file.csv is also written, if None then it is written only if the
+                           environment variable EE_EXPORT_CSV is set.
         :return: None
         :On Failure: Exception
         """
         try:
             log_file = open(self.log_path, 'a+')
 
+            if export_csv is None:
+                export_csv = os.getenv("EE_EXPORT_CSV", "").lower() in ("1", "true", "yes")
+
             list_pd = []
             for filename in os.listdir(self.good_raw_path):
-                list_pd.append(pd.read_excel(os.path.join(self.good_raw_path, filename)))
+                list_pd.append(self.workbook_cache.ee_read(os.path.join(self.good_raw_path, filename)))
 
             df = pd.concat(list_pd)
 
-            df.to_csv("validated_file.csv", header=True, index=True, index_label="ID")
+            EEFileOperation().ee_save_columnar_dataset(df, self.dataset_dir, index_label="ID", decimals=2)
+            if export_csv:
+                df.to_csv("validated_file.csv", header=True, index=True, index_label="ID")
 
-            message = f"Excel file Converted directly to required csv file for future preprocessing"
+            message = f"Excel file Converted directly to required dataset for future preprocessing"
             self.logger.log(log_file, message)
             log_file.close()
 
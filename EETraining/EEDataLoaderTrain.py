@@ -1,6 +1,7 @@
 import os
 import pandas as pd
 from EElogging.EELogger import EELogger
+from EEFileOperations.EEFileOperations import EEFileOperation
 
 
 class EEDataLoaderTrain:
@@ -15,6 +16,8 @@ class EEDataLoaderTrain:
     """
     def __init__(self):
         self.training_file = "validated_file.csv"
+        # Binary dataset written by the ingestion, the csv is read only if it does not exist.
+        self.training_dataset = "validated_data/"
         self.logger = EELogger()
         if not os.path.isdir("EElogging/training/"):
             os.mkdir("EElogging/training/")
@@ -23,15 +26,24 @@ class EEDataLoaderTrain:
     def ee_get_data(self):
         """
         Method Name: get_data
-        Description: This method reads the data from source.
+        Description: This method reads the data from source. The binary dataset is memory mapped if it exists,
+                     else the csv file is read.
         Output: A pandas DataFrame.
         On Failure: Raise Exception
         """
         try:
             log_file = open(self.log_path, 'a+')
-            self.data = pd.read_csv(self.training_file)
-            # To round all the values to two decimal digits as it is usually in the data files.
-            self.data = self.data.round(2)
+            if os.path.isdir(self.training_dataset):
+                file_operator = EEFileOperation()
+                self.data = file_operator.ee_load_columnar_dataset(self.training_dataset)
+                decimals = file_operator.ee_columnar_dataset_decimals(self.training_dataset)
+            else:
+                self.data = pd.read_csv(self.training_file)
+                decimals = None
+            # To round all the values to two decimal digits as it is usually in the data files. The values of a
+            # binary dataset are rounded when it is saved, so the memory mapped values are not copied again.
+            if decimals != 2:
+                self.data = self.data.round(2)
             message = "The training data is loaded successfully as a pandas dataframe"
             self.logger.log(log_file, message)
             log_file.close()
@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+
+class EEKernelCache:
+    """
+    :Class Name: EEKernelCache
+    :Description: This class is a least recently used cache of kernel matrices bounded by the number of bytes
+                  they occupy. It is used by the SVR search so that the matrices of a cross validation fold are
+                  computed only once and shared by all the candidates using them.
+
+    Written By: Jobin Mathew
+    Interning at iNeuron Intelligence
+    Version: 1.0
+    """
+
+    def __init__(self, max_bytes):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEKernelCache.
+        :param max_bytes: The maximum number of bytes of all the cached matrices
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def ee_get(self, key, compute):
+        """
+        :Method Name: ee_get
+        :Description: This method returns the cached value of the key, computing and storing it if it is not
+                      cached. The least recently used values are evicted until the new value fits in the cache,
+                      a value larger than the whole cache is returned without being stored.
+
+        :param key: Hashable key of the value
+        :param compute: Function without arguments returning a numpy array or a tuple of numpy arrays
+        :return: The value of the key
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+
+        # The value is computed outside the lock so that threads computing different keys do not wait.
+        value = compute()
+        nbytes = self.ee_nbytes(value)
+        if nbytes > self.max_bytes:
+            return value
+
+        with self.lock:
+            if key not in self.entries:
+                while self.size + nbytes > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= self.ee_nbytes(evicted)
+                self.entries[key] = value
+                self.size += nbytes
+        return value
+
+    @staticmethod
+    def ee_nbytes(value):
+        """
+        :Method Name: ee_nbytes
+        :Description: This method returns the memory occupied by a cached value.
+        :param value: numpy array or tuple of numpy arrays
+        :return: The number of bytes
+        """
+        return sum(array.nbytes for array in value) if isinstance(value, tuple) else value.nbytes
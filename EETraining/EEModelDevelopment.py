@@ -1,4 +1,8 @@
 import os
+import shutil
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from sklearn.model_selection import train_test_split
 from EETraining.EEDataLoaderTrain import EEDataLoaderTrain
@@ -9,32 +13,99 @@ from EETraining.EEClusteringTrain import EEClusteringTrain
 from EETraining.EEModelFinder import EEModelFinder
 from EElogging.EELogger import EELogger
 from EEFileOperations.EEFileOperations import EEFileOperation
+from EEPrediction.EEModelRegistry import EEModelRegistry
 
 
 class EETrainingPipeline:
 
-    def __init__(self):
+    def __init__(self, cpu_budget=None, n_workers=None, model_finder_params=None, time_budget=None,
+                 clustering_params=None):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EETrainingPipeline.
+        :param cpu_budget: The total number of cpus used by training, if None then the environment variable
+                           EE_TRAINING_CPUS or else the number of cpus is used.
+        :param n_workers: The number of model searches run at the same time, if None then the environment variable
+                          EE_TRAINING_WORKERS or else one per cpu of the budget is used.
+        :param model_finder_params: Dictionary of keyword arguments of EEModelFinder(eg. search_mode), if None
+                                    then the search mode is given by the environment variable EE_SEARCH_MODE and
+                                    the early stopping of xgb by EE_XGB_EARLY_STOPPING_ROUNDS and the path search
+                                    of ridge and lasso by EE_LINEAR_PATH_SEARCH, the kernel cache of SVR by
+                                    EE_SVR_KERNEL_CACHE_MB, the warm started forests by EE_RF_WARM_START_SEARCH and
+                                    the concurrent searches of all the models by EE_CONCURRENT_FAMILIES.
+        :param time_budget: The number of seconds after the start of training after which the model searches keep
+                            the best models found until then, if None then the environment variable
+                            EE_TRAINING_TIME_BUDGET or else no limit is used.
+        :param clustering_params: Dictionary of keyword arguments of EEClusteringTrain(eg. fast), if None then the
+                                  fast clustering is given by the environment variable EE_FAST_CLUSTERING and its
+                                  sample and mini batch sizes by EE_CLUSTERING_SAMPLE_ROWS and
+                                  EE_CLUSTERING_MINI_BATCH_ROWS.
+        """
+        if cpu_budget is None:
+            cpu_budget = int(os.getenv("EE_TRAINING_CPUS", os.cpu_count() or 1))
+        if n_workers is None:
+            n_workers = int(os.getenv("EE_TRAINING_WORKERS", cpu_budget))
+        self.cpu_budget = max(1, cpu_budget)
+        self.n_workers = max(1, n_workers)
+        if model_finder_params is None:
+            model_finder_params = {"search_mode": os.getenv("EE_SEARCH_MODE", "exhaustive")}
+            if os.getenv("EE_XGB_EARLY_STOPPING_ROUNDS"):
+                model_finder_params["xgb_early_stopping_rounds"] = int(os.getenv("EE_XGB_EARLY_STOPPING_ROUNDS"))
+            if os.getenv("EE_LINEAR_PATH_SEARCH", "").lower() in ("1", "true", "yes"):
+                model_finder_params["linear_path_search"] = True
+            if os.getenv("EE_SVR_KERNEL_CACHE_MB"):
+                model_finder_params["svr_kernel_cache_mb"] = int(os.getenv("EE_SVR_KERNEL_CACHE_MB"))
+            if os.getenv("EE_RF_WARM_START_SEARCH", "").lower() in ("1", "true", "yes"):
+                model_finder_params["rf_warm_start_search"] = True
+            if os.getenv("EE_CONCURRENT_FAMILIES", "").lower() in ("1", "true", "yes"):
+                model_finder_params["concurrent_families"] = True
+        self.model_finder_params = model_finder_params
+        if time_budget is None and os.getenv("EE_TRAINING_TIME_BUDGET"):
+            time_budget = float(os.getenv("EE_TRAINING_TIME_BUDGET"))
+        self.time_budget = time_budget
+        if clustering_params is None:
+            clustering_params = {"fast": os.getenv("EE_FAST_CLUSTERING", "").lower() in ("1", "true", "yes")}
+            if os.getenv("EE_CLUSTERING_SAMPLE_ROWS"):
+                clustering_params["sample_rows"] = int(os.getenv("EE_CLUSTERING_SAMPLE_ROWS"))
+            if os.getenv("EE_CLUSTERING_MINI_BATCH_ROWS"):
+                clustering_params["mini_batch_rows"] = int(os.getenv("EE_CLUSTERING_MINI_BATCH_ROWS"))
+        self.clustering_params = clustering_params
 
         if not os.path.isdir("EElogging/training/"):
             os.mkdir("EElogging/training/")
         self.log_path = "EElogging/training/EETrainingPipeline.txt"
         self.logger = EELogger()
 
-        if not os.path.isdir("EEModels/EEMlmodels/"):
-            os.mkdir("EEModels/EEMlmodels/")
-        self.model_dir = "EEModels/EEMlmodels/"
-
-        if not os.path.isdir("EEModels/EEClustering/"):
-            os.mkdir("EEModels/EEClustering/")
-        self.cluster_dir = "EEModels/EEClustering/"
+        # Every training run saves its artifacts in a new version directory which is made the current one only
+        # after the run succeeds, so prediction keeps using the previous models during training.
+        self.models_root = "EEModels/"
+        if not os.path.isdir(self.models_root):
+            os.mkdir(self.models_root)
+        self.version_dir = None
 
     def ee_model_train(self):
 
+        # A version directory which was not published when training fails is deleted, as it is never used.
+        self.version_dir = None
+        published = False
         try:
             log_file = open(self.log_path, 'a+')
             message = "Start of EETraining Pipeline"
             self.logger.log(log_file, message)
 
+            # The deadline is shared by the model searches of all the clusters, a search started after it still
+            # evaluates its first candidates so that every cluster gets a model.
+            model_finder_params = dict(self.model_finder_params)
+            if self.time_budget is not None:
+                model_finder_params["deadline"] = time.time() + self.time_budget
+
+            file_operator = EEFileOperation()
+            self.version_dir = file_operator.ee_create_model_version(self.models_root)
+            model_dir = os.path.join(self.version_dir, "EEMlmodels/")
+            cluster_dir = os.path.join(self.version_dir, "EEClustering/")
+            compiled_dir = os.path.join(self.version_dir, "EECompiled/")
+            manifest = {"version": os.path.basename(self.version_dir), "outputs": {}}
+
             # GETTING THE DATA
             data_loader = EEDataLoaderTrain()
             validated_data = data_loader.ee_get_data()
@@ -50,12 +121,14 @@ class EETrainingPipeline:
             eda = EEEdaTrain()
             feature_engineer = EEFeatureEngineeringTrain()
             feature_selector = EEFeatureSelectionTrain()
-            file_operator = EEFileOperation()
 
             temp_df = feature_selector.ee_remove_columns(validated_data, 'ID')
 
             features, labels = eda.ee_feature_label_split(temp_df, ['Y1', 'Y2'])
 
+            # (output_no, cluster_no, train_x, train_y, test_x, test_y) of every model to be searched.
+            jobs = []
+
             # features is a list of same features as the only elements. This is because we have two outputs.
             for j in range(len(features)):
                 is_null_present, columns_with_null = eda.ee_missing_values(features[j])
@@ -73,14 +146,14 @@ class EETrainingPipeline:
                 col_to_drop = list(set(col_to_drop))
                 col_to_drop_str = ",".join(col_to_drop)
 
-                with open(f"column_to_drop_Y{j+1}.txt", 'w') as f:
+                with open(os.path.join(self.version_dir, f"column_to_drop_Y{j+1}.txt"), 'w') as f:
                     f.write(col_to_drop_str)
 
                 features[j] = feature_selector.ee_remove_columns(features[j], col_to_drop)
 
                 scalar, features[j] = feature_engineer.ee_standard_scaling_features(features[j])
 
-                file_operator.ee_save_model(scalar, "EEModels/", "scalar.pickle")
+                file_operator.ee_save_model(scalar, self.version_dir, "scalar.pickle")
 
                 message = f"Data Preprocessing completed"
                 self.logger.log(log_file, message)
@@ -90,37 +163,63 @@ class EETrainingPipeline:
                 message = f"clustering of dataset started"
                 self.logger.log(log_file, message)
 
-                cluster = EEClusteringTrain()
+                # n_jobs given in the clustering parameters takes precedence over the cpu budget.
+                cluster = EEClusteringTrain(**{"n_jobs": self.cpu_budget, **self.clustering_params})
                 num_clusters = cluster.ee_obtain_optimum_cluster(features[j])
                 cluster_model, features[j] = cluster.ee_create_cluster(features[j], num_clusters)
 
-                file_operator.ee_save_model(cluster_model, self.cluster_dir, f"clustering_model_Y{j+1}.pickle")
+                file_operator.ee_save_model(cluster_model, cluster_dir, f"clustering_model_Y{j+1}.pickle")
                 features[j]['labels'] = labels[j]
 
                 list_of_clusters = features[j]['cluster'].unique()
+                manifest["outputs"][f"Y{j+1}"] = {"columns_dropped": col_to_drop, "models": {}}
 
                 message = f"clustering of dataset done"
                 self.logger.log(log_file, message)
 
                 for i in list_of_clusters:
-                    message = f"Start of training for output Y{j+1} cluster{i}"
-                    self.logger.log(log_file, message)
-
                     cluster_data = features[j][features[j]['cluster'] == i]
 
                     cluster_feature = cluster_data.drop(columns=['labels', 'cluster'])
                     cluster_label = cluster_data['labels']
 
                     train_x, test_x, train_y, test_y = train_test_split(cluster_feature, cluster_label, random_state=42)
-                    model_finder = EEModelFinder()
-                    model_name, model = model_finder.ee_best_model(train_x=train_x, train_y=train_y,
-                                                                   test_x=test_x, test_y=test_y)
-
-                    file_operator.ee_save_model(model=model, model_dir=self.model_dir,
-                                                model_name=f"{model_name}_Y{j+1}_cluster_{i}.pickle")
+                    jobs.append((j + 1, i, train_x, train_y, test_x, test_y))
+
+            # MODEL SEARCH
+            # The searches of all the (output, cluster) pairs are independent and run in a pool of processes. The
+            # cpu budget is divided between the processes so that the searches inside them do not oversubscribe
+            # the machine. The concurrent searches of all the models start a process per model in every worker,
+            # so there are fewer workers to leave every worker one cpu per model.
+            max_workers = self.cpu_budget
+            if model_finder_params.get("concurrent_families"):
+                max_workers = max(1, self.cpu_budget // len(EEModelFinder.family_searches))
+            n_workers = min(self.n_workers, max_workers, len(jobs))
+            n_jobs = max(1, self.cpu_budget // max(1, n_workers))
+
+            message = f"Model search of {len(jobs)} clusters started with {n_workers} workers of {n_jobs} cpus each"
+            self.logger.log(log_file, message)
 
-                    message = f"Model for cluster {i} trained"
-                    self.logger.log(log_file, message)
+            if n_workers <= 1:
+                results = (EETrainingPipeline.ee_train_cluster_model(*job, n_jobs=n_jobs,
+                                                                     model_finder_params=model_finder_params)
+                           for job in jobs)
+                self.ee_save_cluster_models(results, file_operator, model_dir, compiled_dir, manifest, log_file)
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    futures = [executor.submit(EETrainingPipeline.ee_train_cluster_model, *job, n_jobs=n_jobs,
+                                               model_finder_params=model_finder_params)
+                               for job in jobs]
+                    # The models are saved as soon as their search finishes instead of in the submission order.
+                    results = (future.result() for future in as_completed(futures))
+                    self.ee_save_cluster_models(results, file_operator, model_dir, compiled_dir, manifest, log_file)
+
+            manifest["created"] = datetime.now().isoformat()
+            file_operator.ee_publish_model_version(self.version_dir, manifest, self.models_root)
+            published = True
+
+            # The resident models used for prediction are replaced by the newly trained ones.
+            EEModelRegistry.ee_get_registry().ee_load_models()
 
             message = "Successful End of EETraining"
             self.logger.log(log_file, message)
@@ -130,5 +229,66 @@ class EETrainingPipeline:
             log_file = open(self.log_path, 'a+')
             message = f"There was an ERROR while obtaining best model: {str(e)}"
             self.logger.log(log_file, message)
+            if self.version_dir is not None and not published:
+                shutil.rmtree(self.version_dir, ignore_errors=True)
+                message = f"Unpublished model version {self.version_dir} deleted"
+                self.logger.log(log_file, message)
             log_file.close()
             raise e
+
+    @staticmethod
+    def ee_train_cluster_model(output_no, cluster_no, train_x, train_y, test_x, test_y, n_jobs=-1,
+                               model_finder_params=None):
+        """
+        :Method Name: ee_train_cluster_model
+        :Description: This method searches the best model of a single cluster of an output. It runs inside a worker
+                      process of ee_model_train.
+
+        :param output_no: The output(1 for Y1, 2 for Y2) of the cluster
+        :param cluster_no: The cluster whose model is searched
+        :param train_x: the training features
+        :param train_y: the training labels
+        :param test_x: the test features
+        :param test_y: the test labels
+        :param n_jobs: The number of cpus the search may use
+        :param model_finder_params: Dictionary of further keyword arguments of EEModelFinder
+        :return: Tuple of output_no, cluster_no, the name of the best model and the best model
+        """
+        model_finder = EEModelFinder(n_jobs=n_jobs, **(model_finder_params or {}))
+        model_name, model = model_finder.ee_best_model(train_x=train_x, train_y=train_y,
+                                                       test_x=test_x, test_y=test_y)
+        return output_no, cluster_no, model_name, model
+
+    def ee_save_cluster_models(self, results, file_operator, model_dir, compiled_dir, manifest, log_file):
+        """
+        :Method Name: ee_save_cluster_models
+        :Description: This method saves the best model of every cluster as the searches finish and records it in
+                      the manifest of the model version.
+
+        :param results: Iterable of the tuples returned by ee_train_cluster_model
+        :param file_operator: EEFileOperation used to save the models
+        :param model_dir: The directory of the pickled models
+        :param compiled_dir: The directory of the models exported as node arrays
+        :param manifest: Dictionary describing the artifacts of the model version
+        :param log_file: The open log file of the pipeline
+        :return: None
+        """
+        for output_no, cluster_no, model_name, model in results:
+            file_operator.ee_save_model(model=model, model_dir=model_dir,
+                                        model_name=f"{model_name}_Y{output_no}_cluster_{cluster_no}.pickle")
+            # Tree models are also exported as node arrays for the faster evaluator used in prediction.
+            file_operator.ee_export_compiled_model(model=model, model_dir=compiled_dir,
+                                                   model_name=f"{model_name}_Y{output_no}_cluster_{cluster_no}.npz")
+
+            manifest["outputs"][f"Y{output_no}"]["models"][str(cluster_no)] = model_name
+
+            message = f"Model for output Y{output_no} cluster {cluster_no} trained"
+            self.logger.log(log_file, message)
+
+
+if __name__ == "__main__":
+    # Started by the /train route as a separate process, so that training neither forks nor competes with the web
+    # workers. Its lower priority leaves the cpus to the requests whenever they need them.
+    if hasattr(os, "nice"):
+        os.nice(int(os.getenv("EE_TRAINING_NICENESS", 10)))
+    EETrainingPipeline().ee_model_train()
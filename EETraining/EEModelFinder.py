@@ -1,12 +1,25 @@
 import os
+import copy
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import pandas as pd
 from EElogging.EELogger import EELogger
-from sklearn.linear_model import Ridge, Lasso
+from sklearn.linear_model import Ridge, Lasso, lasso_path
 from sklearn.svm import SVR
 from sklearn.ensemble import RandomForestRegressor
 from xgboost import XGBRegressor
-from sklearn.model_selection import GridSearchCV, KFold, RandomizedSearchCV
+from sklearn.model_selection import GridSearchCV, KFold, RandomizedSearchCV, PredefinedSplit, ParameterGrid
+from sklearn.model_selection import ParameterSampler, train_test_split
+# The successive halving searches are still experimental in scikit-learn and have to be enabled explicitly.
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingGridSearchCV, HalvingRandomSearchCV
 from sklearn.metrics import r2_score
+from sklearn.metrics.pairwise import euclidean_distances
+from joblib import Parallel, delayed
+from EETraining.EEKernelCache import EEKernelCache
+from EETraining.EEBudgetedSearchCV import EEBudgetedSearchCV
+from EETraining.EEBudgetedHalvingSearchCV import EEBudgetedHalvingSearchCV
 
 
 class EEModelFinder:
@@ -20,7 +33,52 @@ class EEModelFinder:
     Version: 1.0
     """
 
-    def __init__(self):
+    # The search method of every model and its expected cost relative to the other searches.
+    family_searches = {"ridge": "ee_best_ridge_regressor", "lasso": "ee_best_lasso_regressor",
+                       "svr": "ee_best_svr", "rfr": "ee_best_random_forest", "xgb": "ee_best_xgb_regressor"}
+    family_costs = {"ridge": 1, "lasso": 1, "svr": 3, "rfr": 6, "xgb": 4}
+
+    def __init__(self, n_jobs=-1, search_mode="exhaustive", halving_factor=3, xgb_early_stopping_rounds=None,
+                 linear_path_search=False, svr_kernel_cache_mb=None, rf_warm_start_search=False,
+                 concurrent_families=False, time_budget=None, deadline=None):
+        """
+        :Method Name: __init__
+        :Description: The constructor of class EEModelFinder.
+        :param n_jobs: The number of cpus used by every search and model, -1 uses all the cpus. It is limited by
+                       the training pipeline when several model searches run at the same time.
+        :param search_mode: 'exhaustive' to fit every candidate on all the data or 'halving' to fit all the
+                            candidates on a small budget and give more of it only to the best ones.
+        :param halving_factor: The fraction(1/halving_factor) of candidates kept after every round of halving.
+        :param xgb_early_stopping_rounds: If given, the number of boosting rounds of xgb is not searched but found
+                                          by stopping the training once the error on a held out part of the data
+                                          has not improved for this many rounds.
+        :param linear_path_search: If True, every alpha of ridge and lasso is scored from a single regularization
+                                   path per cross validation fold instead of a separate fit per alpha.
+        :param svr_kernel_cache_mb: If given, the kernel matrices of every cross validation fold are computed once
+                                    and shared by all the SVR candidates, keeping at most this many megabytes of
+                                    them in memory.
+        :param rf_warm_start_search: If True, a single random forest is grown tree by tree for every candidate of
+                                     the other parameters and scored at every value of n_estimators.
+        :param concurrent_families: If True, the searches of all the models run at the same time in separate
+                                    processes sharing the n_jobs cpus in proportion to their expected cost.
+        :param time_budget: If given, the number of seconds from the creation of the object after which the
+                            searches stop starting new candidates and keep the best model found until then.
+        :param deadline: Like time_budget but given as a time(as given by time.time()), the earlier of both is used.
+        :On Failure: ValueError
+        """
+        if search_mode not in ("exhaustive", "halving"):
+            raise ValueError(f"Unknown search mode {search_mode}, expected 'exhaustive' or 'halving'")
+        self.n_jobs = n_jobs
+        self.search_mode = search_mode
+        self.halving_factor = halving_factor
+        self.xgb_early_stopping_rounds = xgb_early_stopping_rounds
+        self.linear_path_search = linear_path_search
+        self.svr_kernel_cache_mb = svr_kernel_cache_mb
+        self.rf_warm_start_search = rf_warm_start_search
+        self.concurrent_families = concurrent_families
+        if time_budget is not None:
+            deadline = min(deadline if deadline is not None else np.inf, time.time() + time_budget)
+        self.deadline = deadline
 
         if not os.path.isdir("EElogging/training/"):
             os.mkdir("EElogging/training/")
@@ -28,12 +86,16 @@ class EEModelFinder:
         self.log_path = "EElogging/training/EEModelFinder.txt"
         self.logger = EELogger()
 
-        self.rfr = RandomForestRegressor(n_jobs=-1, verbose=0)
-        self.xgb = XGBRegressor()
+        # The searches already evaluate the candidates in parallel, so every candidate is fitted with a single
+        # thread and only the best model is refitted with n_jobs.
+        self.rfr = RandomForestRegressor(n_jobs=1, verbose=0)
+        self.xgb = XGBRegressor(n_jobs=1)
         self.ridge = Ridge()
         self.lasso = Lasso()
         self.svr = SVR()
         self.kfold = KFold(shuffle=True, random_state=42)
+        # The cross validation results of the last search of every model, keyed like the adjusted r2 dictionary.
+        self.search_results = {}
 
     def ee_adj_r2(self, estimator, x, y_true):
         """
@@ -50,6 +112,212 @@ class EEModelFinder:
         pred = estimator.predict(x)
         return 1 - ((1 - r2_score(y_true, pred)) * (n - 1)) / (n - p - 1)
 
+    def ee_search(self, estimator, param_grid, train_x, n_iter=None, resource="n_samples", min_resources=None,
+                  refit=True):
+        """
+        :Method Name: ee_search
+        :Description: This method creates the hyperparameter search used by all the ee_best_* methods for the
+                      search mode of the object. The exhaustive mode evaluates every candidate with all the
+                      training data and both the mean squared error and the adjusted R2. The halving mode
+                      evaluates every candidate with a small amount of the resource, keeps the best
+                      1/halving_factor of them by adjusted R2 and repeats with halving_factor times the resource
+                      until the full resource is reached. When the resource is the number of samples, every
+                      validation fold of the first round needs enough rows for the adjusted R2 to be meaningful,
+                      so a cluster too small to be halved at least once is searched exhaustively instead.
+
+        :param estimator: The sklearn model to be searched
+        :param param_grid: Dictionary of the values of every parameter
+        :param train_x: Input training data which will be used to fit the search
+        :param n_iter: The number of candidates sampled from param_grid or None to use every combination
+        :param resource: 'n_samples' or the parameter grown by the halving search(eg. n_estimators). The parameter
+                         is removed from the candidates and its largest value in param_grid is the full resource.
+        :param min_resources: The amount of the resource given to every candidate in the first round of halving,
+                              if None then it is obtained from the number of features for 'n_samples'
+        :param refit: Whether the search refits the best candidate on all the training data, if False then
+                      ee_best_params gives the best candidate
+        :return: The unfitted search object, an EEBudgetedSearchCV in the exhaustive mode with a deadline and an
+                 EEBudgetedHalvingSearchCV in the halving mode with a deadline
+        """
+        search_mode = self.search_mode
+        if resource == "n_samples":
+            n, p = train_x.shape
+            # The validation folds are subsampled along with the training folds.
+            if min_resources is None:
+                min_resources = self.kfold.get_n_splits() * 2 * (p + 2)
+            if min_resources * self.halving_factor > n:
+                search_mode = "exhaustive"
+
+        if search_mode == "exhaustive":
+            scoring = {'n-mse': 'neg_mean_squared_error', 'adjusted-R2': self.ee_adj_r2}
+            refit = 'adjusted-R2' if refit else False
+            if self.deadline is not None:
+                candidates = list(ParameterGrid(param_grid)) if n_iter is None else \
+                    list(ParameterSampler(param_grid, n_iter=min(n_iter, self.ee_grid_size(param_grid))))
+                return EEBudgetedSearchCV(estimator=estimator, candidates=candidates, deadline=self.deadline,
+                                          batch_size=self.ee_budget_batch_size(), cv=self.kfold,
+                                          n_jobs=self.n_jobs, scoring=scoring, refit=refit, verbose=0)
+            if n_iter is None:
+                return GridSearchCV(estimator=estimator, param_grid=param_grid, cv=self.kfold, n_jobs=self.n_jobs,
+                                    scoring=scoring, refit=refit, verbose=0)
+            return RandomizedSearchCV(estimator=estimator, param_distributions=param_grid, n_iter=n_iter,
+                                      cv=self.kfold, n_jobs=self.n_jobs, scoring=scoring, refit=refit, verbose=0)
+
+        max_resources = "auto"
+        if resource != "n_samples":
+            max_resources = int(max(param_grid[resource]))
+            param_grid = {key: value for key, value in param_grid.items() if key != resource}
+
+        # The halving searches support a single scorer only, the candidates are compared by adjusted R2.
+        if self.deadline is not None:
+            candidates = list(ParameterGrid(param_grid)) if n_iter is None else \
+                list(ParameterSampler(param_grid, n_iter=min(n_iter, self.ee_grid_size(param_grid))))
+            return EEBudgetedHalvingSearchCV(estimator=estimator, candidates=candidates, deadline=self.deadline,
+                                             factor=self.halving_factor, resource=resource,
+                                             max_resources=max_resources, min_resources=min_resources,
+                                             aggressive_elimination=False, refit=refit, cv=self.kfold,
+                                             n_jobs=self.n_jobs, scoring=self.ee_adj_r2, verbose=0)
+        if n_iter is None:
+            return HalvingGridSearchCV(estimator=estimator, param_grid=param_grid, factor=self.halving_factor,
+                                       resource=resource, max_resources=max_resources,
+                                       min_resources=min_resources, aggressive_elimination=False, refit=refit,
+                                       cv=self.kfold, n_jobs=self.n_jobs, scoring=self.ee_adj_r2, verbose=0)
+        return HalvingRandomSearchCV(estimator=estimator, param_distributions=param_grid, n_candidates=n_iter,
+                                     factor=self.halving_factor, resource=resource, max_resources=max_resources,
+                                     min_resources=min_resources, aggressive_elimination=False, refit=refit,
+                                     cv=self.kfold, n_jobs=self.n_jobs, scoring=self.ee_adj_r2, verbose=0)
+
+    def ee_best_params(self, search):
+        """
+        :Method Name: ee_best_params
+        :Description: This method returns the best candidate of a fitted search, also when the exhaustive search
+                      was not refitted and does not have best_params_. The best candidate is chosen like
+                      GridSearchCV does, by the rank of its adjusted R2. The last round of a halving search over a
+                      parameter(eg. n_estimators) can give the candidates less than the largest value of the grid,
+                      so the best candidate is returned with the largest value, to be refitted with it.
+        :param search: The fitted search
+        :return: Tuple of the best parameters and their mean adjusted R2
+        """
+        if hasattr(search, "best_params_"):
+            best_params, best_score = search.best_params_, search.best_score_
+        else:
+            best_index = search.cv_results_["rank_test_adjusted-R2"].argmin()
+            best_params = search.cv_results_["params"][best_index]
+            best_score = search.cv_results_["mean_test_adjusted-R2"][best_index]
+
+        resource = getattr(search, "resource", "n_samples")
+        if resource != "n_samples":
+            best_params = dict(best_params, **{resource: search.max_resources_})
+        return best_params, best_score
+
+    def ee_grid_size(self, param_grid):
+        """
+        :Method Name: ee_grid_size
+        :Description: This method returns the number of combinations of a parameter grid, or infinity if a
+                      parameter is given by a distribution instead of a list.
+        :param param_grid: Dictionary of the values of every parameter
+        :return: The number of combinations
+        """
+        if not all(hasattr(value, "__len__") for value in param_grid.values()):
+            return np.inf
+        return len(ParameterGrid(param_grid))
+
+    def ee_budget_batch_size(self):
+        """
+        :Method Name: ee_budget_batch_size
+        :Description: This method returns the number of candidates started at a time by a search with a deadline,
+                      two per cpu so that the cpus are kept busy while the deadline is checked often.
+        :return: The number of candidates
+        """
+        return 2 * (self.n_jobs if self.n_jobs > 0 else os.cpu_count() or 1)
+
+    def ee_log_cut_short(self, search, model_name):
+        """
+        :Method Name: ee_log_cut_short
+        :Description: This method logs if a search was stopped by the time budget before all its candidates
+                      or rounds of halving were evaluated.
+        :param search: The fitted search
+        :param model_name: The name of the searched model used in the log
+        :return: None
+        """
+        if getattr(search, "cut_short_", False):
+            log_file = open(self.log_path, 'a+')
+            if hasattr(search, "n_iterations_evaluated_"):
+                message = f"Search of {model_name} cut short by the time budget after " \
+                          f"{search.n_iterations_evaluated_} of {search.n_iterations_} rounds of halving"
+            else:
+                message = f"Search of {model_name} cut short by the time budget after " \
+                          f"{search.n_candidates_evaluated_} of {len(search.candidates)} candidates"
+            self.logger.log(log_file, message)
+            log_file.close()
+
+    def ee_linear_path_scores(self, train_x, train_y, alphas, path):
+        """
+        :Method Name: ee_linear_path_scores
+        :Description: This method computes the mean adjusted R2 over the cross validation folds of a linear model
+                      for every alpha at once. The folds are the same as those of the searches.
+
+        :param train_x: Input training Data
+        :param train_y: Input training labels
+        :param alphas: The alphas to be scored
+        :param path: ee_ridge_path or ee_lasso_path
+        :return: numpy array with the mean adjusted R2 of every alpha
+        """
+        x = np.asarray(train_x, dtype=np.float64)
+        y = np.asarray(train_y, dtype=np.float64)
+        alphas = np.asarray(alphas, dtype=np.float64)
+
+        scores = np.zeros(len(alphas))
+        no_of_folds = 0
+        for train_index, test_index in self.kfold.split(x):
+            # The intercept is fitted by centering the training data as done by Ridge and Lasso.
+            x_mean = x[train_index].mean(axis=0)
+            y_mean = y[train_index].mean()
+            coefs = path(x[train_index] - x_mean, y[train_index] - y_mean, alphas)
+
+            # Predictions of every alpha as the columns of a single matrix.
+            pred = (x[test_index] - x_mean) @ coefs.T + y_mean
+            y_true = y[test_index]
+            n, p = x[test_index].shape
+            r2 = 1 - ((y_true[:, None] - pred) ** 2).sum(axis=0) / ((y_true - y_true.mean()) ** 2).sum()
+            scores += 1 - ((1 - r2) * (n - 1)) / (n - p - 1)
+            no_of_folds += 1
+
+        return scores / no_of_folds
+
+    def ee_ridge_path(self, x, y, alphas):
+        """
+        :Method Name: ee_ridge_path
+        :Description: This method computes the ridge coefficients of every alpha from a single singular value
+                      decomposition of the centered data.
+
+        :param x: Centered input data
+        :param y: Centered labels
+        :param alphas: numpy array of alphas
+        :return: numpy array of shape (number of alphas, number of features) with the coefficients
+        """
+        u, singular_values, vt = np.linalg.svd(x, full_matrices=False)
+        d = singular_values / (singular_values ** 2 + alphas[:, None])
+        return (d * (u.T @ y)) @ vt
+
+    def ee_lasso_path(self, x, y, alphas):
+        """
+        :Method Name: ee_lasso_path
+        :Description: This method computes the lasso coefficients of every alpha along a single coordinate descent
+                      path which starts every alpha from the solution of the previous, larger one.
+
+        :param x: Centered input data
+        :param y: Centered labels
+        :param alphas: numpy array of alphas
+        :return: numpy array of shape (number of alphas, number of features) with the coefficients
+        """
+        order = np.argsort(alphas)[::-1]
+        # A warm started alpha may stop within the default tolerance far from a cold started fit, the tighter
+        # tolerance keeps every alpha at the exact solution while the whole path still takes milliseconds.
+        _, coefs, _ = lasso_path(x, y, alphas=alphas[order], tol=1e-8, max_iter=10000)
+        result = np.empty((len(alphas), x.shape[1]))
+        result[order] = coefs.T
+        return result
+
     def ee_best_ridge_regressor(self, train_x, train_y):
         """
         :Method Name: ee_get_best_ridge_regressor
@@ -67,28 +335,47 @@ class EEModelFinder:
                 'alpha': np.random.uniform(0, 10, 50),
                 'solver': ['auto', 'svd', 'cholesky', 'lsqr', 'sparse_cg', 'sag', 'saga']
             }
-            message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()})  of Ridge Regressor"
-            self.logger.log(log_file, message)
+            if self.linear_path_search:
+                message = f"Using the regularization path to obtain the optimum parameters({param_grid.keys()}) " \
+                          f"of Ridge Regressor"
+                self.logger.log(log_file, message)
 
-            # GridSearchCV is used as there are only a few combination of parameters.
-            grid = GridSearchCV(estimator=self.ridge, param_grid=param_grid,
-                                cv=self.kfold, n_jobs=-1,
-                                scoring={'n-mse': 'neg_mean_squared_error',
-                                         'adjusted-R2': self.ee_adj_r2},
-                                refit='adjusted-R2', verbose=0)
+                # All the solvers reach the same solution, so only the alphas are searched using the svd.
+                scores = self.ee_linear_path_scores(train_x, train_y, param_grid['alpha'], self.ee_ridge_path)
+                alpha = param_grid['alpha'][np.argmax(scores)]
+                solver = 'svd'
+                score = np.max(scores)
+                self.search_results["ridge"] = {"params": [{'alpha': a, 'solver': solver}
+                                                           for a in param_grid['alpha']],
+                                                "mean_test_score": scores}
+                best_ridge = None
+            else:
+                message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()})  of Ridge " \
+                          f"Regressor"
+                self.logger.log(log_file, message)
 
-            grid.fit(train_x, train_y)
+                # GridSearchCV is used as there are only a few combination of parameters.
+                grid = self.ee_search(estimator=self.ridge, param_grid=param_grid, train_x=train_x)
 
-            alpha = grid.best_params_['alpha']
-            solver = grid.best_params_['solver']
-            score = grid.best_score_
+                grid.fit(train_x, train_y)
+                self.ee_log_cut_short(grid, "Ridge Regressor")
+
+                alpha = grid.best_params_['alpha']
+                solver = grid.best_params_['solver']
+                score = grid.best_score_
+                self.search_results["ridge"] = grid.cv_results_
+                best_ridge = grid.best_estimator_
 
             message = f" The optimum parameters of Ridge Regressor are alpha={alpha}, solver={solver} with the " \
                       f"adjusted R2 score of {score}"
             self.logger.log(log_file, message)
 
-            self.ridge = Ridge(alpha=alpha, solver=solver)
-            self.ridge.fit(train_x, train_y)
+            # The search has already refitted the best model on all the training data.
+            if best_ridge is not None:
+                self.ridge = best_ridge
+            else:
+                self.ridge = Ridge(alpha=alpha, solver=solver)
+                self.ridge.fit(train_x, train_y)
 
             message = "Best Ridge Regressor trained"
             self.logger.log(log_file, message)
@@ -120,28 +407,47 @@ class EEModelFinder:
                 'alpha': np.random.uniform(0, 10, 50),
                 'selection': ['cyclic', 'random']
             }
-            message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()})  of Lasso Regressor"
-            self.logger.log(log_file, message)
+            if self.linear_path_search:
+                message = f"Using the regularization path to obtain the optimum parameters({param_grid.keys()}) " \
+                          f"of Lasso Regressor"
+                self.logger.log(log_file, message)
+
+                # Both selections converge to the same solution, so only the alphas are searched.
+                scores = self.ee_linear_path_scores(train_x, train_y, param_grid['alpha'], self.ee_lasso_path)
+                alpha = param_grid['alpha'][np.argmax(scores)]
+                selection = 'cyclic'
+                score = np.max(scores)
+                self.search_results["lasso"] = {"params": [{'alpha': a, 'selection': selection}
+                                                           for a in param_grid['alpha']],
+                                                "mean_test_score": scores}
+                best_lasso = None
+            else:
+                message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()})  of Lasso " \
+                          f"Regressor"
+                self.logger.log(log_file, message)
 
-            # GridSearchCV is used as there are only a few combination of parameters.
-            grid = GridSearchCV(estimator=self.lasso, param_grid=param_grid,
-                                cv=self.kfold, n_jobs=-1,
-                                scoring={'n-mse': 'neg_mean_squared_error',
-                                         'adjusted-R2': self.ee_adj_r2},
-                                refit='adjusted-R2', verbose=0)
+                # GridSearchCV is used as there are only a few combination of parameters.
+                grid = self.ee_search(estimator=self.lasso, param_grid=param_grid, train_x=train_x)
 
-            grid.fit(train_x, train_y)
+                grid.fit(train_x, train_y)
+                self.ee_log_cut_short(grid, "Lasso Regressor")
 
-            alpha = grid.best_params_['alpha']
-            selection = grid.best_params_['selection']
-            score = grid.best_score_
+                alpha = grid.best_params_['alpha']
+                selection = grid.best_params_['selection']
+                score = grid.best_score_
+                self.search_results["lasso"] = grid.cv_results_
+                best_lasso = grid.best_estimator_
 
             message = f" The optimum parameters of Lasso Regressor are alpha={alpha}, selection={selection}" \
                       f" with the adjusted R2 score of {score}"
             self.logger.log(log_file, message)
 
-            self.lasso = Lasso(alpha=alpha, selection=selection)
-            self.lasso.fit(train_x, train_y)
+            # The search has already refitted the best model on all the training data.
+            if best_lasso is not None:
+                self.lasso = best_lasso
+            else:
+                self.lasso = Lasso(alpha=alpha, selection=selection)
+                self.lasso.fit(train_x, train_y)
 
             message = "Best Lasso Regressor trained"
             self.logger.log(log_file, message)
@@ -178,31 +484,46 @@ class EEModelFinder:
                 'epsilon': [0.01, 0.03, 0.1, 0.3, 1]
             }
 
-            message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()}) of SVR"
-            self.logger.log(log_file, message)
+            # The kernel matrices of a fold are only precomputed when those of the largest fold fit in the cache.
+            n = len(train_x)
+            fold_bytes = 8 * n * n
+            if self.svr_kernel_cache_mb and fold_bytes <= self.svr_kernel_cache_mb * 2 ** 20:
+                message = f"Using precomputed kernel matrices to obtain the optimum parameters({param_grid.keys()})" \
+                          f" of SVR"
+                self.logger.log(log_file, message)
 
-            # GridSearchCV is used as there are only a few combination of parameters.
-            grid = GridSearchCV(estimator=self.svr, param_grid=param_grid,
-                                cv=self.kfold, n_jobs=-1,
-                                scoring={'n-mse': 'neg_mean_squared_error',
-                                         'adjusted-R2': self.ee_adj_r2},
-                                refit='adjusted-R2', verbose=0)
+                best_params, score, self.search_results["svr"] = self.ee_svr_precomputed_search(train_x, train_y,
+                                                                                                 param_grid)
+                best_svr = None
+            else:
+                message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()}) of SVR"
+                self.logger.log(log_file, message)
 
-            grid.fit(train_x, train_y)
+                # GridSearchCV is used as there are only a few combination of parameters.
+                grid = self.ee_search(estimator=self.svr, param_grid=param_grid, train_x=train_x)
 
-            kernel = grid.best_params_['kernel']
-            gamma = grid.best_params_['gamma']
-            c = grid.best_params_['C']
-            degree = grid.best_params_['degree']
-            epsilon = grid.best_params_['epsilon']
-            score = grid.best_score_
+                grid.fit(train_x, train_y)
+                self.ee_log_cut_short(grid, "SVR")
+                best_params, score = grid.best_params_, grid.best_score_
+                self.search_results["svr"] = grid.cv_results_
+                best_svr = grid.best_estimator_
+
+            kernel = best_params['kernel']
+            gamma = best_params['gamma']
+            c = best_params['C']
+            degree = best_params['degree']
+            epsilon = best_params['epsilon']
 
             message = f" The optimum parameters of SVR are kernel={kernel}, gamma={gamma}, C={c}, degree ={degree}, " \
                       f"epsilon={epsilon} with the adjusted R2 score of {score}"
             self.logger.log(log_file, message)
 
-            self.svr = SVR(kernel=kernel, gamma=gamma, C=c, degree=degree, epsilon=epsilon)
-            self.svr.fit(train_x, train_y)
+            # The search has already refitted the best model on all the training data.
+            if best_svr is not None:
+                self.svr = best_svr
+            else:
+                self.svr = SVR(kernel=kernel, gamma=gamma, C=c, degree=degree, epsilon=epsilon)
+                self.svr.fit(train_x, train_y)
 
             message = "Best SVR trained"
             self.logger.log(log_file, message)
@@ -217,6 +538,139 @@ class EEModelFinder:
             log_file.close()
             raise e
 
+    def ee_svr_precomputed_search(self, train_x, train_y, param_grid):
+        """
+        :Method Name: ee_svr_precomputed_search
+        :Description: This method scores every SVR candidate of param_grid by the mean adjusted R2 over the cross
+                      validation folds like GridSearchCV, but fits SVRs on precomputed kernel matrices. A kernel
+                      matrix depends only on the fold and the kernel, gamma and degree, so it is computed once and
+                      used for all the values of C and epsilon. Candidates differing only in a parameter their
+                      kernel does not use(eg. degree of rbf) are fitted only once. The folds are scored in
+                      parallel threads sharing an EEKernelCache. With a deadline the kernels are scored in batches
+                      and no new batch is started once the deadline has passed, the first batch is always scored.
+
+        :param train_x: Input training Data
+        :param train_y: Input training labels
+        :param param_grid: The SVR parameter grid with the keys kernel, gamma, C, degree and epsilon
+        :return: Tuple of the best parameters, their mean adjusted R2 and a dictionary with the 'params' and
+                 'mean_test_score' of all the candidates scored, ties are resolved like GridSearchCV
+        """
+        x = np.asarray(train_x, dtype=np.float64)
+        y = np.asarray(train_y, dtype=np.float64)
+
+        kernel_keys = []
+        for kernel in param_grid['kernel']:
+            for gamma in (param_grid['gamma'] if kernel != 'linear' else [None]):
+                for degree in (param_grid['degree'] if kernel == 'poly' else [None]):
+                    kernel_keys.append((kernel, gamma, degree))
+        c_epsilons = [(c, epsilon) for c in param_grid['C'] for epsilon in param_grid['epsilon']]
+
+        cache = EEKernelCache(max_bytes=self.svr_kernel_cache_mb * 2 ** 20)
+        folds = list(self.kfold.split(x))
+        # Without a deadline all the kernels are scored as a single batch.
+        batch_size = max(1, self.ee_budget_batch_size() // len(folds)) if self.deadline is not None \
+            else len(kernel_keys)
+        fold_scores = [{} for _ in folds]
+        for start in range(0, len(kernel_keys), batch_size):
+            if start > 0 and time.time() >= self.deadline:
+                log_file = open(self.log_path, 'a+')
+                message = f"Search of SVR cut short by the time budget after {start * len(c_epsilons)} of " \
+                          f"{len(kernel_keys) * len(c_epsilons)} candidates"
+                self.logger.log(log_file, message)
+                log_file.close()
+                break
+            # libsvm releases the GIL while fitting, so the folds are scored by threads sharing the cache.
+            batch_scores = Parallel(n_jobs=self.n_jobs, prefer="threads")(
+                delayed(self.ee_svr_fold_scores)(x, y, train_index, test_index, fold_no,
+                                                 kernel_keys[start:start + batch_size], c_epsilons, cache)
+                for fold_no, (train_index, test_index) in enumerate(folds))
+            for scores, new_scores in zip(fold_scores, batch_scores):
+                scores.update(new_scores)
+
+        best_params, best_score = None, -np.inf
+        results = {"params": [], "mean_test_score": []}
+        for params in ParameterGrid(param_grid):
+            kernel = params['kernel']
+            key = (kernel, params['gamma'] if kernel != 'linear' else None,
+                   params['degree'] if kernel == 'poly' else None, params['C'], params['epsilon'])
+            if key not in fold_scores[0]:
+                continue
+            score = np.mean([scores[key] for scores in fold_scores])
+            results["params"].append(params)
+            results["mean_test_score"].append(score)
+            if score > best_score:
+                best_params, best_score = params, score
+
+        results["mean_test_score"] = np.array(results["mean_test_score"])
+        return best_params, best_score, results
+
+    def ee_svr_fold_scores(self, x, y, train_index, test_index, fold_no, kernel_keys, c_epsilons, cache):
+        """
+        :Method Name: ee_svr_fold_scores
+        :Description: This method fits an SVR on the precomputed kernel matrix of a fold for every distinct
+                      combination of parameters and scores it on the rest of the fold.
+
+        :param x: numpy array of inputs
+        :param y: numpy array of labels
+        :param train_index: The rows used for training in the fold
+        :param test_index: The rows used for scoring in the fold
+        :param fold_no: The number of the fold used as part of the cache keys
+        :param kernel_keys: List of distinct (kernel, gamma, degree), unused parameters are None
+        :param c_epsilons: List of (C, epsilon)
+        :param cache: EEKernelCache shared by all the folds
+        :return: Dictionary of the adjusted R2 keyed by (kernel, gamma, degree, C, epsilon)
+        """
+        x_train, x_test = x[train_index], x[test_index]
+        y_train, y_test = y[train_index], y[test_index]
+        n, p = x_test.shape
+
+        scores = {}
+        for kernel, gamma, degree in kernel_keys:
+            gram_train, gram_test = self.ee_svr_kernel(cache, fold_no, x_train, x_test, kernel, gamma, degree)
+            for c, epsilon in c_epsilons:
+                svr = SVR(kernel='precomputed', C=c, epsilon=epsilon).fit(gram_train, y_train)
+                r2 = r2_score(y_test, svr.predict(gram_test))
+                scores[(kernel, gamma, degree, c, epsilon)] = 1 - ((1 - r2) * (n - 1)) / (n - p - 1)
+        return scores
+
+    def ee_svr_kernel(self, cache, fold_no, x_train, x_test, kernel, gamma, degree):
+        """
+        :Method Name: ee_svr_kernel
+        :Description: This method computes the kernel matrices of a fold as done by SVR. The dot products and
+                      the squared distances of the fold are cached as every kernel is derived from one of them.
+
+        :param cache: EEKernelCache shared by all the folds
+        :param fold_no: The number of the fold
+        :param x_train: Training inputs of the fold
+        :param x_test: Scoring inputs of the fold
+        :param kernel: 'linear', 'poly', 'rbf' or 'sigmoid'
+        :param gamma: 'scale' or 'auto'
+        :param degree: The degree of the 'poly' kernel
+        :return: Tuple of the kernel matrix of the training rows and that of the scoring rows against them
+        """
+        if kernel == 'rbf':
+            base_train, base_test = cache.ee_get((fold_no, 'squared_distances'),
+                                                 lambda: (euclidean_distances(x_train, squared=True),
+                                                          euclidean_distances(x_test, x_train, squared=True)))
+        else:
+            base_train, base_test = cache.ee_get((fold_no, 'dot'),
+                                                 lambda: (x_train @ x_train.T, x_test @ x_train.T))
+        if kernel == 'linear':
+            return base_train, base_test
+
+        # The values of gamma are those of SVR with its default coef0 of 0.
+        if gamma == 'scale':
+            variance = x_train.var()
+            gamma = 1.0 / (x_train.shape[1] * variance) if variance != 0 else 1.0
+        else:
+            gamma = 1.0 / x_train.shape[1]
+
+        if kernel == 'rbf':
+            return np.exp(-gamma * base_train), np.exp(-gamma * base_test)
+        if kernel == 'poly':
+            return (gamma * base_train) ** degree, (gamma * base_test) ** degree
+        return np.tanh(gamma * base_train), np.tanh(gamma * base_test)
+
     def ee_best_random_forest(self, train_x, train_y):
         """
         :Method Name: ee_best_random_forest
@@ -239,32 +693,41 @@ class EEModelFinder:
 
             }
 
-            message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()}) of random forest " \
-                      f"regressor "
-            self.logger.log(log_file, message)
+            if self.rf_warm_start_search:
+                message = f"Using warm started forests to obtain the optimum parameters({param_grid.keys()}) of " \
+                          f"random forest regressor"
+                self.logger.log(log_file, message)
 
-            # RandomSearchCV is used as there are a large number combination of parameters.
-            grid = RandomizedSearchCV(estimator=self.rfr, param_distributions=param_grid, n_iter=500,
-                                      cv=self.kfold, n_jobs=-1,
-                                      scoring={'n-mse': 'neg_mean_squared_error',
-                                               'adjusted-R2': self.ee_adj_r2},
-                                      refit='adjusted-R2', verbose=0)
+                best_params, score, self.search_results["rfr"] = self.ee_random_forest_warm_start_search(
+                    train_x, train_y, param_grid, n_iter=500)
+            else:
+                message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()}) of random " \
+                          f"forest regressor "
+                self.logger.log(log_file, message)
 
-            grid.fit(train_x, train_y)
+                # RandomSearchCV is used as there are a large number combination of parameters.
+                # In the halving mode the number of trees is the resource given to the promising candidates.
+                # The best forest is refitted below with n_jobs instead of the single thread of the candidates.
+                grid = self.ee_search(estimator=self.rfr, param_grid=param_grid, train_x=train_x, n_iter=500,
+                                      resource="n_estimators", min_resources=10, refit=False)
 
-            n_estimators = grid.best_params_['n_estimators']
-            criterion = grid.best_params_['criterion']
-            min_samples_split = grid.best_params_['min_samples_split']
-            max_features = grid.best_params_['max_features']
-            ccp_alpha = grid.best_params_['ccp_alpha']
-            score = grid.best_score_
+                grid.fit(train_x, train_y)
+                self.ee_log_cut_short(grid, "random forest regressor")
+                best_params, score = self.ee_best_params(grid)
+                self.search_results["rfr"] = grid.cv_results_
+
+            n_estimators = best_params['n_estimators']
+            criterion = best_params['criterion']
+            min_samples_split = best_params['min_samples_split']
+            max_features = best_params['max_features']
+            ccp_alpha = best_params['ccp_alpha']
 
             message = f" The optimum parameters of random forrest regressor are n_estimators={n_estimators}," \
                       f" criterion={criterion}, min_samples_split={min_samples_split}, max_features ={max_features}" \
                       f",ccp_alpha={ccp_alpha} with the adjusted R2 score of {score}"
             self.logger.log(log_file, message)
 
-            self.rfr = RandomForestRegressor(n_jobs=-1, verbose=0,
+            self.rfr = RandomForestRegressor(n_jobs=self.n_jobs, verbose=0,
                                              n_estimators=n_estimators, criterion=criterion,
                                              min_samples_split=min_samples_split,
                                              max_features=max_features, ccp_alpha=ccp_alpha
@@ -284,6 +747,89 @@ class EEModelFinder:
             log_file.close()
             raise e
 
+    def ee_random_forest_warm_start_search(self, train_x, train_y, param_grid, n_iter):
+        """
+        :Method Name: ee_random_forest_warm_start_search
+        :Description: This method scores random forest candidates by the mean adjusted R2 over the cross
+                      validation folds like RandomizedSearchCV, but n_estimators is not sampled. For every sampled
+                      combination of the other parameters, a single forest is grown with warm_start in every fold
+                      and scored each time it reaches one of the values of n_estimators, so the largest forest
+                      also gives the results of all the smaller ones. n_iter/(number of values of n_estimators)
+                      combinations are sampled, so the same number of candidates is scored as by
+                      RandomizedSearchCV with n_iter.
+
+        :param train_x: Input training Data
+        :param train_y: Input training labels
+        :param param_grid: The random forest parameter grid including n_estimators
+        :param n_iter: The number of candidates scored
+        :return: Tuple of the best parameters, their mean adjusted R2 and a dictionary with the 'params' and
+                 'mean_test_score' of all the candidates
+        """
+        sizes = sorted(param_grid['n_estimators'])
+        other_params = {key: value for key, value in param_grid.items() if key != 'n_estimators'}
+        no_of_combinations = min(-(-n_iter // len(sizes)), len(ParameterGrid(other_params)))
+        combinations = list(ParameterSampler(other_params, n_iter=no_of_combinations))
+
+        folds = list(self.kfold.split(train_x))
+        # Without a deadline all the combinations are run as a single batch.
+        batch_size = self.ee_budget_batch_size() if self.deadline is not None else len(combinations)
+        fold_scores = []
+        for start in range(0, len(combinations), batch_size):
+            if start > 0 and time.time() >= self.deadline:
+                log_file = open(self.log_path, 'a+')
+                message = f"Search of random forest regressor cut short by the time budget after {start} of " \
+                          f"{len(combinations)} candidates"
+                self.logger.log(log_file, message)
+                log_file.close()
+                combinations = combinations[:start]
+                break
+            fold_scores.extend(Parallel(n_jobs=self.n_jobs)(
+                delayed(self.ee_random_forest_checkpoint_scores)(params, sizes, train_x.iloc[train_index],
+                                                                 train_y.iloc[train_index], train_x.iloc[test_index],
+                                                                 train_y.iloc[test_index])
+                for params in combinations[start:start + batch_size] for train_index, test_index in folds))
+
+        best_params, best_score = None, -np.inf
+        results = {"params": [], "mean_test_score": []}
+        for i, params in enumerate(combinations):
+            # Like RandomizedSearchCV, a candidate which could not be fitted is scored nan and never the best.
+            scores = np.mean(fold_scores[i * len(folds):(i + 1) * len(folds)], axis=0)
+            for n_estimators, score in zip(sizes, scores):
+                results["params"].append(dict(params, n_estimators=n_estimators))
+                results["mean_test_score"].append(score)
+                if score > best_score:
+                    best_params, best_score = dict(params, n_estimators=n_estimators), score
+
+        if best_params is None:
+            raise ValueError("None of the random forest candidates could be fitted")
+        results["mean_test_score"] = np.array(results["mean_test_score"])
+        return best_params, best_score, results
+
+    def ee_random_forest_checkpoint_scores(self, params, sizes, x_train, y_train, x_test, y_test):
+        """
+        :Method Name: ee_random_forest_checkpoint_scores
+        :Description: This method grows a single random forest on a fold, adding trees with warm_start until each
+                      of the given sizes and scoring it at every size.
+
+        :param params: The parameters of the forest other than n_estimators
+        :param sizes: Sorted list of the values of n_estimators
+        :param x_train: Training inputs of the fold
+        :param y_train: Training labels of the fold
+        :param x_test: Scoring inputs of the fold
+        :param y_test: Scoring labels of the fold
+        :return: List of the adjusted R2 of the forest at every size, nan if it could not be fitted
+        """
+        forest = RandomForestRegressor(warm_start=True, n_jobs=1, verbose=0, **params)
+        scores = []
+        try:
+            for n_estimators in sizes:
+                forest.set_params(n_estimators=n_estimators)
+                forest.fit(x_train, y_train)
+                scores.append(self.ee_adj_r2(forest, x_test, y_test))
+        except ValueError:
+            scores.extend([np.nan] * (len(sizes) - len(scores)))
+        return scores
+
     def ee_best_xgb_regressor(self, train_x, train_y):
         """
         :Method Name: ee_best_xgb_regressor
@@ -306,29 +852,119 @@ class EEModelFinder:
                 "verbosity": [0]
             }
 
+            if self.xgb_early_stopping_rounds:
+                log_file.close()
+                return self.ee_best_xgb_regressor_early_stopping(train_x, train_y, param_grid)
+
             message = f"Using GridSearchCV to obtain the optimum parameters({param_grid.keys()}) of xgb regressor"
             self.logger.log(log_file, message)
 
             # RandomSearchCV is used as there are a large number combination of parameters.
-            grid = RandomizedSearchCV(estimator=self.xgb, param_distributions=param_grid, n_iter=250,
-                                      cv=self.kfold, n_jobs=-1,
-                                      scoring={'n-mse': 'neg_mean_squared_error',
-                                               'adjusted-R2': self.ee_adj_r2},
-                                      refit='adjusted-R2', verbose=0)
+            # In the halving mode the number of boosting rounds is the resource given to the promising candidates.
+            # The best model is refitted below with n_jobs instead of the single thread of the candidates.
+            grid = self.ee_search(estimator=self.xgb, param_grid=param_grid, train_x=train_x, n_iter=250,
+                                  resource="n_estimators", min_resources=30, refit=False)
             grid.fit(train_x, train_y)
+            self.ee_log_cut_short(grid, "xgb regressor")
+
+            best_params, score = self.ee_best_params(grid)
+            learning_rate = best_params['learning_rate']
+            colsample_bytree = best_params['colsample_bytree']
+            max_depth = best_params['max_depth']
+            n_estimators = best_params['n_estimators']
+            self.search_results["xgb"] = grid.cv_results_
+
+            message = f" The optimum parameters of xgb-regressor are learning_rate={learning_rate}, " \
+                      f"max_depth={max_depth}, colsample_bytree={colsample_bytree}, n_estimators ={n_estimators} " \
+                      f"with the adjusted R2 score of {score}"
+            self.logger.log(log_file, message)
+
+            self.xgb = XGBRegressor(n_jobs=self.n_jobs, verbosity=0, learning_rate=learning_rate,
+                                    colsample_bytree=colsample_bytree,
+                                    max_depth=max_depth, n_estimators=n_estimators)
+
+            self.xgb.fit(train_x, train_y)
+            message = "Best xgb regressor trained"
+            self.logger.log(log_file, message)
+
+            log_file.close()
+            return self.xgb
+
+        except Exception as e:
+            log_file = open(self.log_path, 'a+')
+            message = f"There was a problem while fitting Random Forest Regressor: {str(e)}"
+            self.logger.log(log_file, message)
+            log_file.close()
+            raise e
+
+    def ee_best_xgb_regressor_early_stopping(self, train_x, train_y, param_grid):
+        """
+        :Method Name: ee_best_xgb_regressor_early_stopping
+        :Description: This method trains and returns the best xgb regressor, where the number of boosting rounds
+                      is found by early stopping. Every candidate is trained once for up to the largest n_estimators
+                      of param_grid and stopped once the error on a held out part of the training data stops
+                      improving, the same held out part is used to score the candidate. The best model is then
+                      trained on all the training data for the number of rounds at which it stopped. As every
+                      candidate is trained only once, the search mode does not apply here.
+
+        :param train_x: Input training Data
+        :param train_y: Input training labels
+        :param param_grid: Dictionary of the values of every parameter including n_estimators
+        :return: The best xgb regressor model
+        :On failure: Exception
+        """
+        try:
+            log_file = open(self.log_path, 'a+')
+
+            param_grid = dict(param_grid)
+            max_rounds = max(param_grid.pop('n_estimators'))
+            fit_x, valid_x, fit_y, valid_y = train_test_split(train_x, train_y, test_size=0.2, random_state=42)
+            # The held out rows are the only validation fold of the search(-1 marks the rows used for training).
+            holdout = PredefinedSplit([-1] * len(fit_x) + [0] * len(valid_x))
+
+            # Newer versions of xgboost take early_stopping_rounds in the constructor, older ones in fit.
+            fit_params = {"eval_set": [(valid_x, valid_y)], "verbose": False}
+            estimator_params = {}
+            if "early_stopping_rounds" in XGBRegressor().get_params():
+                estimator_params["early_stopping_rounds"] = self.xgb_early_stopping_rounds
+            else:
+                fit_params["early_stopping_rounds"] = self.xgb_early_stopping_rounds
+
+            message = f"Using GridSearchCV with early stopping after {self.xgb_early_stopping_rounds} rounds to " \
+                      f"obtain the optimum parameters({param_grid.keys()}) of xgb regressor"
+            self.logger.log(log_file, message)
+
+            # Without n_estimators there are only a few combination of parameters and all of them are searched.
+            # The search is not refitted as training on the held out rows would leave nothing to stop against.
+            estimator = XGBRegressor(n_jobs=1, n_estimators=max_rounds, **estimator_params)
+            if self.deadline is not None:
+                grid = EEBudgetedSearchCV(estimator=estimator, candidates=list(ParameterGrid(param_grid)),
+                                          deadline=self.deadline, batch_size=self.ee_budget_batch_size(),
+                                          cv=holdout, n_jobs=self.n_jobs, scoring=self.ee_adj_r2, refit=False,
+                                          verbose=0)
+            else:
+                grid = GridSearchCV(estimator=estimator, param_grid=param_grid, cv=holdout, n_jobs=self.n_jobs,
+                                    scoring=self.ee_adj_r2, refit=False, verbose=0)
+            grid.fit(pd.concat([fit_x, valid_x]), pd.concat([fit_y, valid_y]), **fit_params)
+            self.ee_log_cut_short(grid, "xgb regressor")
 
             learning_rate = grid.best_params_['learning_rate']
             colsample_bytree = grid.best_params_['colsample_bytree']
             max_depth = grid.best_params_['max_depth']
-            n_estimators = grid.best_params_['n_estimators']
             score = grid.best_score_
+            self.search_results["xgb"] = grid.cv_results_
+
+            # The best candidate is trained once more to obtain the round at which it stopped.
+            best_xgb = estimator.set_params(n_jobs=self.n_jobs, **grid.best_params_).fit(fit_x, fit_y, **fit_params)
+            n_estimators = best_xgb.best_iteration + 1
 
             message = f" The optimum parameters of xgb-regressor are learning_rate={learning_rate}, " \
                       f"max_depth={max_depth}, colsample_bytree={colsample_bytree}, n_estimators ={n_estimators} " \
                       f"with the adjusted R2 score of {score}"
             self.logger.log(log_file, message)
 
-            self.xgb = XGBRegressor(n_jobs=-1, verbose=0, learning_rate=learning_rate,
+            # The final model is trained without early stopping for exactly the best number of rounds.
+            self.xgb = XGBRegressor(n_jobs=self.n_jobs, verbosity=0, learning_rate=learning_rate,
                                     colsample_bytree=colsample_bytree,
                                     max_depth=max_depth, n_estimators=n_estimators)
 
@@ -341,7 +977,7 @@ class EEModelFinder:
 
         except Exception as e:
             log_file = open(self.log_path, 'a+')
-            message = f"There was a problem while fitting Random Forest Regressor: {str(e)}"
+            message = f"There was a problem while fitting xgb regressor with early stopping: {str(e)}"
             self.logger.log(log_file, message)
             log_file.close()
             raise e
@@ -395,6 +1031,91 @@ class EEModelFinder:
             log_file.close()
             raise e
 
+    def ee_concurrent_family_search(self, train_x, train_y, test_x, test_y):
+        """
+        :Method Name: ee_concurrent_family_search
+        :Description: This method runs the searches of all the models at the same time, each in its own process.
+                      The n_jobs cpus are divided between the searches by ee_family_cpus. With fewer cpus than
+                      searches, only as many searches as cpus run at a time, the most expensive ones first. The best
+                      model of every search is kept as if it had run here.
+
+        :param train_x: the training features
+        :param train_y: the training labels
+        :param test_x: the test features
+        :param test_y: the test labels
+        :return: Dictionary of the adjusted r2 score of the best model of every search on the test data
+        :On Failure: Exception
+        """
+        log_file = open(self.log_path, 'a+')
+
+        budget = self.n_jobs if self.n_jobs > 0 else os.cpu_count() or 1
+        family_n_jobs = self.ee_family_cpus(budget)
+        max_workers = min(len(self.family_searches), budget)
+
+        message = f"Concurrent search for best model started with {max_workers} processes and the cpus " \
+                  f"{family_n_jobs}"
+        self.logger.log(log_file, message)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for family in sorted(self.family_searches, key=lambda family: -self.family_costs[family]):
+                # Every search gets a copy of the model finder limited to its share of the cpus.
+                model_finder = copy.copy(self)
+                model_finder.n_jobs = family_n_jobs[family]
+                model_finder.concurrent_families = False
+                futures[family] = executor.submit(model_finder.ee_best_family, family, train_x, train_y)
+
+            # The scores are gathered in the order of the sequential search so that ties are resolved the same way.
+            r2_adj = {}
+            for family in self.family_searches:
+                future = futures[family]
+                model, self.search_results[family] = future.result()
+                setattr(self, family, model)
+                r2_adj[family] = self.ee_adj_r2(model, test_x, test_y)
+
+                message = f"Search for best {family} model ended"
+                self.logger.log(log_file, message)
+
+        log_file.close()
+        return r2_adj
+
+    def ee_family_cpus(self, budget):
+        """
+        :Method Name: ee_family_cpus
+        :Description: This method divides a number of cpus between the searches of all the models. Every search
+                      gets one cpu and the remaining cpus are divided in proportion to the expected costs by the
+                      largest remainder method, so the shares add up exactly to the budget. With fewer cpus than
+                      searches, every search gets a single cpu and they do not all run at the same time.
+
+        :param budget: The number of cpus to divide
+        :return: Dictionary of the number of cpus of every search
+        """
+        if budget <= len(self.family_costs):
+            return {family: 1 for family in self.family_costs}
+
+        spare = budget - len(self.family_costs)
+        total_cost = sum(self.family_costs.values())
+        quotas = {family: spare * cost / total_cost for family, cost in self.family_costs.items()}
+        family_cpus = {family: 1 + int(quota) for family, quota in quotas.items()}
+        by_remainder = sorted(quotas, key=lambda family: quotas[family] - int(quotas[family]), reverse=True)
+        for family in by_remainder[:budget - sum(family_cpus.values())]:
+            family_cpus[family] += 1
+        return family_cpus
+
+    def ee_best_family(self, family, train_x, train_y):
+        """
+        :Method Name: ee_best_family
+        :Description: This method runs the search of a single model inside a worker process of
+                      ee_concurrent_family_search.
+
+        :param family: The key of the model in family_searches
+        :param train_x: the training features
+        :param train_y: the training labels
+        :return: Tuple of the best model and the cross validation results of its search
+        """
+        model = getattr(self, self.family_searches[family])(train_x, train_y)
+        return model, self.search_results.get(family)
+
     def ee_best_model(self, train_x, train_y, test_x, test_y):
         """
         :Method Name: ee_best_model
@@ -410,9 +1131,14 @@ class EEModelFinder:
 
         try:
             log_file = open(self.log_path, 'a+')
-            message = "Search for best model started"
+            message = f"Search for best model started in {self.search_mode} search mode"
             self.logger.log(log_file, message)
 
+            if self.concurrent_families:
+                r2_adj = self.ee_concurrent_family_search(train_x, train_y, test_x, test_y)
+                log_file.close()
+                return self.ee_best_model_from_adj_r2(r2_adj)
+
             r2_adj = {}
 
             message = "Search for best ridge model started"
@@ -0,0 +1,31 @@
+import gc
+import os
+
+# Gunicorn configuration for serving the web application in production.
+# Usage: gunicorn --config gunicorn.conf.py wsgi:app
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Every worker process handles several requests at a time with threads, so a long upload or prediction
+# does not block the other users. The uploads of /train and /prediction are still processed one at a time by all
+# the workers(see main.py) and training runs in a separate process with a lower priority than the workers.
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+
+# Uploads of big datasets and predictions on them can take a while.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+
+# The application and with it the models are loaded once in the master process before the workers are forked,
+# so all the workers share the memory of the models copy-on-write.
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    # Objects already loaded are moved out of the garbage collector's generations so that collections in the
+    # workers do not write to(and thereby copy) the shared memory pages of the models.
+    gc.freeze()
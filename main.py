@@ -1,13 +1,19 @@
 import os
+import sys
 import shutil
+import subprocess
 import threading
 from wsgiref import simple_server
-from flask import Flask, render_template, request, url_for
+from flask import Flask, render_template, request, url_for, jsonify
 from flask_cors import cross_origin, CORS
 from EETraining.EEDataInjestionCompTrain import EEDataInjestionCompTrain
-from EETraining.EEModelDevelopment import EETrainingPipeline
 from EEPrediction.EEPredictionPipeline import EEPredictionPipeline
 from EEPrediction.EEDataInjestionCompPred import EEDataInjestionCompPred
+from EEPrediction.EEModelRegistry import EEModelRegistry
+from EEPrediction.EEJsonValidatorPred import EEJsonValidatorPred
+from EEPrediction.EEValidationError import EEValidationError
+from EEPrediction.EEPredictionCache import EEPredictionCache
+from EEFileOperations.EEFileLock import EEFileLock
 
 os.putenv('LANG', 'en_US.UTF-8')
 os.putenv('LC_ALL', 'en_US.UTF-8')
@@ -15,6 +21,35 @@ os.putenv('LC_ALL', 'en_US.UTF-8')
 app = Flask(__name__)
 CORS(app)
 
+# Created once so that the EESchema is not read again for every api request.
+json_validator = EEJsonValidatorPred()
+api_pred_pipeline = EEPredictionPipeline()
+
+# The uploads, and the files written by their ingestion and prediction, have fixed paths shared by all the threads
+# and gunicorn workers, so only one upload is processed at a time. Training reads the validated training data until
+# it ends, so a new training dataset is only accepted after that.
+UPLOAD_LOCK_PATH = "ee_upload.lock"
+TRAINING_LOCK_PATH = "ee_training.lock"
+
+
+def ee_start_training(training_lock):
+    """
+    :Method Name: ee_start_training
+    :Description: This method starts training in a separate process instead of a thread of the web worker, so
+                  that it does not fork the worker for its model searches and runs at a lower priority than the
+                  requests. The training lock is released once the process has ended.
+    :param training_lock: The acquired EEFileLock of TRAINING_LOCK_PATH
+    :return: The training process
+    """
+    process = subprocess.Popen([sys.executable, "-m", "EETraining.EEModelDevelopment"])
+
+    def release_after_training():
+        process.wait()
+        training_lock.ee_release()
+
+    threading.Thread(target=release_after_training, name="EETrainingProcess", daemon=True).start()
+    return process
+
 
 @app.route("/", methods=['GET'])
 @cross_origin()
@@ -33,29 +68,33 @@ def ee_train_route():
 
             file_item = request.files["train_dataset"]
             if file_item.filename:
-                file_name = "ENB2022_data.xlsx"
-
-                if os.path.isdir("EEUploaded_Files"):
-                    shutil.rmtree("EEUploaded_Files")
-                    os.mkdir("EEUploaded_Files")
-                else:
-                    os.mkdir("EEUploaded_Files")
-
-                with open(os.path.join("EEUploaded_Files", file_name), 'wb') as f:
-                    f.write(file_item.read())
-
-                train_validation_obj = EEDataInjestionCompTrain(path="EEUploaded_Files")
-                train_validation_obj.ee_data_injestion_complete()
-
-                if os.path.isdir("EEModels"):
-                    shutil.rmtree("EEModels")
-                    os.mkdir("EEModels")
-                else:
-                    os.mkdir("EEModels")
-
-                training_pipeline = EETrainingPipeline()
-                t1 = threading.Thread(target=training_pipeline.ee_model_train)
-                t1.start()
+                training_lock = EEFileLock(TRAINING_LOCK_PATH)
+                if not training_lock.ee_acquire(blocking=False):
+                    message = "Training is already running\n TRY AGAIN once it has finished"
+                    return render_template("train.html", message=message, image_url=img_url)
+
+                try:
+                    with EEFileLock(UPLOAD_LOCK_PATH):
+                        # The format of the upload(xlsx, csv or parquet) is given by its extension.
+                        file_name = "ENB2022_data" + os.path.splitext(file_item.filename)[1].lower()
+
+                        if os.path.isdir("EEUploaded_Files"):
+                            shutil.rmtree("EEUploaded_Files")
+                            os.mkdir("EEUploaded_Files")
+                        else:
+                            os.mkdir("EEUploaded_Files")
+
+                        with open(os.path.join("EEUploaded_Files", file_name), 'wb') as f:
+                            f.write(file_item.read())
+
+                        train_validation_obj = EEDataInjestionCompTrain(path="EEUploaded_Files")
+                        train_validation_obj.ee_data_injestion_complete()
+
+                    # The models currently served stay in place, training publishes a new version when it succeeds.
+                    ee_start_training(training_lock)
+                except Exception:
+                    training_lock.ee_release()
+                    raise
             else:
                 message = "No records Found\n TRY AGAIN"
                 return render_template("train.html", message=message, image_url=img_url)
@@ -79,39 +118,40 @@ def ee_prediction_route():
     img_url = url_for('static', filename='ineuron-logo.webp')
     try:
 
-        if request.form is not None:
+        with EEFileLock(UPLOAD_LOCK_PATH):
+            if request.form is not None:
 
-            file_item = request.files['dataset']
-            if file_item.filename:
-                file_name = "ENB2022_data.xlsx"
+                file_item = request.files['dataset']
+                if file_item.filename:
+                    # The format of the upload(xlsx, csv or parquet) is given by its extension.
+                    file_name = "ENB2022_data" + os.path.splitext(file_item.filename)[1].lower()
 
-                if os.path.isdir("EEUploaded_Files"):
-                    print()
-                    shutil.rmtree("EEUploaded_Files")
-                    os.mkdir("EEUploaded_Files")
-                else:
-                    os.mkdir("EEUploaded_Files")
+                    if os.path.isdir("EEUploaded_Files"):
+                        shutil.rmtree("EEUploaded_Files")
+                        os.mkdir("EEUploaded_Files")
+                    else:
+                        os.mkdir("EEUploaded_Files")
 
-                with open(os.path.join("EEUploaded_Files", file_name), 'wb') as f:
-                    f.write(file_item.read())
+                    with open(os.path.join("EEUploaded_Files", file_name), 'wb') as f:
+                        f.write(file_item.read())
 
-                pred_injestion = EEDataInjestionCompPred(path="EEUploaded_Files")
-                pred_injestion.ee_data_injestion_complete()
+                    pred_injestion = EEDataInjestionCompPred(path="EEUploaded_Files")
+                    pred_injestion.ee_data_injestion_complete()
 
-                pred_pipeline = EEPredictionPipeline()
-                result = pred_pipeline.ee_predict()
+                    pred_pipeline = EEPredictionPipeline()
+                    result = pred_pipeline.ee_predict()
 
-                return render_template("predict.html", records=result, image_url=img_url)
-            else:
-                message = "Using Default EEPrediction Dataset"
+                    return render_template("predict.html", records=result, image_url=img_url)
+                else:
+                    message = "Using Default EEPrediction Dataset"
 
-                pred_injestion = EEDataInjestionCompPred(path="EEPredDatasets")
-                pred_injestion.ee_data_injestion_complete()
+                    pred_injestion = EEDataInjestionCompPred(path="EEPredDatasets")
+                    pred_injestion.ee_data_injestion_complete()
 
-                pred_pipeline = EEPredictionPipeline()
-                result = pred_pipeline.ee_predict()
+                    pred_pipeline = EEPredictionPipeline()
+                    result = pred_pipeline.ee_predict()
 
-                return render_template("predict.html", message=message, records=result, image_url=img_url)
+                    return render_template("predict.html", message=message, records=result, image_url=img_url)
 
     except ValueError as e:
         message = f"Value Error: {str(e)}\n TRY AGAIN"
@@ -124,6 +164,33 @@ def ee_prediction_route():
         return render_template("predict.html", message=message, image_url=img_url)
 
 
+@app.route('/api/v1/predict', methods=["POST"])
+@cross_origin()
+def ee_api_prediction_route():
+    try:
+        body = request.get_json(force=True, silent=True)
+        if body is None:
+            return jsonify({"error": "Request body should be valid JSON"}), 400
+
+        inputs = json_validator.ee_validate_records(body)
+        result = api_pred_pipeline.ee_predict_json(inputs)
+
+        return jsonify({"predictions": result})
+
+    # Only the rows which do not match the EESchema are a bad request, a ValueError raised while predicting
+    # (eg. by the scalar or the models) is a fault of the server.
+    except EEValidationError as e:
+        return jsonify({"error": f"Value Error: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error: {str(e)}"}), 500
+
+
+@app.route('/api/v1/cache', methods=["GET"])
+@cross_origin()
+def ee_api_cache_stats_route():
+    return jsonify(EEPredictionCache.ee_get_cache().ee_stats())
+
+
 @app.route("/logs", methods=["POST"])
 @cross_origin()
 def ee_get_logs():
@@ -144,9 +211,26 @@ def ee_get_logs():
         return render_template("logs.html", heading=message, image_url=img_url)
 
 
+def ee_create_app():
+    """
+    :Method Name: ee_create_app
+    :Description: This method prepares the web application for serving. The models are loaded once at start up
+                  so that predictions do not unpickle them on every request. When gunicorn preloads the
+                  application this happens in the master process and the forked workers share the models.
+    :return: The flask application
+    """
+    try:
+        EEModelRegistry.ee_get_registry().ee_load_models()
+    except Exception:
+        # No usable models yet(e.g. before the first training), they are loaded again on the first prediction.
+        pass
+    return app
+
+
 port = int(os.getenv("PORT", 5000))
 
 if __name__ == "__main__":
+    # Development server handling one request at a time, use gunicorn(see gunicorn.conf.py) in production.
     host = '0.0.0.0'
-    httpd = simple_server.make_server(host, port, app)
+    httpd = simple_server.make_server(host, port, ee_create_app())
     httpd.serve_forever()
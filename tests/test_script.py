@@ -1,8 +1,98 @@
 import unittest
+import io
+import json
+import re
+import tempfile
+import shutil
+import threading
+import time
+from unittest import mock
 
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import Lasso, LinearRegression, Ridge
+from sklearn.model_selection import GridSearchCV, ParameterGrid, PredefinedSplit, train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+from threadpoolctl import threadpool_info
+from xgboost import XGBRegressor
+
+import main
 from main import app
+from EEFileOperations.EECompiledTreeModel import EECompiledTreeModel
+from EEFileOperations.EEFileLock import EEFileLock
+from EEFileOperations.EEFileOperations import EEFileOperation
+from EEFileOperations.EEParallelValidator import EEParallelValidator
+from EEFileOperations.EEStreamingReader import EEStreamingReader
+from EEFileOperations.EEWorkbookCache import EEWorkbookCache
+from EEPrediction.EEDataLoaderPred import EEDataLoaderPred
+from EEPrediction.EEModelRegistry import EEModelRegistry
+from EEPrediction.EEPredictionCache import EEPredictionCache
+from EEPrediction.EEPredictionPipeline import EEPredictionPipeline
+from EETraining.EEClusteringTrain import EEClusteringTrain
+from EETraining.EEDataLoaderTrain import EEDataLoaderTrain
+from EETraining.EEModelDevelopment import EETrainingPipeline
+from EETraining.EEModelFinder import EEModelFinder
 import os
 
+COLUMNS = ['X1', 'X2', 'X3', 'X4', 'X5', 'X6', 'X7', 'X8']
+
+
+def make_train_x():
+    """
+    Returns the random inputs the models of make_model_version are trained on.
+    """
+    rng = np.random.RandomState(0)
+    return pd.DataFrame(rng.rand(60, len(COLUMNS)), columns=COLUMNS)
+
+
+def make_model_version(models_root, scaler_columns=COLUMNS, n_clusters=2, columns_to_drop=None):
+    """
+    Publishes a small model version trained on random data in the layout written by the training pipeline.
+    columns_to_drop is a dictionary with the list of columns dropped for every output, none by default.
+    """
+    train_x = make_train_x()
+    file_operator = EEFileOperation()
+    version_dir = file_operator.ee_create_model_version(models_root)
+
+    scaler = StandardScaler().fit(train_x[scaler_columns])
+    file_operator.ee_save_model(scaler, version_dir, "scalar.pickle")
+    for output_no in (1, 2):
+        col_to_drop = (columns_to_drop or {}).get(output_no, [])
+        with open(os.path.join(version_dir, f"column_to_drop_Y{output_no}.txt"), 'w') as f:
+            f.write(",".join(col_to_drop))
+        scaled_x = pd.DataFrame(scaler.transform(train_x[scaler_columns]), columns=scaler_columns)
+        scaled_x = scaled_x.drop(columns=col_to_drop)
+        kmeans = KMeans(n_clusters=n_clusters, n_init=1, random_state=0).fit(scaled_x)
+        file_operator.ee_save_model(kmeans, os.path.join(version_dir, "EEClustering/"),
+                                    f"clustering_model_Y{output_no}.pickle")
+        for cluster_no in range(n_clusters):
+            rows = kmeans.labels_ == cluster_no
+            model = LinearRegression().fit(scaled_x[rows], output_no * train_x['X1'][rows])
+            file_operator.ee_save_model(model, os.path.join(version_dir, "EEMlmodels/"),
+                                        f"LinearRegression_Y{output_no}_cluster_{cluster_no}.pickle")
+
+    file_operator.ee_publish_model_version(version_dir, {}, models_root)
+    return version_dir
+
+
+class TempWorkingDirTestCase(unittest.TestCase):
+    """
+    Runs every test in a new temporary working directory, as the pipeline writes its logs, models and datasets
+    relative to the working directory.
+    """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.mkdir("EElogging")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
 
 class TestToPerform(unittest.TestCase):
     def setUp(self):
@@ -16,6 +106,709 @@ class TestToPerform(unittest.TestCase):
         print(response)
         self.assertEqual(response.status_code, 200)
 
+    def test_api_predict_invalid_rows(self):
+        row = {"X1": 0.98, "X2": 514.5, "X3": 294.0, "X4": 110.25, "X5": 7.0, "X6": 2, "X7": 0.0}
+        response = self.app.post('/api/v1/predict', json={"data": [row]})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.app.post('/api/v1/predict', json=dict(row, X8="north"))
+        self.assertEqual(response.status_code, 400)
+
+        response = self.app.post('/api/v1/predict', data='{"X1": 1%s, "X2": 514.5, "X3": 294.0, "X4": 110.25, '
+                                 '"X5": 7.0, "X6": 2, "X7": 0.0, "X8": 0}' % ("0" * 400),
+                                 content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_predict_valid_rows(self):
+        rows = [{"X1": 0.98, "X2": 514.5, "X3": 294.0, "X4": 110.25, "X5": 7.0, "X6": 2, "X7": 0.0, "X8": 0},
+                {"X1": 0.62, "X2": 808.5, "X3": 367.5, "X4": 220.5, "X5": 3.5, "X6": 5, "X7": 0.4, "X8": 5}]
+        with tempfile.TemporaryDirectory() as models_root:
+            make_model_version(models_root)
+            with mock.patch.object(main.api_pred_pipeline, "model_registry", EEModelRegistry(models_root)):
+                response = self.app.post('/api/v1/predict', json={"data": rows})
+
+        self.assertEqual(response.status_code, 200)
+        predictions = response.get_json()["predictions"]
+        self.assertEqual(len(predictions), len(rows))
+        for prediction in predictions:
+            self.assertEqual(set(prediction), {"Y1", "Y2"})
+            self.assertIsInstance(prediction["Y1"], float)
+            self.assertIsInstance(prediction["Y2"], float)
+
+    def test_api_predict_server_error(self):
+        row = {"X1": 0.98, "X2": 514.5, "X3": 294.0, "X4": 110.25, "X5": 7.0, "X6": 2, "X7": 0.0, "X8": 0}
+        with tempfile.TemporaryDirectory() as models_root:
+            # A scalar which was not fitted on all the columns raises ValueError while predicting valid rows.
+            make_model_version(models_root, scaler_columns=COLUMNS[:-1])
+            with mock.patch.object(main.api_pred_pipeline, "model_registry", EEModelRegistry(models_root)):
+                response = self.app.post('/api/v1/predict', json={"data": [row]})
+
+        self.assertEqual(response.status_code, 500)
+
+
+class TestUploadRoutes(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app = app.test_client()
+
+    def post_dataset(self):
+        return self.app.post('/train', data={"train_dataset": (io.BytesIO(b"X1,X2\n1,2\n"), "ENB2022.csv")},
+                             content_type="multipart/form-data")
+
+    def test_lock_excludes_the_other_threads_until_released(self):
+        lock = EEFileLock(main.TRAINING_LOCK_PATH)
+        self.assertTrue(lock.ee_acquire(blocking=False))
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            EEFileLock(main.TRAINING_LOCK_PATH).ee_acquire(blocking=False)))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [False])
+
+        lock.ee_release()
+        other_lock = EEFileLock(main.TRAINING_LOCK_PATH)
+        self.assertTrue(other_lock.ee_acquire(blocking=False))
+        other_lock.ee_release()
+
+    def test_prediction_of_an_upload_waits_for_the_upload_lock(self):
+        lock = EEFileLock(main.UPLOAD_LOCK_PATH)
+        lock.ee_acquire()
+        responses = []
+        with mock.patch.object(main, "EEDataInjestionCompPred"), \
+                mock.patch.object(main, "EEPredictionPipeline") as pipeline:
+            pipeline.return_value.ee_predict.return_value = [{"Y1": 1.0, "Y2": 2.0}]
+            thread = threading.Thread(target=lambda: responses.append(self.app.post(
+                '/prediction', data={"dataset": (io.BytesIO(b"X1,X2\n1,2\n"), "ENB2022.csv")},
+                content_type="multipart/form-data")))
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            self.assertFalse(os.path.isdir("EEUploaded_Files"))
+
+            lock.ee_release()
+            thread.join(10)
+        self.assertEqual(responses[0].status_code, 200)
+        self.assertTrue(os.path.isdir("EEUploaded_Files"))
+
+    def test_training_runs_in_a_process_holding_the_training_lock(self):
+        training_ended = threading.Event()
+        process = mock.Mock()
+        process.wait.side_effect = lambda: training_ended.wait(10)
+        with mock.patch.object(main, "EEDataInjestionCompTrain") as ingestion, \
+                mock.patch.object(main.subprocess, "Popen", return_value=process) as popen:
+            response = self.post_dataset()
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"Training Started", response.data)
+            ingestion.return_value.ee_data_injestion_complete.assert_called_once()
+            self.assertEqual(popen.call_args[0][0][1:], ["-m", "EETraining.EEModelDevelopment"])
+
+            # A second dataset is neither ingested nor trained on while the first one is being trained on.
+            response = self.post_dataset()
+            self.assertIn(b"Training is already running", response.data)
+            ingestion.return_value.ee_data_injestion_complete.assert_called_once()
+            popen.assert_called_once()
+
+            training_ended.set()
+            for thread in threading.enumerate():
+                if thread.name == "EETrainingProcess":
+                    thread.join(10)
+            lock = EEFileLock(main.TRAINING_LOCK_PATH)
+            self.assertTrue(lock.ee_acquire(blocking=False))
+            lock.ee_release()
+
+    def test_failed_ingestion_releases_the_training_lock(self):
+        with mock.patch.object(main, "EEDataInjestionCompTrain") as ingestion, \
+                mock.patch.object(main.subprocess, "Popen") as popen:
+            ingestion.return_value.ee_data_injestion_complete.side_effect = ValueError("no good file")
+            response = self.post_dataset()
+        self.assertIn(b"no good file", response.data)
+        popen.assert_not_called()
+        lock = EEFileLock(main.TRAINING_LOCK_PATH)
+        self.assertTrue(lock.ee_acquire(blocking=False))
+        lock.ee_release()
+
+
+class TestCompiledTreeModel(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(42)
+        self.train_x = pd.DataFrame(rng.rand(300, 4).round(2), columns=['X1', 'X3', 'X7', 'X8'])
+        self.train_y = 3 * self.train_x['X1'] + np.sin(5 * self.train_x['X3']) + rng.rand(300)
+        self.test_x = pd.DataFrame(rng.rand(200, 4).round(2), columns=['X1', 'X3', 'X7', 'X8'])
+
+    def assert_same_predictions(self, model, rtol):
+        compiled_model = EECompiledTreeModel.ee_from_model(model)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.npz")
+            compiled_model.ee_save(path)
+            compiled_model = EECompiledTreeModel.ee_load(path)
+
+        np.testing.assert_allclose(compiled_model.predict(self.test_x), model.predict(self.test_x), rtol=rtol)
+        np.testing.assert_allclose(compiled_model.predict(self.test_x.iloc[:1]), model.predict(self.test_x.iloc[:1]),
+                                   rtol=rtol)
+
+    def test_random_forest(self):
+        model = RandomForestRegressor(n_estimators=30, random_state=42).fit(self.train_x, self.train_y)
+        self.assert_same_predictions(model, rtol=1e-10)
+
+    def test_xgb(self):
+        model = XGBRegressor(n_estimators=50, max_depth=5).fit(self.train_x, self.train_y)
+        # xgboost adds the leaf values in float32.
+        self.assert_same_predictions(model, rtol=1e-5)
+
+    def best_time(self, predict, x, repeat=7):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            predict(x)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def test_compiled_model_is_used_only_where_it_is_faster(self):
+        for model in (RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=1),
+                      XGBRegressor(n_estimators=200, max_depth=6, n_jobs=1)):
+            model.fit(self.train_x, self.train_y)
+            compiled_model = EECompiledTreeModel.ee_from_model(model)
+            models = {"ml_models": {(1, 0): model}, "compiled_models": {(1, 0): compiled_model}}
+            registry = EEModelRegistry.__new__(EEModelRegistry)
+
+            # The compiled model is chosen up to max_rows rows, where it has to be faster than the original model.
+            max_rows = compiled_model.max_rows[compiled_model.aggregation]
+            self.assertIs(registry.ee_get_ml_model(models, 1, 0, no_of_rows=max_rows), compiled_model)
+            rows = self.test_x.iloc[:max_rows]
+            self.assertLess(self.best_time(compiled_model.predict, rows), self.best_time(model.predict, rows))
+
+            # Larger batches and callers which do not give the number of rows use the original model.
+            self.assertIs(registry.ee_get_ml_model(models, 1, 0, no_of_rows=len(self.test_x)), model)
+            self.assertIs(registry.ee_get_ml_model(models, 1, 0), model)
+
+
+class CountingLasso(Lasso):
+    fits = 0
+
+    def fit(self, *args, **kwargs):
+        CountingLasso.fits += 1
+        return super().fit(*args, **kwargs)
+
+
+class TestModelFinder(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = np.random.RandomState(42)
+        self.train_x = pd.DataFrame(rng.rand(100, 4).round(2), columns=['X1', 'X3', 'X7', 'X8'])
+        self.train_y = 3 * self.train_x['X1'] - 2 * self.train_x['X3'] + rng.rand(100)
+
+    def test_best_model_of_search_is_not_refitted(self):
+        CountingLasso.fits = 0
+        with mock.patch("EETraining.EEModelFinder.Lasso", CountingLasso):
+            model_finder = EEModelFinder(n_jobs=1)
+            model = model_finder.ee_best_lasso_regressor(self.train_x, self.train_y)
+
+        results = model_finder.search_results["lasso"]
+        no_of_candidates = len(results["params"])
+        # Every candidate is fitted once per fold and only the best one once more on all the data.
+        self.assertEqual(CountingLasso.fits, no_of_candidates * model_finder.kfold.get_n_splits() + 1)
+        self.assertEqual(model.alpha, results["params"][np.argmin(results["rank_test_adjusted-R2"])]["alpha"])
+
+    def test_path_search_matches_the_grid_search(self):
+        for family, fixed in (("ridge", ("solver", "svd")), ("lasso", ("selection", "cyclic"))):
+            search = {"ridge": "ee_best_ridge_regressor", "lasso": "ee_best_lasso_regressor"}[family]
+            models = {}
+            results = {}
+            for linear_path_search in (False, True):
+                np.random.seed(0)
+                model_finder = EEModelFinder(n_jobs=1, linear_path_search=linear_path_search)
+                models[linear_path_search] = getattr(model_finder, search)(self.train_x, self.train_y)
+                results[linear_path_search] = model_finder.search_results[family]
+
+            # The path scores every alpha like the grid search with the solver the path is computed with.
+            grid = results[False]
+            rows = [i for i, params in enumerate(grid["params"]) if params[fixed[0]] == fixed[1]]
+            grid_alphas = np.array([grid["params"][i]["alpha"] for i in rows])
+            grid_scores = grid["mean_test_adjusted-R2"][rows]
+            path_alphas = np.array([params["alpha"] for params in results[True]["params"]])
+            np.testing.assert_array_equal(grid_alphas, path_alphas)
+            np.testing.assert_allclose(results[True]["mean_test_score"], grid_scores, rtol=1e-4)
+
+            self.assertEqual(models[True].alpha, grid_alphas[np.argmax(grid_scores)])
+            np.testing.assert_allclose(models[True].coef_, models[False].coef_, atol=1e-3)
+
+    def test_precomputed_kernel_search_matches_the_grid_search(self):
+        # A smaller grid than the one of ee_best_svr still covers every kernel and the parameters it ignores.
+        param_grid = {'kernel': ['linear', 'poly', 'rbf', 'sigmoid'], 'gamma': ['scale', 'auto'], 'C': [0.1, 3],
+                      'degree': [2, 3], 'epsilon': [0.03, 0.3]}
+        model_finder = EEModelFinder(n_jobs=1, svr_kernel_cache_mb=64)
+        grid = model_finder.ee_search(SVR(), param_grid, self.train_x)
+        grid.fit(self.train_x, self.train_y)
+        best_params, score, results = model_finder.ee_svr_precomputed_search(self.train_x, self.train_y, param_grid)
+
+        # Every candidate is scored as by GridSearchCV and the same one is chosen.
+        self.assertEqual(results["params"], list(grid.cv_results_["params"]))
+        np.testing.assert_allclose(results["mean_test_score"], grid.cv_results_["mean_test_adjusted-R2"],
+                                   rtol=1e-6, atol=1e-9)
+        self.assertEqual(best_params, grid.best_params_)
+        self.assertAlmostEqual(score, grid.best_score_)
+
+    def test_early_stopping_picks_the_rounds_of_the_grid_search(self):
+        param_grid = {'learning_rate': [0.1, 0.3], 'colsample_bytree': [0.5, 1.0], 'max_depth': [2, 3],
+                      'n_estimators': [5, 40], 'verbosity': [0]}
+        # Waiting as many rounds as the largest n_estimators stops every candidate at its best round.
+        model_finder = EEModelFinder(n_jobs=1, xgb_early_stopping_rounds=40)
+        model = model_finder.ee_best_xgb_regressor_early_stopping(self.train_x, self.train_y, param_grid)
+
+        # The previous search over every number of rounds, scored on the same held out rows.
+        fit_x, valid_x, fit_y, valid_y = train_test_split(self.train_x, self.train_y, test_size=0.2,
+                                                          random_state=42)
+        grid = GridSearchCV(XGBRegressor(n_jobs=1), dict(param_grid, n_estimators=list(range(1, 41))),
+                            cv=PredefinedSplit([-1] * len(fit_x) + [0] * len(valid_x)),
+                            scoring=model_finder.ee_adj_r2, refit=False)
+        grid.fit(pd.concat([fit_x, valid_x]), pd.concat([fit_y, valid_y]))
+
+        self.assertLessEqual(model.n_estimators, 40)
+        for param in ('learning_rate', 'colsample_bytree', 'max_depth', 'n_estimators'):
+            self.assertEqual(model.get_params()[param], grid.best_params_[param])
+        results = model_finder.search_results["xgb"]
+        self.assertAlmostEqual(results["mean_test_score"].max(), grid.best_score_, places=5)
+
+    def test_warm_start_search_matches_fitting_every_forest(self):
+        # A fixed random_state makes a forest grown with warm_start the same as one fitted with all its trees.
+        param_grid = {'n_estimators': [5, 10, 20], 'max_depth': [2, 4], 'min_samples_split': [2, 5],
+                      'random_state': [0]}
+        model_finder = EEModelFinder(n_jobs=1, rf_warm_start_search=True)
+        best_params, score, results = model_finder.ee_random_forest_warm_start_search(self.train_x, self.train_y,
+                                                                                     param_grid, n_iter=12)
+
+        grid = GridSearchCV(RandomForestRegressor(n_jobs=1), param_grid, cv=model_finder.kfold,
+                            scoring=model_finder.ee_adj_r2, refit=False)
+        grid.fit(self.train_x, self.train_y)
+        grid_scores = {json.dumps(params, sort_keys=True): score
+                       for params, score in zip(grid.cv_results_["params"], grid.cv_results_["mean_test_score"])}
+
+        self.assertEqual(len(results["params"]), len(grid_scores))
+        for params, warm_start_score in zip(results["params"], results["mean_test_score"]):
+            self.assertAlmostEqual(warm_start_score, grid_scores[json.dumps(params, sort_keys=True)])
+        self.assertEqual(best_params, grid.best_params_)
+        self.assertAlmostEqual(score, grid.best_score_)
+
+    def test_tiny_time_budget_stops_early_and_returns_a_model(self):
+        model_finder = EEModelFinder(n_jobs=1, search_mode="halving", svr_kernel_cache_mb=64, time_budget=0)
+        grid = model_finder.ee_search(RandomForestRegressor(n_jobs=1, random_state=42),
+                                      {"n_estimators": [5, 15], "max_depth": [2, 3, 4, 5]}, self.train_x, n_iter=4,
+                                      resource="n_estimators", min_resources=2, refit=False)
+        grid.fit(self.train_x, self.train_y)
+
+        # Only the first of the two rounds of halving is evaluated.
+        self.assertTrue(grid.cut_short_)
+        self.assertEqual(grid.n_iterations_evaluated_, 1)
+        best_params, score = model_finder.ee_best_params(grid)
+        self.assertEqual(best_params["n_estimators"], 15)
+
+        svr = model_finder.ee_best_svr(self.train_x, self.train_y)
+        self.assertIsInstance(svr, SVR)
+        self.assertEqual(svr.predict(self.train_x).shape, (len(self.train_x),))
+        svr_grid = {'kernel': ['linear', 'poly', 'rbf', 'sigmoid'], 'gamma': ['scale', 'auto'],
+                    'C': [0.01, 0.03, 0.1, 0.3, 1, 3], 'degree': [2, 3, 4], 'epsilon': [0.01, 0.03, 0.1, 0.3, 1]}
+        self.assertLess(len(model_finder.search_results["svr"]["params"]), len(ParameterGrid(svr_grid)))
+
+    def test_exhaustive_search_keeps_the_best_candidate_evaluated_before_the_deadline(self):
+        param_grid = {'alpha': [0.01, 0.1, 1, 10], 'solver': ['svd', 'cholesky', 'lsqr']}
+        unlimited = EEModelFinder(n_jobs=1).ee_search(Ridge(), param_grid, self.train_x)
+        unlimited.fit(self.train_x, self.train_y)
+
+        # A deadline far away evaluates every candidate like GridSearchCV.
+        grid = EEModelFinder(n_jobs=1, time_budget=3600).ee_search(Ridge(), param_grid, self.train_x)
+        grid.fit(self.train_x, self.train_y)
+        self.assertFalse(grid.cut_short_)
+        self.assertEqual(grid.best_params_, unlimited.best_params_)
+        np.testing.assert_allclose(grid.cv_results_["mean_test_adjusted-R2"],
+                                   unlimited.cv_results_["mean_test_adjusted-R2"])
+
+        # A deadline already passed evaluates only the first batch, two candidates per cpu, and refits its best.
+        model_finder = EEModelFinder(n_jobs=1, time_budget=0)
+        grid = model_finder.ee_search(Ridge(), param_grid, self.train_x)
+        grid.fit(self.train_x, self.train_y)
+        self.assertTrue(grid.cut_short_)
+        self.assertEqual(grid.n_candidates_evaluated_, model_finder.ee_budget_batch_size())
+        first_batch = list(ParameterGrid(param_grid))[:model_finder.ee_budget_batch_size()]
+        self.assertEqual(list(grid.cv_results_["params"]), first_batch)
+        self.assertIn(grid.best_params_, first_batch)
+        self.assertEqual(grid.best_estimator_.predict(self.train_x).shape, (len(self.train_x),))
+
+        # The warm start search also scores only its first batch of forests.
+        forest_grid = {'n_estimators': [5, 10], 'max_depth': [2, 3, 4, 5], 'random_state': [0]}
+        best_params, score, results = model_finder.ee_random_forest_warm_start_search(
+            self.train_x, self.train_y, forest_grid, n_iter=8)
+        self.assertEqual(len(results["params"]), model_finder.ee_budget_batch_size() * 2)
+        self.assertIn(best_params, results["params"])
+
+    def test_family_cpus_add_up_to_the_budget(self):
+        model_finder = EEModelFinder(n_jobs=1)
+        for budget in range(1, 17):
+            family_cpus = model_finder.ee_family_cpus(budget)
+            self.assertEqual(set(family_cpus), set(model_finder.family_searches))
+            self.assertGreaterEqual(min(family_cpus.values()), 1)
+            self.assertEqual(sum(family_cpus.values()), max(budget, len(family_cpus)))
+        self.assertEqual(model_finder.ee_family_cpus(2), {family: 1 for family in model_finder.family_searches})
+
+    def test_halving_winner_gets_the_full_resource(self):
+        model_finder = EEModelFinder(n_jobs=1, search_mode="halving")
+        grid = model_finder.ee_search(RandomForestRegressor(n_jobs=1, random_state=42),
+                                      {"n_estimators": [5, 15], "max_depth": [2, 3, 4, 5]}, self.train_x, n_iter=4,
+                                      resource="n_estimators", min_resources=2, refit=False)
+        grid.fit(self.train_x, self.train_y)
+
+        best_params, score = model_finder.ee_best_params(grid)
+        # The rounds of halving use 2 and 6 trees.
+        self.assertEqual(max(grid.n_resources_), 6)
+        self.assertEqual(best_params["n_estimators"], 15)
+        self.assertEqual(best_params["max_depth"], grid.best_params_["max_depth"])
+
+
+class TestClustering(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        rng = np.random.RandomState(42)
+        # Four well separated blobs, so that every way of fitting the elbow finds them.
+        centers = np.array([[0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]])
+        self.data = pd.DataFrame(np.concatenate([center + rng.randn(50, 3) for center in centers]),
+                                 columns=['X1', 'X2', 'X3'])
+
+    def test_fast_mode_picks_the_cluster_count_of_the_kmeans_loop(self):
+        old = EEClusteringTrain()
+        no_of_clusters = old.ee_obtain_optimum_cluster(self.data)
+        old_model, old_data = old.ee_create_cluster(self.data.copy(), no_of_clusters)
+
+        for fast in (EEClusteringTrain(fast=True, n_jobs=2),
+                     EEClusteringTrain(fast=True, n_jobs=2, sample_rows=150, mini_batch_rows=100)):
+            self.assertEqual(fast.ee_obtain_optimum_cluster(self.data), no_of_clusters)
+
+        # Without sampling the fitted models are the same as those of the loop and the reused one clusters alike.
+        fast = EEClusteringTrain(fast=True, n_jobs=2)
+        fast.ee_obtain_optimum_cluster(self.data)
+        for i, model in fast.fitted_models.items():
+            kmeans = KMeans(n_clusters=i, init='k-means++', random_state=42).fit(self.data)
+            self.assertAlmostEqual(model.inertia_, kmeans.inertia_)
+        model, data = fast.ee_create_cluster(self.data.copy(), no_of_clusters)
+        self.assertIs(model, fast.fitted_models[no_of_clusters])
+        np.testing.assert_array_equal(data['cluster'], old_data['cluster'])
+
+    def test_fast_mode_divides_the_cpus_between_the_fits(self):
+        threads = []
+        fit = KMeans.fit
+
+        def recording_fit(model, *args, **kwargs):
+            threads.extend(info["num_threads"] for info in threadpool_info() if info["user_api"] == "openmp")
+            return fit(model, *args, **kwargs)
+
+        with mock.patch.object(KMeans, "fit", recording_fit):
+            EEClusteringTrain(fast=True, n_jobs=4).ee_fit_cluster_models(self.data, [1, 2])
+        # The two fits run at the same time with two threads each.
+        self.assertTrue(threads)
+        self.assertEqual(set(threads), {2})
+
+
+class TestIngestion(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        with open(os.path.join(self.cwd, "EESchema", "prediction_schema.json"), 'r') as f:
+            self.column_names = json.load(f)["ColumnNames"]
+        self.regex = re.compile(r'ENB[1,2]\d{3}_data\.(xlsx|csv|parquet)$')
+
+        rng = np.random.RandomState(3)
+        self.data = pd.DataFrame(rng.rand(30, len(COLUMNS)).round(2), columns=COLUMNS)
+        os.mkdir("uploads")
+        self.data.to_excel("uploads/ENB2012_data.xlsx", index=False)
+        self.data.to_csv("uploads/ENB2013_data.csv", index=False)
+        wrong_type = self.data.astype(object)
+        wrong_type.iloc[25, 3] = "abc"
+        wrong_type.to_csv("uploads/ENB2014_data.csv", index=False)
+        self.data.iloc[:, :-1].to_csv("uploads/ENB2015_data.csv", index=False)
+        self.data.to_csv("uploads/bad_name.csv", index=False)
+
+    def validate(self, n_workers):
+        for folder in ("good", "bad"):
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        workbook_cache = EEWorkbookCache()
+        validator = EEParallelValidator("good", "bad", "report.json", workbook_cache, "EElogging/validation.txt")
+        return validator.ee_validate_files("uploads", self.regex, len(COLUMNS), self.column_names, n_workers), \
+            workbook_cache
+
+    def test_parallel_report_matches_the_sequential_one(self):
+        sequential_report, workbook_cache = self.validate(n_workers=1)
+        parallel_report, workbook_cache = self.validate(n_workers=2)
+
+        self.assertEqual(parallel_report, sequential_report)
+        self.assertEqual([(result["file"], result["good"]) for result in parallel_report],
+                         [("ENB2012_data.xlsx", True), ("ENB2013_data.csv", True), ("ENB2014_data.csv", False),
+                          ("ENB2015_data.csv", False), ("bad_name.csv", False)])
+        self.assertEqual(sorted(os.listdir("good")), ["ENB2012_data.xlsx", "ENB2013_data.csv"])
+        for filename in os.listdir("good"):
+            pd.testing.assert_frame_equal(workbook_cache.ee_read(os.path.join("good", filename)), self.data)
+        # The dataframes of the good files come from the workers instead of being parsed again.
+        self.assertEqual(workbook_cache.reads, 0)
+
+    def test_workbook_cache_parses_a_file_once(self):
+        workbook_cache = EEWorkbookCache()
+        with mock.patch.object(EEStreamingReader, "ee_read", autospec=True,
+                               side_effect=EEStreamingReader.ee_read) as read:
+            first = workbook_cache.ee_read("uploads/ENB2012_data.xlsx", self.column_names)
+            self.assertIs(workbook_cache.ee_read("uploads/ENB2012_data.xlsx"), first)
+            self.assertEqual(read.call_count, 1)
+
+            # A file modified since it was parsed is parsed again.
+            time.sleep(0.01)
+            self.data.iloc[:10].to_excel("uploads/ENB2012_data.xlsx", index=False)
+            self.assertEqual(len(workbook_cache.ee_read("uploads/ENB2012_data.xlsx")), 10)
+            self.assertEqual(read.call_count, 2)
+        pd.testing.assert_frame_equal(first, self.data)
+
+    def test_bad_file_is_rejected_after_the_first_batch(self):
+        wrong_type = self.data.astype(object)
+        wrong_type.iloc[3, 3] = "abc"
+        wrong_type.to_excel("uploads/ENB2016_data.xlsx", index=False)
+        rows_read = []
+        iter_rows = EEStreamingReader.ee_iter_rows
+
+        def counting_iter_rows(reader):
+            for row in iter_rows(reader):
+                rows_read.append(row)
+                yield row
+
+        with mock.patch.object(EEStreamingReader, "ee_iter_rows", counting_iter_rows):
+            reader = EEStreamingReader("uploads/ENB2016_data.xlsx", batch_size=10)
+            with self.assertRaises(ValueError):
+                reader.ee_read(self.column_names)
+        # The header and the 10 rows of the first batch out of 30 rows.
+        self.assertEqual(len(rows_read), 11)
+
+    def test_every_format_goes_through_the_same_checks(self):
+        wrong_type = self.data.astype(object)
+        wrong_type.iloc[25, 3] = "abc"
+        # The beginning of the reason every file is rejected for.
+        files = [(self.data, None), (wrong_type, "invalid data"), (self.data.iloc[:, :-1], "invalid Column length"),
+                 (self.data.assign(X8=np.nan), "invalid column X8")]
+        for file_format in EEStreamingReader.ee_supported_formats():
+            for no, (dataframe, expected_reason) in enumerate(files):
+                path = f"ENB201{no}_data.{file_format}"
+                if file_format == "xlsx":
+                    dataframe.to_excel(path, index=False)
+                elif file_format == "csv":
+                    dataframe.to_csv(path, index=False)
+                else:
+                    dataframe.to_parquet(path, index=False)
+
+                _, reason, validated = EEParallelValidator.ee_validate_file(path, self.regex, len(COLUMNS),
+                                                                            self.column_names)
+                if expected_reason is None:
+                    self.assertIsNone(reason)
+                    pd.testing.assert_frame_equal(validated, self.data)
+                    pd.testing.assert_frame_equal(EEStreamingReader(path).ee_read(self.column_names), self.data)
+                else:
+                    self.assertTrue(reason.startswith(expected_reason), f"{path}: {reason}")
+                    self.assertIsNone(validated)
+
+
+class TestPredictionPipeline(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        make_model_version("EEModels/")
+
+        rng = np.random.RandomState(1)
+        data = pd.DataFrame(rng.rand(40, len(COLUMNS)).round(2), columns=COLUMNS)
+        data = data.mask(rng.rand(*data.shape) < 0.1)
+        EEFileOperation().ee_save_columnar_dataset(data, "prediction_data/")
+
+        self.registry = mock.patch.object(EEModelRegistry, "_registry", EEModelRegistry())
+        self.registry.start()
+
+    def tearDown(self):
+        self.registry.stop()
+        super().tearDown()
+
+    def test_chunks_and_shards_are_imputed_like_the_whole_data(self):
+        pipeline = EEPredictionPipeline()
+        expected = pd.DataFrame(pipeline.ee_predict())
+
+        pipeline.ee_predict_stream(chunk_size=7)
+        pd.testing.assert_frame_equal(pd.read_csv("prediction_result.csv"), expected, check_dtype=False)
+
+        result = pd.DataFrame(pipeline.ee_predict_parallel(n_workers=2, shard_size=7))
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_imputer_is_fitted_on_a_bounded_sample(self):
+        pipeline = EEPredictionPipeline()
+        data = EEFileOperation().ee_load_columnar_dataset("prediction_data/")
+        chunks = [data.iloc[start:start + 7] for start in range(0, len(data), 7)]
+
+        with mock.patch.object(EEPredictionPipeline, "imputer_sample_size", 10):
+            imputer = pipeline.ee_fit_prediction_imputer(chunks)
+            # The sample is the same whatever the size of the chunks.
+            same_imputer = pipeline.ee_fit_prediction_imputer([data])
+        self.assertEqual(len(imputer._fit_X), 10)
+        np.testing.assert_array_equal(imputer._fit_X, same_imputer._fit_X)
+
+        self.assertIsNone(pipeline.ee_fit_prediction_imputer([data.fillna(0)]))
+
+
+class TestClusterDispatch(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.columns_to_drop = {1: ['X2'], 2: ['X5', 'X6']}
+        self.version_dir = make_model_version("EEModels/", n_clusters=3, columns_to_drop=self.columns_to_drop)
+
+        self.registry = mock.patch.object(EEModelRegistry, "_registry", EEModelRegistry())
+        self.registry.start()
+
+    def tearDown(self):
+        self.registry.stop()
+        super().tearDown()
+
+    def predict_per_cluster(self, prediction_data):
+        """
+        Predicts like the pipeline did before the vectorized dispatch: every output is scaled separately and
+        every cluster is masked, predicted and merged back on 'ID'.
+        """
+        train_x = make_train_x()
+        file_operator = EEFileOperation()
+        for output_no, col_to_drop in self.columns_to_drop.items():
+            columns = [col for col in COLUMNS if col not in col_to_drop]
+            scaler = StandardScaler().fit(train_x[columns])
+            features = pd.DataFrame(scaler.transform(prediction_data[columns]), columns=columns)
+            kmeans = file_operator.ee_load_model(os.path.join(self.version_dir, "EEClustering",
+                                                              f"clustering_model_Y{output_no}.pickle"))
+            features["clusters"] = kmeans.predict(features)
+            features['ID'] = prediction_data['ID']
+
+            result = []
+            for cluster_no in features["clusters"].unique():
+                cluster_data = features[features["clusters"] == cluster_no]
+                model = file_operator.ee_load_model(os.path.join(
+                    self.version_dir, "EEMlmodels", f"LinearRegression_Y{output_no}_cluster_{cluster_no}.pickle"))
+                result.extend(zip(cluster_data['ID'], model.predict(cluster_data[columns])))
+            prediction_data = prediction_data.merge(pd.DataFrame(result, columns=["ID", f"Y{output_no}"]),
+                                                    on='ID', how='outer')
+        return prediction_data
+
+    def test_vectorized_dispatch_matches_the_per_cluster_prediction(self):
+        rng = np.random.RandomState(2)
+        prediction_data = pd.DataFrame(rng.rand(50, len(COLUMNS)), columns=COLUMNS)
+        prediction_data.insert(0, 'ID', range(len(prediction_data)))
+
+        result = EEPredictionPipeline().ee_predict_dataframe(prediction_data)
+        expected = self.predict_per_cluster(prediction_data)
+        self.assertGreater(expected['Y1'].nunique(), 1)
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+
+
+class TestPredictionCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = EEPredictionCache(capacity=10)
+        self.assertEqual(cache.ee_get_many([b"a", b"b"], "v1"), [None, None])
+        cache.ee_put_many([b"a"], [(1.0, 2.0)], "v1")
+
+        self.assertEqual(cache.ee_get_many([b"a", b"b"], "v1"), [(1.0, 2.0), None])
+        self.assertEqual(cache.ee_stats(), {"capacity": 10, "size": 1, "hits": 1, "misses": 3})
+
+    def test_least_recently_used_row_is_evicted(self):
+        cache = EEPredictionCache(capacity=2)
+        cache.ee_get_many([b"a"], "v1")
+        cache.ee_put_many([b"a", b"b"], [(1.0, 1.0), (2.0, 2.0)], "v1")
+        cache.ee_get_many([b"a"], "v1")
+        cache.ee_put_many([b"c"], [(3.0, 3.0)], "v1")
+
+        self.assertEqual(cache.ee_get_many([b"a", b"b", b"c"], "v1"), [(1.0, 1.0), None, (3.0, 3.0)])
+
+    def test_new_model_version_invalidates_the_rows(self):
+        cache = EEPredictionCache(capacity=10)
+        cache.ee_get_many([b"a"], "v1")
+        cache.ee_put_many([b"a"], [(1.0, 2.0)], "v1")
+
+        self.assertEqual(cache.ee_get_many([b"a"], "v2"), [None])
+        self.assertEqual(cache.ee_stats()["size"], 0)
+        # Predictions made with the replaced models are not stored.
+        cache.ee_put_many([b"a"], [(1.0, 2.0)], "v1")
+        self.assertEqual(cache.ee_get_many([b"a"], "v2"), [None])
+
+
+class TestModelRegistry(TempWorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # Models saved before versioning are directly in the models root with the columns to drop in the
+        # working directory.
+        version_dir = make_model_version("published/")
+        shutil.copytree(version_dir, "EEModels/")
+        for output_no in (1, 2):
+            shutil.move(os.path.join("EEModels", f"column_to_drop_Y{output_no}.txt"), ".")
+
+    def test_models_overwritten_in_place_are_reloaded(self):
+        registry = EEModelRegistry(pointer_check_interval=0.0)
+        models = registry.ee_get_models()
+        self.assertIs(registry.ee_get_models(), models)
+
+        # Training overwrites the scalar of the legacy layout.
+        time.sleep(0.01)
+        shutil.copy("EEModels/scalar.pickle", "EEModels/scalar.pickle.tmp")
+        os.replace("EEModels/scalar.pickle.tmp", "EEModels/scalar.pickle")
+
+        registry.ee_get_models()
+        registry.reload_thread.join()
+        self.assertNotEqual(registry.ee_get_models()["version"], models["version"])
+
+
+class TestColumnarDataset(TempWorkingDirTestCase):
+    def test_dataset_is_replaced_as_a_whole(self):
+        file_operator = EEFileOperation()
+        file_operator.ee_save_columnar_dataset(pd.DataFrame({"X1": [0.5, 0.25, 1.0], "X2": [1, 2, 3]}), "dataset/")
+        file_operator.ee_save_columnar_dataset(pd.DataFrame({"X1": [0.75, np.nan]}), "dataset/")
+
+        dataset = file_operator.ee_load_columnar_dataset("dataset/")
+        pd.testing.assert_frame_equal(dataset, pd.DataFrame({"ID": [0, 1], "X1": [0.75, np.nan]}))
+        self.assertEqual(sorted(os.listdir(".")), ["EElogging", "dataset"])
+
+        # An index of another dataset is detected instead of being loaded with the wrong rows.
+        np.save("dataset/index.npy", np.arange(3))
+        with self.assertRaises(ValueError):
+            file_operator.ee_load_columnar_dataset("dataset/")
+
+    def test_dataset_rounded_when_saved_is_not_copied_when_loaded(self):
+        EEFileOperation().ee_save_columnar_dataset(pd.DataFrame({"X1": [0.123, 0.456, 1.0], "X2": [1, 2, 3]}),
+                                                   "prediction_data/", decimals=2)
+        data_loader = EEDataLoaderPred()
+
+        for data in (data_loader.ee_get_data(), next(data_loader.ee_get_data_chunks(2))):
+            np.testing.assert_array_equal(data["X1"].to_numpy(), [0.12, 0.46, 1.0][:len(data)])
+            # The values are still the read only memory mapped array.
+            self.assertFalse(data["X1"].to_numpy().flags.writeable)
+
+
+class TestModelVersions(TempWorkingDirTestCase):
+    def test_only_older_published_versions_are_deleted(self):
+        file_operator = EEFileOperation()
+        published = []
+        for _ in range(3):
+            published.append(file_operator.ee_create_model_version("EEModels/"))
+            file_operator.ee_publish_model_version(published[-1], {}, "EEModels/", versions_to_keep=2)
+        in_progress = file_operator.ee_create_model_version("EEModels/")
+        current = file_operator.ee_create_model_version("EEModels/")
+        newer_in_progress = file_operator.ee_create_model_version("EEModels/")
+
+        file_operator.ee_publish_model_version(current, {}, "EEModels/", versions_to_keep=2)
+
+        self.assertEqual(sorted(os.listdir("EEModels/versions")),
+                         sorted(os.path.basename(version_dir) for version_dir in
+                                [published[-1], in_progress, current, newer_in_progress]))
+        self.assertEqual(file_operator.ee_current_model_dir("EEModels/"), current)
+
+    def test_failed_training_deletes_its_version(self):
+        pipeline = EETrainingPipeline(cpu_budget=1)
+        with mock.patch.object(EEDataLoaderTrain, "ee_get_data", side_effect=FileNotFoundError("no data")):
+            with self.assertRaises(FileNotFoundError):
+                pipeline.ee_model_train()
+
+        self.assertIsNotNone(pipeline.version_dir)
+        self.assertEqual(os.listdir("EEModels/versions"), [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,5 @@
+from main import ee_create_app
+
+# Entry point of the production server:
+# gunicorn --config gunicorn.conf.py wsgi:app
+app = ee_create_app()